@@ -1,29 +1,268 @@
-from flask import Flask, request, jsonify, send_file
+from flask import Flask, request, jsonify, send_file, g, Response, stream_with_context
 from flask_cors import CORS
 import numpy as np
 import pandas as pd
 import pickle
 import re
 import os
-from collections import Counter
+from collections import Counter, OrderedDict, deque
 import io
+import json
+import math
 import csv
+import time
+import bisect
+import copy
+import threading
 
 from model.text_classifier import TextClassifier
 from model.aspect_analyzer import AspectAnalyzer
 from model.emotion_detector import EmotionDetector
 from utils.text_processor import TextProcessor
 from utils.keyword_extractor import KeywordExtractor
+from utils import metrics
+from utils.metrics import time_stage, server_timing_header
+from utils import profiling
+from utils.admission import AdmissionRejected, build_controllers, admission_class
+from utils.scheduler import WorkScheduler, chunked, SCHEDULER_BATCH_CHUNK
+from utils.ingest import find_text_column, read_text_column, open_text_column, is_csv_filename
+from utils.compression import (open_decompressed, negotiate_encoding, compress_chunks, COMPRESS_MIN_BYTES,
+                               COMPRESSIBLE_MIMETYPES)
+from utils.dedup import (Deduplicator, deduplicate, resolve_dedup, parse_similarity, NEAR_DUPLICATE_THRESHOLD,
+                         LOSSY_DEDUP_MODES)
+from utils.jobs import JobStore
+from utils.checkpoint import CheckpointStore, file_digest
+from utils.uploads import UploadStore, UploadError
+from utils.progress import JobProgress, JobEventStream, PROGRESS_EVENT_INTERVAL
+from utils.result_formats import OUTPUT_FORMATS, resolve_format, result_writer, read_results, format_for_filename
+from utils.batch_results import BatchResults
+from utils.aggregates import ResultSummary
+from utils.sampling import (StratifiedSampler, ProportionEstimate, parse_margin, parse_confidence,
+                            parse_sample_size, SAMPLE_MIN_ROWS)
+from utils.vader_batch import get_vader_engine, batch_scope
+from utils.long_document import LongDocumentAnalyzer
+from utils.registry import ModelRegistry, ModelSet, check_reload_token, MODEL_RELOAD_TOKEN
+from utils.versions import format_versions, parse_versions
+from utils.feedback import (FeedbackLog, FeedbackTrainer, parse_feedback, seed_data, load_online_models,
+                            FEEDBACK_LABELS, ONLINE_MODEL_DIR, ONLINE_MODEL_FILE)
+from utils.pipeline import (AnalysisPipeline, STAGES, parse_fields, resolve_fields, resolve_mode,
+                            parse_deadline_ms, skipped_stages)
 
 app = Flask(__name__)
 CORS(app)
 
-# Initialize models
-text_classifier = TextClassifier()
-aspect_analyzer = AspectAnalyzer()
-emotion_detector = EmotionDetector()
-text_processor = TextProcessor()
-keyword_extractor = KeywordExtractor()
+# Exercises every stage so lazily loaded corpora and caches are filled before workers fork
+WARMUP_TEXT = ("The acting was brilliant and the music moved me, but the plot felt slow. "
+               "Dr. Smith's direction is not great!! I loved the cast... the story, though, was boring.")
+
+def build_models(generation=1, previous=None):
+    """Build and train every analyzer into a ModelSet.
+    
+    A reload reuses the previous set's VADER scorer (its lexicon never
+    changes) and long-document thread pool. Sentiment and emotion come
+    from the published feedback-trained models once those have had
+    feedback, unless the base training data has changed since.
+    """
+    # One VADER scorer shared by every analyzer; batch endpoints prime it with whole files
+    vader_engine = previous.vader_engine if previous is not None else get_vader_engine()
+    # Trained from the directory the registry watches, so changing its files retrains
+    text_classifier = TextClassifier(sentiment_analyzer=vader_engine, data_dir=model_registry.watch_dir)
+    aspect_analyzer = AspectAnalyzer(sentiment_analyzer=vader_engine)
+    emotion_detector = EmotionDetector(sentiment_analyzer=vader_engine)
+    text_processor = TextProcessor()
+    keyword_extractor = KeywordExtractor()
+    online = load_online_models()
+    if online is not None and online.matches(seed_data(text_classifier, emotion_detector)):
+        online.apply(text_classifier, emotion_detector)
+    return _model_set(generation, vader_engine, text_classifier, aspect_analyzer, emotion_detector,
+                      text_processor, keyword_extractor, previous)
+
+def swap_online_models(current, generation):
+    """A ModelSet serving newly published feedback-trained models, sharing everything else with
+    current; None if they cannot be served (no file, or grown from other base training data)"""
+    online = load_online_models()
+    if online is None or not online.matches(seed_data(current.text_classifier, current.emotion_detector)):
+        return None
+    serving = {'sentiment': current.text_classifier.sentiment_model,
+               'emotion': current.emotion_detector.emotion_model}
+    if any(isinstance(serving[stage], type(model)) and not online.records[stage]
+           for stage, model in online.models.items()):
+        # A stage the new models have no feedback for must go back to its base model, so build afresh
+        return build_models(generation, current)
+    # Only the heads differ; the classifiers keep no other state that depends on them
+    text_classifier = copy.copy(current.text_classifier)
+    emotion_detector = copy.copy(current.emotion_detector)
+    online.apply(text_classifier, emotion_detector)
+    return _model_set(generation, current.vader_engine, text_classifier, current.aspect_analyzer,
+                      emotion_detector, current.text_processor, current.keyword_extractor, current)
+
+def _model_set(generation, vader_engine, text_classifier, aspect_analyzer, emotion_detector, text_processor,
+               keyword_extractor, previous):
+    pipeline = AnalysisPipeline(text_classifier, aspect_analyzer, emotion_detector,
+                                text_processor, keyword_extractor)
+    if previous is not None:
+        long_document_analyzer = previous.long_document_analyzer.with_pipeline(pipeline)
+    else:
+        long_document_analyzer = LongDocumentAnalyzer(pipeline)
+    return ModelSet(generation, vader_engine, pipeline, long_document_analyzer)
+
+def warm_models():
+    """Run every stage once in each mode, inline, to load corpora and compile lazy state"""
+    for mode in ('full', 'fast'):
+        _analyze_text(WARMUP_TEXT, {}, STAGES, mode)
+
+# Analyzers are built by create_app() so a preloading server trains them once before forking
+# (or by the first request, if the app is served without it), and rebuilt in the background when the model files change or an admin asks for a reload;
+# newly published feedback-trained models only replace the sentiment and emotion heads
+model_registry = ModelRegistry(build_models, warm_models,
+                               components={'feedback': (os.path.join(ONLINE_MODEL_DIR, ONLINE_MODEL_FILE),
+                                                        swap_online_models)})
+
+def models():
+    """The ModelSet serving the current request or job: the one active when it started"""
+    return model_registry.active()
+
+# Corrected labels from /feedback, folded into the sentiment and emotion models off the request path
+feedback_log = FeedbackLog()
+feedback_trainer = FeedbackTrainer(feedback_log, models,
+                                   on_publish=lambda: model_registry.refresh('feedback'))
+
+def create_app(warm=True):
+    """Build (once) and optionally warm the analyzers, then return the Flask app.
+    
+    Under gunicorn with preload_app (see gunicorn.conf.py) this runs in the
+    master, so workers fork with trained models already in shared pages.
+    No threads are started here; the scheduler and long-document pools,
+    the model watcher and the feedback trainer start lazily in each worker.
+    Without it (flask run, gunicorn app:app), the first request builds them.
+    """
+    model_registry.load(warm=warm)
+    return app
+
+# Separate concurrency limits so batch uploads cannot starve interactive requests
+admission_controllers = build_controllers()
+# All analyzer work runs here so interactive tasks overtake queued batch chunks
+scheduler = WorkScheduler()
+
+# Background jobs for bulk uploads too large to answer in one response
+jobs = JobStore()
+checkpoints = CheckpointStore()
+# Resumable chunked uploads of files too large for one request
+uploads = UploadStore()
+
+# Largest file /batch-analyze accepts
+BATCH_ANALYZE_MAX_BYTES = 10 * 1024 * 1024
+# /upload-csv streams the result directly up to this many distinct texts, else starts a job
+UPLOAD_CSV_STREAM_ROWS = int(os.environ.get('UPLOAD_CSV_STREAM_ROWS', 500))
+# Analyzed chunks kept in memory while fanning results out to duplicate rows
+RESULT_CHUNK_CACHE = int(os.environ.get('RESULT_CHUNK_CACHE', 64))
+# Parsed blocks a summary may have queued for analysis beyond the one being read
+SUMMARY_BLOCKS_AHEAD = int(os.environ.get('SUMMARY_BLOCKS_AHEAD', 2))
+
+# Time kept back from a request deadline for serializing the response
+DEADLINE_RESERVE_MS = float(os.environ.get('DEADLINE_RESERVE_MS', 5))
+
+# Stages that score the whole text with VADER, so priming it in one pass pays off
+VADER_STAGES = ('sentiment', 'emotion')
+
+# Per-stage fallbacks used by batch endpoints so one failing analyzer does not drop the row
+BATCH_FALLBACKS = {
+    'aspects': lambda text: {'acting': 'Neutral', 'story': 'Neutral', 'music': 'Neutral', 'direction': 'Neutral'},
+    'emotion': lambda text: {'label': 'Neutral', 'confidence': 0.5},
+    'text_analysis': lambda text: {'length': len(text), 'tone': 'Casual'},
+    'keywords': lambda text: ['text']
+}
+
+@app.before_request
+def pin_models():
+    # Handlers and the scheduler tasks they queue keep this set even if a reload swaps in another
+    g.models = model_registry.pin()
+
+@app.before_request
+def start_feedback_trainer():
+    feedback_trainer.start()
+
+@app.before_request
+def start_request_metrics():
+    g.request_start_wall = time.perf_counter()
+    g.request_start_cpu = time.thread_time()
+    g.cpu_account = metrics.open_cpu_account()
+    g.stage_timings = {}
+    metrics.REQUESTS_IN_FLIGHT.inc(request.endpoint or 'unknown')
+
+@app.before_request
+def admit_request():
+    admission = admission_class(request.endpoint)
+    if admission is None or request.method == 'OPTIONS':
+        return None
+    controller = admission_controllers[admission]
+    try:
+        g.admission = (controller, controller.acquire())
+    except AdmissionRejected as e:
+        response = jsonify({"error": str(e), "retry_after": e.retry_after})
+        response.status_code = e.status
+        response.headers['Retry-After'] = str(e.retry_after)
+        return response
+    return None
+
+@app.after_request
+def record_request_metrics(response):
+    endpoint = request.endpoint or 'unknown'
+    metrics.REQUESTS_TOTAL.inc(endpoint, request.method, response.status_code)
+    if endpoint != 'admin_profile':
+        profiling.session.note_request()
+    if endpoint == 'classify_text' and 'request_start_wall' in g:
+        total_ms = (time.perf_counter() - g.request_start_wall) * 1000
+        response.headers['Server-Timing'] = server_timing_header(g.stage_timings, total_ms)
+    return response
+
+@app.after_request
+def report_model_version(response):
+    if 'models' in g:
+        response.headers['X-Model-Version'] = g.models.version
+    return response
+
+@app.after_request
+def compress_response(response):
+    """Compress text responses per Accept-Encoding; streamed bodies stay streamed"""
+    if response.mimetype not in COMPRESSIBLE_MIMETYPES:
+        return response
+    response.vary.add('Accept-Encoding')
+    encoding = negotiate_encoding(request.headers.get('Accept-Encoding'))
+    if encoding is None or response.status_code != 200 or 'Content-Encoding' in response.headers:
+        return response
+    if response.content_length is not None and response.content_length < COMPRESS_MIN_BYTES:
+        return response
+    response.response = compress_chunks(response.iter_encoded(), encoding)
+    response.direct_passthrough = False
+    response.headers['Content-Encoding'] = encoding
+    response.headers.pop('Content-Length', None)
+    response.headers.pop('Accept-Ranges', None)
+    etag, weak = response.get_etag()
+    if etag and not weak:
+        response.set_etag(etag, weak=True)
+    return response
+
+@app.teardown_request
+def release_admission(error=None):
+    if 'admission' in g:
+        controller, admitted_at = g.pop('admission')
+        controller.release(admitted_at)
+
+@app.teardown_request
+def unpin_models(error=None):
+    model_registry.unpin()
+
+@app.teardown_request
+def finish_request_metrics(error=None):
+    if 'request_start_wall' not in g:
+        return
+    endpoint = request.endpoint or 'unknown'
+    metrics.REQUEST_SECONDS.observe(endpoint, value=time.perf_counter() - g.request_start_wall)
+    # The request thread's own CPU time plus that of the scheduler tasks it ran its analysis on
+    cpu = time.thread_time() - g.request_start_cpu + g.cpu_account.seconds
+    metrics.REQUEST_CPU_SECONDS.observe(endpoint, value=cpu)
+    metrics.REQUESTS_IN_FLIGHT.dec(endpoint)
 
 @app.route('/', methods=['GET'])
 def home():
@@ -36,7 +275,21 @@ def home():
             "sentiment_only": "/sentiment-only (POST)",
             "topics_only": "/topics-only (POST)",
             "batch_analyze": "/batch-analyze (POST)",
-            "upload_csv": "/upload-csv (POST)"
+            "upload_csv": "/upload-csv (POST)",
+            "jobs": "/jobs/<job_id> (GET)",
+            "job_events": "/jobs/<job_id>/events (GET, text/event-stream)",
+            "retry_job": "/jobs/<job_id>/retry (POST)",
+            "uploads": "/uploads (POST), /uploads/<upload_id> (GET, DELETE)",
+            "upload_chunk": "/uploads/<upload_id>/chunks/<number> (PUT)",
+            "analyze_upload": "/uploads/<upload_id>/analyze (POST)",
+            "finalize_upload": "/uploads/<upload_id>/finalize (POST)",
+            "batch_summary": "/batch-summary (POST)",
+            "merge_summaries": "/summaries/merge (POST)",
+            "batch_estimate": "/batch-estimate (POST)",
+            "reanalyze": "/reanalyze (POST)",
+            "model_versions": "/model-versions (GET)",
+            "feedback": "/feedback (POST)",
+            "metrics": "/metrics"
         },
         "usage": "Send POST requests to classify text with sentiment, topics, emotions, and aspects"
     })
@@ -45,6 +298,169 @@ def home():
 def health_check():
     return jsonify({"status": "healthy", "message": "Text Classification API is running"})
 
+@app.route('/metrics', methods=['GET'])
+def metrics_endpoint():
+    return Response(metrics.registry.render(), mimetype='text/plain; version=0.0.4')
+
+def _run_stages(text, stages, mode, max_keywords=10, fallbacks=None, timings=None, deadline=None):
+    """Run stages over one text, windowing very long documents.
+    
+    Returns (results, long_document metadata or None). Stages cut by the
+    deadline are absent from results.
+    """
+    current = models()
+    if current.long_document_analyzer.applies(text):
+        with time_stage('long_document', timings):
+            return current.long_document_analyzer.run(text, stages, max_keywords=max_keywords,
+                                                      fallbacks=fallbacks, mode=mode, deadline=deadline)
+    return current.pipeline.run(text, stages, timings=timings, max_keywords=max_keywords,
+                                fallbacks=fallbacks, mode=mode, deadline=deadline), None
+
+def _vader_primed(texts, stages):
+    """The texts worth scoring with VADER up front: none unless sentiment or emotion is
+    selected, and never long documents, whose windows are scored on their own"""
+    if not any(stage in VADER_STAGES for stage in stages):
+        return []
+    long_document_analyzer = models().long_document_analyzer
+    return [text for text in texts if not long_document_analyzer.applies(text)]
+
+def _model_versions(results):
+    """Version tags of the stages present in results"""
+    versions = models().pipeline.model_versions()
+    return {stage: versions[stage] for stage in STAGES if stage in results}
+
+def _analyze_text(text, timings, stages=STAGES, mode='full', deadline=None):
+    """Run the selected analyzer stages over a single text"""
+    # In full mode sentiment and emotion both read VADER, so score it once up front for them to share,
+    # unless the deadline has already passed and every stage will be cut anyway
+    expired = deadline is not None and time.perf_counter() >= deadline
+    primed = _vader_primed([text], stages) if mode == 'full' and not expired else []
+    with batch_scope(models().vader_engine, primed):
+        results, long_document = _run_stages(text, stages, mode, timings=timings, deadline=deadline)
+    missing = [stage for stage in stages if stage not in results]
+    
+    response = {"text": text}
+    # Skipped stages are present as null so clients never mistake them for a computed result
+    for stage in STAGES:
+        response[stage] = results.get(stage)
+    response["metadata"] = {
+        "stages_run": list(stages),
+        "skipped_stages": skipped_stages(stages),
+        "missing_stages": missing,
+        "partial": bool(missing),
+        "mode": mode,
+        "model_versions": _model_versions(results),
+        "model_version": models().version
+    }
+    if long_document is not None:
+        response["metadata"]["long_document"] = long_document
+    return response
+
+def _timed_stage(stage, fn, *args, **kwargs):
+    with time_stage(stage):
+        return fn(*args, **kwargs)
+
+def _requested_stages(data=None):
+    """Resolve the fields/include parameter from the JSON body, form or query string"""
+    value = None
+    if data:
+        value = data.get('fields', data.get('include'))
+    if value is None:
+        value = request.values.get('fields', request.values.get('include'))
+    return resolve_fields(parse_fields(value))
+
+def _requested_mode(data=None):
+    """Resolve the evaluation mode ('full' or 'fast') from the JSON body, form or query string"""
+    value = data.get('mode') if data else None
+    if value is None:
+        value = request.values.get('mode')
+    return resolve_mode(value)
+
+def _request_deadline(data=None):
+    """Absolute perf_counter deadline from X-Request-Deadline-Ms or deadline_ms, or None.
+    
+    The budget counts from when the request arrived, less DEADLINE_RESERVE_MS.
+    """
+    value = request.headers.get('X-Request-Deadline-Ms')
+    if value is None and data:
+        value = data.get('deadline_ms')
+    if value is None:
+        value = request.values.get('deadline_ms')
+    deadline_ms = parse_deadline_ms(value)
+    if deadline_ms is None:
+        return None
+    return g.request_start_wall + (deadline_ms - DEADLINE_RESERVE_MS) / 1000
+
+def _requested_output(data=None):
+    """Resolve the result format and include_text parameters from the JSON body, form or query string.
+    
+    include_text=0 leaves the echoed input text out, so results are joined back by id.
+    """
+    values = data or {}
+    output_format = values.get('format', request.values.get('format'))
+    include_text = values.get('include_text', request.values.get('include_text', 'true'))
+    if str(include_text).lower() not in ('1', 'true', 'yes', '0', 'false', 'no'):
+        raise ValueError(f"Invalid include_text: {include_text}")
+    return resolve_format(output_format), _is_truthy(include_text)
+
+def _requested_dedup(data=None):
+    """Resolve the dedup mode and near-duplicate similarity from the JSON body, form or query string"""
+    values = data or {}
+    mode = resolve_dedup(values.get('dedup', request.values.get('dedup')))
+    threshold = parse_similarity(values.get('similarity', request.values.get('similarity')))
+    return mode, threshold
+
+def _requested_estimate(data=None):
+    """Resolve the margin, confidence, sample, stratify and seed parameters of an estimate"""
+    values = data or {}
+    return _estimate_settings(lambda name: values.get(name, request.values.get(name)))
+
+def _estimate_settings(get):
+    """Estimate settings from get(name), which returns a parameter's raw value or None"""
+    seed = get('seed')
+    try:
+        seed = int(seed) if seed not in (None, '') else None
+    except (TypeError, ValueError):
+        raise ValueError(f"Invalid seed: {seed}")
+    return {'margin': parse_margin(get('margin')), 'confidence': parse_confidence(get('confidence')),
+            'sample': parse_sample_size(get('sample')), 'stratify': get('stratify') or None, 'seed': seed}
+
+def _deduplicate(texts, mode, threshold, stages, endpoint):
+    """Collapse duplicate rows before analysis; returns (unique, row_map, stats).
+    
+    Near and normalized duplicates are keyed by the classifier's own
+    preprocessing, so every row in a cluster gets its representative's
+    result. Compute saved is estimated from the pipeline's per-stage cost.
+    """
+    unique, row_map, stats = deduplicate(texts, mode, models().text_classifier._preprocess_text, threshold)
+    return unique, row_map, _record_dedup(stats, len(row_map), stages, endpoint)
+
+def _record_dedup(stats, rows, stages, endpoint):
+    """Count skipped and duplicate rows and add the estimated compute saved to dedup stats"""
+    metrics.ROWS_TOTAL.inc(endpoint, 'skipped', amount=rows - stats['rows_with_text'])
+    metrics.ROWS_TOTAL.inc(endpoint, 'duplicate', amount=stats['exact_duplicates'])
+    metrics.ROWS_TOTAL.inc(endpoint, 'near_duplicate', amount=stats['near_duplicates'])
+    row_cost = sum(models().pipeline.expected_cost(stage) for stage in stages)
+    stats['compute_saved_seconds'] = round((stats['rows_with_text'] - stats['analyzed']) * row_cost, 3)
+    return stats
+
+def _versions_header(response, stages):
+    """Stage versions of a result file, sent once per response rather than on every CSV row"""
+    response.headers['X-Model-Versions'] = format_versions(_model_versions(stages))
+
+def _dedup_headers(response, stats):
+    response.headers['X-Unique-Rows'] = str(stats['analyzed'])
+    response.headers['X-Dedup-Ratio'] = str(stats['dedup_ratio'])
+
+def _download_name(output_format):
+    return f"text_analysis_results.{OUTPUT_FORMATS[output_format][1]}"
+
+def _profiling_token():
+    return request.headers.get('X-Profiling-Token') or request.args.get('token')
+
+def _is_truthy(value):
+    return str(value).lower() in ('1', 'true', 'yes')
+
 @app.route('/classify', methods=['POST'])
 def classify_text():
     try:
@@ -54,35 +470,106 @@ def classify_text():
         if not text:
             return jsonify({"error": "No text provided"}), 400
         
-        # Multi-label classification
-        sentiment_result = text_classifier.predict_sentiment(text)
-        topic_result = text_classifier.predict_topics(text)
-        
-        # Aspect-wise sentiment analysis
-        aspect_result = aspect_analyzer.analyze_aspects(text)
-        
-        # Emotion detection
-        emotion_result = emotion_detector.detect_emotion(text)
-        
-        # Text analysis
-        text_analysis = text_processor.analyze_text(text)
+        try:
+            stages = _requested_stages(data)
+            mode = _requested_mode(data)
+            deadline = _request_deadline(data)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
         
-        # Keyword extraction
-        keywords = keyword_extractor.extract_keywords(text)
+        if _is_truthy(request.args.get('profile', data.get('profile', ''))):
+            if not profiling.profiling_enabled():
+                return jsonify({"error": "Profiling is disabled"}), 403
+            if not profiling.check_token(_profiling_token()):
+                return jsonify({"error": "Invalid profiling token"}), 403
+            # Profiled requests run inline so cProfile sees the analyzers
+            result, profile_summary = profiling.profile_call(_analyze_text, text, g.stage_timings, stages, mode, deadline)
+            result["profile"] = profile_summary
+            return jsonify(result)
         
-        return jsonify({
-            "text": text,
-            "sentiment": sentiment_result,
-            "topics": topic_result,
-            "aspects": aspect_result,
-            "emotion": emotion_result,
-            "text_analysis": text_analysis,
-            "keywords": keywords
-        })
+        return jsonify(scheduler.run('interactive', _analyze_text, text, g.stage_timings, stages, mode, deadline))
         
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+@app.route('/admin/profile', methods=['POST'])
+def admin_profile():
+    """Start sampling all worker threads for the next N seconds or requests; returns a job for the stacks"""
+    if not profiling.profiling_enabled():
+        return jsonify({"error": "Not found"}), 404
+    if not profiling.check_token(_profiling_token()):
+        return jsonify({"error": "Invalid profiling token"}), 403
+    
+    try:
+        options = request.get_json(silent=True) or {}
+        seconds = float(options.get('seconds', request.args.get('seconds', 10)))
+        max_requests = int(options.get('requests', request.args.get('requests', 0)))
+        interval_ms = float(options.get('interval_ms', request.args.get('interval_ms', 5)))
+    except (TypeError, ValueError):
+        return jsonify({"error": "seconds, requests and interval_ms must be numbers"}), 400
+    if not seconds > 0 or not interval_ms > 0 or max_requests < 0:
+        return jsonify({"error": "seconds and interval_ms must be positive and requests not negative"}), 400
+    
+    profiler = profiling.session.start(interval=interval_ms / 1000)
+    if profiler is None:
+        return jsonify({"error": "A profiling session is already running"}), 409
+    
+    try:
+        job = jobs.create('profile', seconds=seconds, requests=max_requests, interval_ms=interval_ms,
+                          result='profile.txt')
+    except Exception:
+        profiling.session.finish()
+        raise
+    # A thread of its own rather than the job pool, so queued uploads cannot delay the capture
+    threading.Thread(target=_run_profile, args=(job['id'], profiler, seconds, max_requests),
+                     name='profiler', daemon=True).start()
+    response = jsonify(dict(job, **_job_links(job['id'])))
+    response.headers['Location'] = f"/jobs/{job['id']}"
+    return response, 202
+
+def _run_profile(job_id, profiler, seconds, max_requests):
+    """Sample until the session ends, then store the collapsed stacks as the job's result"""
+    try:
+        jobs.update(job_id, status='running', started=time.time())
+        profiler.run(seconds=seconds, max_requests=max_requests)
+        with open(jobs.path(job_id, 'profile.txt'), 'w') as f:
+            f.write(profiler.collapsed())
+    except Exception as e:
+        print(f"Profile {job_id} failed: {e}")
+        jobs.update(job_id, status='failed', finished=time.time(), error=str(e))
+        return
+    finally:
+        profiling.session.finish()
+    jobs.update(job_id, status='done', finished=time.time(), samples=profiler.samples,
+                requests_seen=profiler.requests_seen)
+
+@app.route('/admin/models/reload', methods=['POST'])
+def reload_models():
+    """Load the models again in the background and swap them in once warmed.
+    
+    Every worker process is told through the trigger file in the model
+    directory; this one starts at once. Requests in flight finish on the
+    set they started with. With wait=true the response comes once the
+    new set is active or its load has failed.
+    """
+    if not MODEL_RELOAD_TOKEN:
+        return jsonify({"error": "Not found"}), 404
+    if not check_reload_token(request.headers.get('X-Reload-Token') or request.args.get('token')):
+        return jsonify({"error": "Invalid reload token"}), 403
+    
+    try:
+        model_registry.trigger()
+    except OSError as e:
+        print(f"Could not touch the model reload trigger, reloading this worker only: {e}")
+    future = model_registry.reload('admin')
+    if not _is_truthy(request.values.get('wait', '')):
+        return jsonify({"status": "reloading", "active": model_registry.current.to_dict()}), 202
+    try:
+        loaded = future.result()
+    except Exception as e:
+        return jsonify({"error": f"Model reload failed: {e}", "active": model_registry.current.to_dict()}), 500
+    return jsonify({"status": "loaded", "active": loaded.to_dict()})
+
 @app.route('/debug-upload', methods=['POST'])
 def debug_upload():
     try:
@@ -105,6 +592,32 @@ def debug_upload():
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+def _simple_batch_chunk(rows, mode):
+    """Sentiment for a chunk of (index, text) rows; runs as one batch task"""
+    results = []
+    current = models()
+    # Score VADER for the whole chunk in one vectorized pass
+    with batch_scope(current.vader_engine, _vader_primed([text for _, text in rows], ('sentiment',))):
+        for index, text in rows:
+            # Only do sentiment analysis (fastest)
+            try:
+                with time_stage('sentiment'):
+                    sentiment_result = current.text_classifier.predict_sentiment(text, mode=mode)
+                metrics.ROWS_TOTAL.inc('simple_batch', 'processed')
+            except Exception as e:
+                print(f"Sentiment error: {e}")
+                sentiment_result = {"label": "Neutral", "confidence": 0.5}
+                metrics.ROWS_TOTAL.inc('simple_batch', 'error')
+            
+            result = {
+                "id": index + 1,
+                "text": text[:100] + "..." if len(text) > 100 else text,  # Truncate for display
+                "sentiment": sentiment_result,
+                "length": len(text)
+            }
+            results.append(result)
+    return results
+
 @app.route('/simple-batch', methods=['POST'])
 def simple_batch():
     try:
@@ -116,42 +629,26 @@ def simple_batch():
         file = request.files['file']
         print(f"Simple batch file: {file.filename}")
         
-        if not file.filename.endswith('.csv'):
-            return jsonify({"error": "Only CSV files are supported"}), 400
+        if not is_csv_filename(file.filename):
+            return jsonify({"error": "Only CSV files are supported (optionally .gz or .zst compressed)"}), 400
         
-        # Read CSV
-        df = pd.read_csv(file)
+        # Read CSV, decompressing gzip/zstd uploads as it is parsed
+        df = pd.read_csv(open_decompressed(file.stream))
         print(f"Simple batch processing {len(df)} rows")
         
-        # Find text column
-        text_column = None
-        for col in df.columns:
-            if col.lower() == 'text':
-                text_column = col
-                break
-        
+        text_column = find_text_column(df.columns)
         if text_column is None:
             return jsonify({"error": "CSV must have a 'text' column"}), 400
         
+        try:
+            mode = _requested_mode()
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        
         # Simple processing - just sentiment and basic info
-        results = []
-        for index, row in df.head(20).iterrows():  # Max 20 rows for simple test
-            text = str(row[text_column])
-            
-            # Only do sentiment analysis (fastest)
-            try:
-                sentiment_result = text_classifier.predict_sentiment(text)
-            except Exception as e:
-                print(f"Sentiment error: {e}")
-                sentiment_result = {"label": "Neutral", "confidence": 0.5}
-            
-            result = {
-                "id": index + 1,
-                "text": text[:100] + "..." if len(text) > 100 else text,  # Truncate for display
-                "sentiment": sentiment_result,
-                "length": len(text)
-            }
-            results.append(result)
+        rows = [(index, str(row[text_column])) for index, row in df.head(20).iterrows()]  # Max 20 rows for simple test
+        futures = [scheduler.submit('batch', _simple_batch_chunk, chunk, mode) for chunk in chunked(rows)]
+        results = [result for future in futures for result in future.result()]
         
         # Create simple CSV response
         output = io.StringIO()
@@ -180,6 +677,31 @@ def simple_batch():
         print(f"Simple batch error: {e}")
         return jsonify({"error": str(e)}), 500
 
+def _batch_analyze_chunk(rows, stages, mode, endpoint='batch_analyze'):
+    """Analyze a chunk of (index, text) rows; runs as one batch task"""
+    results = []
+    # Score VADER for the whole chunk in one vectorized pass
+    with batch_scope(models().vader_engine, _vader_primed([text for _, text in rows], stages)):
+        for index, text in rows:
+            try:
+                # Skip empty texts
+                if not text or text.strip() == '':
+                    metrics.ROWS_TOTAL.inc(endpoint, 'skipped')
+                    continue
+                
+                # Reduced keyword count and per-stage fallbacks for batch speed
+                result = {"id": index + 1, "text": text}
+                result.update(_run_stages(text, stages, mode, max_keywords=5, fallbacks=BATCH_FALLBACKS)[0])
+                result["model_versions"] = _model_versions(result)
+                results.append(result)
+                metrics.ROWS_TOTAL.inc(endpoint, 'processed')
+            
+            except Exception as e:
+                print(f"Error processing row {index}: {str(e)}")
+                metrics.ROWS_TOTAL.inc(endpoint, 'error')
+                continue
+    return results
+
 @app.route('/batch-analyze', methods=['POST'])
 def batch_analyze():
     try:
@@ -193,20 +715,20 @@ def batch_analyze():
         print(f"File received: {file.filename}, Size: {file.content_length}")
         
         # Check file size (max 10MB)
-        if hasattr(file, 'content_length') and file.content_length > 10 * 1024 * 1024:
+        if hasattr(file, 'content_length') and file.content_length > BATCH_ANALYZE_MAX_BYTES:
             return jsonify({"error": "File size must be less than 10MB"}), 400
         
         if file.filename == '':
             print("ERROR: Empty filename")
             return jsonify({"error": "No file selected"}), 400
         
-        if not file.filename.endswith('.csv'):
+        if not is_csv_filename(file.filename):
             print(f"ERROR: Invalid file extension: {file.filename}")
-            return jsonify({"error": "Only CSV files are supported"}), 400
+            return jsonify({"error": "Only CSV files are supported (optionally .gz or .zst compressed)"}), 400
         
-        # Read CSV file with error handling
+        # Read CSV file with error handling, decompressing gzip/zstd uploads as it is parsed
         try:
-            df = pd.read_csv(file)
+            df = pd.read_csv(open_decompressed(file.stream))
         except Exception as e:
             return jsonify({"error": f"Failed to read CSV file: {str(e)}"}), 400
         
@@ -224,13 +746,7 @@ def batch_analyze():
         print(f"CSV columns found: {list(df.columns)}")
         print(f"Processing {len(df)} rows...")
         
-        # Check for 'text' column (case insensitive)
-        text_column = None
-        for col in df.columns:
-            if col.lower() == 'text':
-                text_column = col
-                break
-        
+        text_column = find_text_column(df.columns)
         if text_column is None:
             return jsonify({
                 "error": f"CSV must have a 'text' column. Found columns: {list(df.columns)}",
@@ -241,106 +757,884 @@ def batch_analyze():
         if df[text_column].isna().all():
             return jsonify({"error": "Text column is empty"}), 400
         
-        results = []
-        total_rows = len(df)
+        try:
+            stages = _requested_stages()
+            mode = _requested_mode()
+            output_format, include_text = _requested_output()
+            dedup_mode, similarity = _requested_dedup()
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
         
-        for index, row in df.iterrows():
-            try:
-                # Progress tracking
-                if (index + 1) % 5 == 0 or index == total_rows - 1:
-                    print(f"Processing row {index + 1}/{total_rows}...")
-                
-                text = str(row[text_column])
-                
-                # Skip empty texts
-                if not text or text.strip() == '':
-                    continue
-                
-                # Simplified analysis for batch processing (faster)
-                sentiment_result = text_classifier.predict_sentiment(text)
-                topic_result = text_classifier.predict_topics(text)
-                
-                # Simplified aspect and emotion analysis for speed
-                try:
-                    aspect_result = aspect_analyzer.analyze_aspects(text)
-                except:
-                    aspect_result = {'acting': 'Neutral', 'story': 'Neutral', 'music': 'Neutral', 'direction': 'Neutral'}
-                
-                try:
-                    emotion_result = emotion_detector.detect_emotion(text)
-                except:
-                    emotion_result = {'label': 'Neutral', 'confidence': 0.5}
-                
-                try:
-                    text_analysis = text_processor.analyze_text(text)
-                except:
-                    text_analysis = {'length': len(text), 'tone': 'Casual'}
-                
-                try:
-                    keywords = keyword_extractor.extract_keywords(text, max_keywords=5)  # Reduced keywords
-                except:
-                    keywords = ['text']  # Fallback
-                
-                result = {
-                    "id": index + 1,
-                    "text": text,
-                    "sentiment": sentiment_result,
-                    "topics": topic_result,
-                    "aspects": aspect_result,
-                    "emotion": emotion_result,
-                    "text_analysis": text_analysis,
-                    "keywords": keywords
-                }
-                results.append(result)
-                
-            except Exception as e:
-                print(f"Error processing row {index}: {str(e)}")
-                continue
+        texts = [str(value) for value in df[text_column]]
+        unique, row_map, dedup_stats = _deduplicate(texts, dedup_mode, similarity, stages, 'batch_analyze')
+        print(f"Analyzing {len(unique)} distinct texts ({dedup_stats['dedup_ratio']:.0%} duplicates)")
         
-        print(f"Completed processing {len(results)} rows successfully")
+        # Rows go to the scheduler in chunks so interactive requests can overtake between them
+        load_chunk, futures = _submit_unique(unique, stages, mode, 'batch_analyze')
         
-        # Create downloadable CSV
-        output = io.StringIO()
-        writer = csv.writer(output)
+        # Create downloadable file in the requested format, fanning each result out to its duplicates
+        writer = result_writer(output_format, stages, include_text)
+        body = b''.join(block for block, _ in _result_blocks(writer, zip(row_map, texts), load_chunk, futures,
+                                                             recount=dedup_mode in LOSSY_DEDUP_MODES))
         
-        # Write header
-        writer.writerow([
-            'ID', 'Text', 'Sentiment', 'Sentiment_Confidence', 'Topics',
-            'Acting_Sentiment', 'Story_Sentiment', 'Music_Sentiment', 'Direction_Sentiment',
-            'Emotion', 'Emotion_Confidence', 'Text_Length', 'Tone', 'Keywords'
-        ])
+        response = send_file(
+            io.BytesIO(body),
+            mimetype=OUTPUT_FORMATS[output_format][0],
+            as_attachment=True,
+            download_name=_download_name(output_format)
+        )
+        _dedup_headers(response, dedup_stats)
+        _versions_header(response, stages)
+        response.headers['X-Skipped-Stages'] = ','.join(skipped_stages(stages))
+        return response
         
-        # Write data
-        for result in results:
-            try:
-                writer.writerow([
-                    result['id'],
-                    result['text'],
-                    result['sentiment']['label'],
-                    result['sentiment']['confidence'],
-                    ', '.join(result['topics']),
-                    result['aspects'].get('acting', 'Neutral'),
-                    result['aspects'].get('story', 'Neutral'),
-                    result['aspects'].get('music', 'Neutral'),
-                    result['aspects'].get('direction', 'Neutral'),
-                    result['emotion']['label'],
-                    result['emotion']['confidence'],
-                    result['text_analysis']['length'],
-                    result['text_analysis']['tone'],
-                    ', '.join(result['keywords'])
-                ])
-            except Exception as e:
-                print(f"Error writing CSV row {result.get('id', 'unknown')}: {str(e)}")
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+def _own_counts(result, text):
+    """result with its text counts taken from text, for a row that shares the result of a
+    different text in its lossy dedup cluster"""
+    text_analysis = result.get('text_analysis')
+    if text_analysis is None:
+        return result
+    processor = models().text_processor
+    counts = {'length': processor._count_characters(text), 'word_count': processor._count_words(text),
+              'sentence_count': processor._count_sentences(text)}
+    return dict(result, text_analysis=dict(text_analysis, **{key: value for key, value in counts.items()
+                                                             if key in text_analysis}))
+
+def _result_blocks(writer, rows, load_chunk, futures=(), chunk_of=None, progress=None, recount=False):
+    """Yield (encoded bytes, rows written) in input row order as analysis chunks finish.
+    
+    rows yields (index of the row's distinct text or None, text) per input
+    row; it may be a generator that reads input as it goes. Each distinct
+    text was analyzed once; every row carrying it gets a copy of the result
+    under its own id. chunk_of(i) is the chunk holding distinct text i
+    (SCHEDULER_BATCH_CHUNK per chunk by default), and load_chunk(n) blocks
+    until chunk n is analyzed and returns a mapping from distinct-text
+    index to result (a BatchResults or a dict); only the most recently
+    used RESULT_CHUNK_CACHE chunks are kept loaded. Rows with
+    empty text or failed analysis are left out; with a JobProgress, written
+    rows are recorded and failed ones counted as errors. With recount (for
+    the lossy dedup modes) each row's text counts come from its own text.
+    """
+    if chunk_of is None:
+        chunk_of = lambda unique_index: unique_index // SCHEDULER_BATCH_CHUNK
+    loaded = OrderedDict()
+    pending = []
+    written = 0
+    try:
+        for row, (unique_index, text) in enumerate(rows):
+            if unique_index is None:
+                continue
+            number = chunk_of(unique_index)
+            chunk = loaded.get(number)
+            if chunk is None:
+                if pending:
+                    yield writer.write(pending), written
+                    pending = []
+                chunk = loaded[number] = load_chunk(number)
+                if len(loaded) > RESULT_CHUNK_CACHE:
+                    loaded.popitem(last=False)
+            else:
+                loaded.move_to_end(number)
+            result = chunk.get(unique_index)
+            if result is None:
+                if progress is not None:
+                    progress.error()
                 continue
+            if recount:
+                result = _own_counts(result, text)
+            pending.append(dict(result, id=row + 1, text=text))
+            written += 1
+            if progress is not None:
+                progress.record(result)
+        yield writer.write(pending) + writer.close(), written
+    finally:
+        for future in futures:
+            future.cancel()
+
+def _analyze_into(results, rows, stages, mode, endpoint):
+    """Analyze a chunk of (index, text) rows into a BatchResults; runs as one batch task"""
+    results.add(_batch_analyze_chunk(rows, stages, mode, endpoint))
+    metrics.BATCH_RESULT_BYTES_PER_ROW.set(endpoint, value=results.bytes_per_row())
+    return results
+
+def _submit_unique(unique, stages, mode, endpoint='upload_csv'):
+    """Queue the distinct texts for analysis in chunks; returns (load_chunk, futures) for _result_blocks.
+    
+    Results are kept columnar in one BatchResults rather than as dicts per future.
+    """
+    results = BatchResults()
+    futures = [scheduler.submit('batch', _analyze_into, results, chunk, stages, mode, endpoint)
+               for chunk in chunked(list(enumerate(unique)))]
+    return (lambda number: futures[number].result()), futures
+
+def _checkpointed_chunk(checkpoint, number, rows, stages, mode):
+    checkpoint.save(number, _batch_analyze_chunk(rows, stages, mode, 'upload_csv'))
+
+def _checkpoint_settings(stages, mode, dedup_stats):
+    """Everything besides the input file that decides a job's analysis results"""
+    return {'stages': list(stages), 'mode': mode, 'dedup': dedup_stats['mode'],
+            'similarity': dedup_stats.get('similarity'), 'model_versions': _model_versions(stages)}
+
+def _run_upload_job(job_id, texts, row_map, unique, stages, mode, output_format, include_text, checkpoint_key):
+    """Background body of a large /upload-csv job: write the result file and report progress.
+    
+    Analyzed chunks are checkpointed to disk as they complete. Chunks a
+    previous attempt already finished are not analyzed again, and the
+    result file is assembled from the chunk files.
+    """
+    checkpoint = checkpoints.get(checkpoint_key)
+    if checkpoint is None:
+        raise RuntimeError("Checkpoint has expired")
+    chunks = chunked(list(enumerate(unique)), checkpoint.chunk_size)
+    resumed = [number for number in range(len(chunks)) if checkpoint.done(number)]
+    futures = {number: scheduler.submit('batch', _checkpointed_chunk, checkpoint, number, chunk, stages, mode)
+               for number, chunk in enumerate(chunks) if not checkpoint.done(number)}
+    jobs.update(job_id, rows_resumed=sum(len(chunks[number]) for number in resumed))
+    
+    def load_chunk(number):
+        if number in futures:
+            futures[number].result()
+        return {result['id'] - 1: result for result in checkpoint.load(number)}
+    
+    writer = result_writer(output_format, stages, include_text)
+    name = f"result.{OUTPUT_FORMATS[output_format][1]}"
+    progress = JobProgress(rows_expected=sum(1 for unique_index in row_map if unique_index is not None))
+    with open(jobs.path(job_id, name), 'wb') as f:
+        for block, _ in _result_blocks(writer, zip(row_map, texts), load_chunk, futures.values(),
+                                       lambda unique_index: unique_index // checkpoint.chunk_size, progress,
+                                       checkpoint.manifest['settings']['dedup'] in LOSSY_DEDUP_MODES):
+            f.write(block)
+            if progress.due():
+                jobs.update(job_id, rows_checkpointed=checkpoint.manifest['rows_checkpointed'], **progress.snapshot())
+    return dict(progress.snapshot(), rows_checkpointed=checkpoint.manifest['rows_checkpointed'],
+                model_versions=_model_versions(stages), result=name)
+
+def _summarize_chunk(rows, weights, stages, mode, endpoint, members=None):
+    """Analyze a chunk of (index, text) rows into a ResultSummary, counting each
+    result once per row carrying its text; runs as one batch task.
+    
+    members (for the lossy dedup modes) maps a distinct-text index to the
+    texts of its rows, whose text counts are then taken from each row.
+    """
+    summary = ResultSummary()
+    for result in _batch_analyze_chunk(rows, stages, mode, endpoint):
+        index = result['id'] - 1
+        if members is None:
+            summary.add(result, weights[index])
+        else:
+            for text in members[index]:
+                summary.add(_own_counts(result, text))
+    summary.errors = sum(weights[index] for index, _ in rows) - summary.rows
+    return summary
+
+def _summarize_blocks(blocks, stages, mode, dedup_mode, similarity, endpoint, report=None):
+    """Fold blocks of texts into one ResultSummary in memory bounded by the block size.
+    
+    Each block is deduplicated on its own and its distinct texts are
+    summarized in scheduler chunks, in parallel; the partial summaries
+    are merged here as they finish. At most SUMMARY_BLOCKS_AHEAD blocks
+    are queued ahead of the one being read. report(summary, rows read),
+    if given, is called after each merged block. Returns (summary, dedup stats).
+    """
+    summary = ResultSummary()
+    queued = deque()
+    totals = Counter()
+    
+    def merge(limit):
+        while len(queued) > limit:
+            for future in queued.popleft():
+                summary.merge(future.result())
+            if report is not None:
+                report(summary, totals['rows'])
+    
+    try:
+        for texts in blocks:
+            deduplicator = Deduplicator(dedup_mode, models().text_classifier._preprocess_text, similarity)
+            row_map, unique = deduplicator.add(texts)
+            stats = deduplicator.stats()
+            totals.update(rows=len(row_map), seconds=deduplicator.seconds,
+                          **{key: stats[key] for key in ('rows_with_text', 'exact_duplicates', 'near_duplicates',
+                                                         'analyzed')})
+            summary.skipped += len(row_map) - deduplicator.rows_with_text
+            weights = Counter(index for index in row_map if index is not None)
+            members = None
+            if dedup_mode in LOSSY_DEDUP_MODES:
+                members = {}
+                for index, text in zip(row_map, texts):
+                    if index is not None:
+                        members.setdefault(index, []).append(text)
+            queued.append([scheduler.submit('batch', _summarize_chunk, chunk, weights, stages, mode, endpoint,
+                                            members)
+                           for chunk in chunked(list(enumerate(unique)))])
+            merge(SUMMARY_BLOCKS_AHEAD)
+        merge(0)
+    finally:
+        for futures in queued:
+            for future in futures:
+                future.cancel()
+    
+    stats = {"mode": dedup_mode, "rows_with_text": totals['rows_with_text'],
+             "exact_duplicates": totals['exact_duplicates'], "near_duplicates": totals['near_duplicates'],
+             "analyzed": totals['analyzed'],
+             "dedup_ratio": round(1 - totals['analyzed'] / totals['rows_with_text'], 4)
+                            if totals['rows_with_text'] else 0.0,
+             "dedup_seconds": round(totals['seconds'], 4)}
+    if dedup_mode == 'near':
+        stats["similarity"] = similarity
+    return summary, _record_dedup(stats, totals['rows'], stages, endpoint)
+
+@app.route('/batch-summary', methods=['POST'])
+def batch_summary():
+    """Aggregates of a CSV of any size instead of per-row results.
+    
+    The file is read in blocks and never held whole. The response is a
+    summary that /summaries/merge can combine with summaries of other
+    parts of the same data.
+    """
+    try:
+        if 'file' not in request.files:
+            return jsonify({"error": "No file provided"}), 400
+        file = request.files['file']
+        if file.filename == '':
+            return jsonify({"error": "No file selected"}), 400
+        if not is_csv_filename(file.filename):
+            return jsonify({"error": "Only CSV files are supported (optionally .gz or .zst compressed)"}), 400
+        try:
+            stages = _requested_stages()
+            mode = _requested_mode()
+            dedup_mode, similarity = _requested_dedup()
+            text_column, blocks = open_text_column(file.stream)
+            summary, dedup_stats = _summarize_blocks(blocks, stages, mode, dedup_mode, similarity, 'batch_summary')
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
         
-        output.seek(0)
+        response = jsonify(dict(summary.to_dict(), text_column=text_column, stages=list(stages), dedup=dedup_stats))
+        _dedup_headers(response, dedup_stats)
+        response.headers['X-Skipped-Stages'] = ','.join(skipped_stages(stages))
+        return response
         
-        return send_file(
-            io.BytesIO(output.getvalue().encode()),
-            mimetype='text/csv',
-            as_attachment=True,
-            download_name='text_analysis_results.csv'
-        )
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+def _estimate(blocks, stages, mode, settings, endpoint, report=None):
+    """Estimate label proportions from a random sample of blocks of texts.
+    
+    One pass over the input fills a reservoir per stratum; then growing
+    rounds of the shuffled sample are analyzed until every interval is
+    within settings['margin'] or settings['sample'] rows were analyzed.
+    Each round is sized from how far the margin still is from the target
+    (the margin shrinks with the square root of the rows), at most
+    doubling the sample. report(estimate), if given, runs after each round.
+    """
+    sampler = StratifiedSampler(settings['sample'], settings['seed'])
+    rows = 0
+    for block in blocks:
+        texts, keys = block if settings['stratify'] else (block, None)
+        rows += len(texts)
+        sampler.add(texts, keys)
+    estimate = ProportionEstimate({key: reservoir.seen for key, reservoir in sampler.reservoirs.items()},
+                                  settings['confidence'])
+    margin = 1.0
+    rounds = sampler.rounds(min(SAMPLE_MIN_ROWS, settings['sample']))
+    batch = next(rounds, None)
+    while batch:
+        texts = list({text: None for _, text in batch})
+        futures = [scheduler.submit('batch', _batch_analyze_chunk, chunk, stages, mode, endpoint)
+                   for chunk in chunked(list(enumerate(texts)))]
+        results = {}
+        for future in futures:
+            results.update((texts[result['id'] - 1], result) for result in future.result())
+        for key, text in batch:
+            estimate.add(key, results.get(text))
+        margin = estimate.margin()
+        if report is not None:
+            report(estimate)
+        analyzed = sum(estimate.sampled.values()) + estimate.errors
+        if margin <= settings['margin'] or analyzed >= settings['sample']:
+            break
+        wanted = math.ceil(analyzed * ((margin / settings['margin']) ** 2 - 1))
+        try:
+            batch = rounds.send(min(max(wanted, SAMPLE_MIN_ROWS), analyzed, settings['sample'] - analyzed))
+        except StopIteration:
+            # Every reservoir is used up: small strata were analyzed in full
+            break
+    
+    response = dict(estimate.to_dict(), rows=rows, rows_with_text=sampler.rows,
+                    sampled=sum(estimate.sampled.values()), errors=estimate.errors, margin=round(margin, 4),
+                    target_margin=settings['margin'], confidence=settings['confidence'],
+                    converged=margin <= settings['margin'], stratify=settings['stratify'])
+    if settings['stratify']:
+        response['strata'] = {key: {'rows': rows_in, 'sampled': estimate.sampled[key]}
+                              for key, rows_in in estimate.strata.items()}
+    return response
+
+@app.route('/batch-estimate', methods=['POST'])
+def batch_estimate():
+    """Sampled estimates of label proportions, with confidence intervals, for a CSV of any size.
+    
+    Only the sample is analyzed; sampling continues until every
+    interval's half-width is at most margin (default SAMPLE_MARGIN).
+    """
+    try:
+        if 'file' not in request.files:
+            return jsonify({"error": "No file provided"}), 400
+        file = request.files['file']
+        if file.filename == '':
+            return jsonify({"error": "No file selected"}), 400
+        if not is_csv_filename(file.filename):
+            return jsonify({"error": "Only CSV files are supported (optionally .gz or .zst compressed)"}), 400
+        started = time.monotonic()
+        try:
+            stages = _requested_stages()
+            mode = _requested_mode()
+            settings = _requested_estimate()
+            text_column, blocks = open_text_column(file.stream, key_column=settings['stratify'])
+            estimate = _estimate(blocks, stages, mode, settings, 'batch_estimate')
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        return jsonify(dict(estimate, text_column=text_column, stages=list(stages),
+                            elapsed_seconds=round(time.monotonic() - started, 1)))
+        
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/summaries/merge', methods=['POST'])
+def merge_summaries():
+    """Combine summaries of disjoint parts of a dataset: {"summaries": [...]}"""
+    data = request.get_json(silent=True) or {}
+    parts = data.get('summaries')
+    if not isinstance(parts, list) or not parts:
+        return jsonify({"error": "summaries must be a non-empty list"}), 400
+    try:
+        summary = ResultSummary.from_dict(parts[0])
+        for part in parts[1:]:
+            summary.merge(ResultSummary.from_dict(part))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify(summary.to_dict())
+
+def _job_links(job_id):
+    return {"status_url": f"/jobs/{job_id}", "result_url": f"/jobs/{job_id}/result"}
+
+def _start_upload_job(stream, filename, text_column, texts, row_map, unique, dedup_stats, stages, mode,
+                      output_format, include_text):
+    """Run a large /upload-csv file as a checkpointed job; re-uploading the same file resumes its checkpoint"""
+    summary = {
+        "rows_total": len(texts),
+        "rows_with_text": dedup_stats['rows_with_text'],
+        "unique_rows": len(unique),
+        "dedup": dedup_stats,
+        "stages": list(stages),
+        "mode": mode,
+        "format": output_format,
+        "include_text": include_text
+    }
+    checkpoint = checkpoints.open(file_digest(stream), _checkpoint_settings(stages, mode, dedup_stats),
+                                  len(unique), SCHEDULER_BATCH_CHUNK)
+    checkpoint.save_input(stream)
+    job = jobs.create('upload_csv', filename=filename, text_column=text_column, rows_done=0,
+                      checkpoint=checkpoint.key, **summary)
+    jobs.submit(job['id'], _run_upload_job, texts, row_map, unique, stages, mode, output_format, include_text,
+                checkpoint.key)
+    return job
+
+@app.route('/upload-csv', methods=['POST'])
+def upload_csv():
+    """Bulk ingest: parse the text column, analyze each distinct text once, then
+    stream the result (small files) or return a job handle (large files)"""
+    try:
+        if 'file' not in request.files:
+            return jsonify({"error": "No file provided"}), 400
+        
+        file = request.files['file']
+        if not is_csv_filename(file.filename):
+            return jsonify({"error": "Only CSV files are supported (optionally .gz or .zst compressed)"}), 400
+        
+        try:
+            stages = _requested_stages()
+            mode = _requested_mode()
+            output_format, include_text = _requested_output()
+            dedup_mode, similarity = _requested_dedup()
+            text_column, texts = read_text_column(file.stream)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        
+        unique, row_map, dedup_stats = _deduplicate(texts, dedup_mode, similarity, stages, 'upload_csv')
+        if not unique:
+            return jsonify({"error": "Text column is empty"}), 400
+        
+        if len(unique) <= UPLOAD_CSV_STREAM_ROWS:
+            load_chunk, futures = _submit_unique(unique, stages, mode)
+            writer = result_writer(output_format, stages, include_text)
+            blocks = (block for block, _ in _result_blocks(writer, zip(row_map, texts), load_chunk, futures,
+                                                           recount=dedup_mode in LOSSY_DEDUP_MODES))
+            response = Response(stream_with_context(blocks), mimetype=OUTPUT_FORMATS[output_format][0])
+            response.headers['Content-Disposition'] = f'attachment; filename={_download_name(output_format)}'
+            response.headers['X-Skipped-Stages'] = ','.join(skipped_stages(stages))
+            response.headers['X-Rows-Total'] = str(len(texts))
+            _dedup_headers(response, dedup_stats)
+            _versions_header(response, stages)
+            return response
+        
+        job = _start_upload_job(file.stream, file.filename, text_column, texts, row_map, unique, dedup_stats,
+                                stages, mode, output_format, include_text)
+        response = jsonify(dict(job, **_job_links(job['id'])))
+        response.headers['Location'] = f"/jobs/{job['id']}"
+        return response, 202
+        
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/jobs/<job_id>', methods=['GET'])
+def job_status(job_id):
+    job = jobs.get(job_id)
+    if job is None:
+        return jsonify({"error": "Job not found"}), 404
+    return jsonify(dict(job, **_job_links(job_id)))
+
+@app.route('/jobs/<job_id>/events', methods=['GET'])
+def job_events(job_id):
+    """Server-sent events with the job's status each time its progress changes, ending when it finishes"""
+    if jobs.get(job_id) is None:
+        return jsonify({"error": "Job not found"}), 404
+    
+    def generate():
+        stream = JobEventStream()
+        yield stream.preamble
+        while True:
+            event = stream.next(jobs.get(job_id))
+            if event:
+                yield event
+            if stream.finished:
+                return
+            time.sleep(PROGRESS_EVENT_INTERVAL)
+    
+    response = Response(stream_with_context(generate()), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    # Tell nginx not to buffer the stream
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+@app.route('/jobs/<job_id>/retry', methods=['POST'])
+def retry_job(job_id):
+    """Restart a failed or orphaned /upload-csv job from its checkpoint, or an upload analysis job"""
+    try:
+        job = jobs.get(job_id)
+        if job is None:
+            return jsonify({"error": "Job not found"}), 404
+        if job['status'] == 'done' or (job['status'] in ('queued', 'running') and not jobs.orphaned(job)):
+            return jsonify({"error": f"Job is {job['status']}", "status": job['status']}), 409
+        if job['kind'] == 'profile':
+            return jsonify({"error": "A profile cannot be retried; start another one"}), 409
+        if job['kind'] in ('upload_session', 'upload_summary', 'upload_estimate'):
+            return _retry_upload_job(job)
+        if job['kind'] == 'reanalysis':
+            if not os.path.exists(jobs.path(job_id, 'input')):
+                return jsonify({"error": "Job input has expired; upload the file again"}), 410
+            jobs.update(job_id, retries=job.get('retries', 0) + 1, rows_done=0)
+            jobs.submit(job_id, _run_reanalysis_job, job['input_format'], job['format'], job['mode'],
+                        job.get('file_versions'))
+            response = jsonify(dict(jobs.get(job_id), **_job_links(job_id)))
+            response.headers['Location'] = f"/jobs/{job_id}"
+            return response, 202
+        checkpoint = checkpoints.get(job.get('checkpoint'))
+        if checkpoint is None or not os.path.exists(checkpoint.upload_path):
+            return jsonify({"error": "Job checkpoint has expired; upload the file again"}), 410
+        
+        settings = checkpoint.manifest['settings']
+        with open(checkpoint.upload_path, 'rb') as f:
+            _, texts = read_text_column(f)
+        unique, row_map, _ = deduplicate(texts, settings['dedup'], models().text_classifier._preprocess_text,
+                                         settings['similarity'] or NEAR_DUPLICATE_THRESHOLD)
+        jobs.update(job_id, retries=job.get('retries', 0) + 1)
+        jobs.submit(job_id, _run_upload_job, texts, row_map, unique, tuple(settings['stages']), settings['mode'],
+                    job['format'], job['include_text'], checkpoint.key)
+        response = jsonify(dict(jobs.get(job_id), **_job_links(job_id)))
+        response.headers['Location'] = f"/jobs/{job_id}"
+        return response, 202
+        
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+def _retry_upload_job(job):
+    """Rerun an upload session's analysis from the start of its assembled file"""
+    if uploads.get(job['upload_id']) is None:
+        return jsonify({"error": "Upload has expired; upload the file again"}), 410
+    settings = job['settings']
+    similarity = settings['similarity'] or NEAR_DUPLICATE_THRESHOLD
+    jobs.update(job['id'], retries=job.get('retries', 0) + 1, rows_done=0, rows_read=0)
+    if job['kind'] == 'upload_summary':
+        jobs.submit(job['id'], _run_summary_job, job['upload_id'], tuple(settings['stages']), settings['mode'],
+                    settings['dedup'], similarity)
+    elif job['kind'] == 'upload_estimate':
+        jobs.submit(job['id'], _run_estimate_job, job['upload_id'], tuple(settings['stages']), settings['mode'],
+                    settings['estimate'])
+    else:
+        jobs.submit(job['id'], _run_stream_job, job['upload_id'], tuple(settings['stages']), settings['mode'],
+                    job['format'], job['include_text'], settings['dedup'], similarity)
+    response = jsonify(dict(jobs.get(job['id']), **_job_links(job['id'])))
+    response.headers['Location'] = f"/jobs/{job['id']}"
+    return response, 202
+
+def _run_stream_job(job_id, upload_id, stages, mode, output_format, include_text, dedup_mode, similarity):
+    """Background body of an upload analysis job: parse the upload block by block as
+    its chunks arrive, analyze each distinct text once and write the result file.
+    
+    The next block is parsed and queued before the rows of the current one
+    are written, so analysis overlaps both the upload and the parsing.
+    """
+    endpoint = 'analyze_upload'
+    deduplicator = Deduplicator(dedup_mode, models().text_classifier._preprocess_text, similarity)
+    results = BatchResults()
+    # First distinct-text index of each queued chunk; chunks end wherever a block ends
+    chunk_starts = []
+    futures = []
+    
+    def admit(texts):
+        row_map, new = deduplicator.add(texts)
+        for chunk in chunked(list(enumerate(new, deduplicator.unique_count - len(new)))):
+            chunk_starts.append(chunk[0][0])
+            futures.append(scheduler.submit('batch', _analyze_into, results, chunk, stages, mode, endpoint))
+        return list(zip(row_map, texts))
+    
+    def rows(blocks):
+        ahead = []
+        for texts in blocks:
+            admitted = admit(texts)
+            yield from ahead
+            ahead = admitted
+        yield from ahead
+    
+    writer = result_writer(output_format, stages, include_text)
+    name = f"result.{OUTPUT_FORMATS[output_format][1]}"
+    progress = JobProgress()
+    with uploads.reader(upload_id) as reader:
+        size = reader.raw.size
+        text_column, blocks = open_text_column(reader)
+        jobs.update(job_id, text_column=text_column)
+        with open(jobs.path(job_id, name), 'wb') as f:
+            for block, _ in _result_blocks(writer, rows(blocks), lambda number: futures[number].result(), futures,
+                                           lambda index: bisect.bisect_right(chunk_starts, index) - 1, progress,
+                                           dedup_mode in LOSSY_DEDUP_MODES):
+                f.write(block)
+                if progress.due():
+                    bytes_read = reader.tell()
+                    # The row count is unknown until the end; extrapolate from the bytes parsed so far
+                    if bytes_read:
+                        progress.rows_expected = round(deduplicator.rows_with_text * size / bytes_read)
+                    jobs.update(job_id, rows_read=deduplicator.rows, unique_rows=deduplicator.unique_count,
+                                bytes_read=bytes_read, result_bytes_per_row=results.bytes_per_row(),
+                                **progress.snapshot())
+    
+    progress.rows_expected = deduplicator.rows_with_text
+    dedup_stats = _record_dedup(deduplicator.stats(), deduplicator.rows, stages, endpoint)
+    return dict(progress.snapshot(), rows_read=deduplicator.rows, rows_total=deduplicator.rows,
+                rows_with_text=dedup_stats['rows_with_text'], unique_rows=deduplicator.unique_count,
+                dedup=dedup_stats, bytes_read=size, result_bytes_per_row=results.bytes_per_row(),
+                model_versions=_model_versions(stages), result=name)
+
+def _run_summary_job(job_id, upload_id, stages, mode, dedup_mode, similarity):
+    """Background body of an upload summary job: fold the upload into a ResultSummary
+    block by block as its chunks arrive and write it as summary.json"""
+    with uploads.reader(upload_id) as reader:
+        text_column, blocks = open_text_column(reader)
+        jobs.update(job_id, text_column=text_column)
+        started = time.monotonic()
+        
+        def report(summary, rows_read):
+            jobs.update(job_id, rows_read=rows_read, rows_done=summary.rows, errors=summary.errors,
+                        bytes_read=reader.tell(), elapsed_seconds=round(time.monotonic() - started, 1))
+        
+        summary, dedup_stats = _summarize_blocks(blocks, stages, mode, dedup_mode, similarity, 'analyze_upload',
+                                                 report)
+        size = reader.raw.size
+    name = 'summary.json'
+    with open(jobs.path(job_id, name), 'w') as f:
+        json.dump(dict(summary.to_dict(), text_column=text_column, stages=list(stages), dedup=dedup_stats), f)
+    return dict(rows_read=summary.rows + summary.errors + summary.skipped, rows_done=summary.rows,
+                errors=summary.errors, unique_rows=dedup_stats['analyzed'], dedup=dedup_stats, bytes_read=size,
+                elapsed_seconds=round(time.monotonic() - started, 1), result=name)
+
+def _run_estimate_job(job_id, upload_id, stages, mode, settings):
+    """Background body of an upload estimate job: sample the upload as its chunks
+    arrive, then analyze rounds of the sample and write the estimate as estimate.json"""
+    started = time.monotonic()
+    
+    def report(estimate):
+        jobs.update(job_id, rows_done=sum(estimate.sampled.values()), errors=estimate.errors,
+                    margin=round(estimate.margin(), 4), elapsed_seconds=round(time.monotonic() - started, 1))
+    
+    with uploads.reader(upload_id) as reader:
+        text_column, blocks = open_text_column(reader, key_column=settings['stratify'])
+        jobs.update(job_id, text_column=text_column)
+        estimate = _estimate(blocks, stages, mode, settings, 'analyze_upload', report)
+    name = 'estimate.json'
+    with open(jobs.path(job_id, name), 'w') as f:
+        json.dump(dict(estimate, text_column=text_column, stages=list(stages)), f)
+    return dict(rows_read=estimate['rows'], rows_done=estimate['sampled'], errors=estimate['errors'],
+                margin=estimate['margin'], converged=estimate['converged'],
+                elapsed_seconds=round(time.monotonic() - started, 1), result=name)
+
+def _upload_response(session, status=200):
+    response = jsonify(dict(session, upload_url=f"/uploads/{session['id']}"))
+    response.headers['Location'] = f"/uploads/{session['id']}"
+    return response, status
+
+@app.route('/uploads', methods=['POST'])
+def create_upload():
+    """Start a resumable upload: send filename and size (and optionally chunk_size),
+    then PUT each chunk to /uploads/<id>/chunks/<number>"""
+    data = request.get_json(silent=True) or {}
+    if not is_csv_filename(data.get('filename')):
+        return jsonify({"error": "Only CSV files are supported (optionally .gz or .zst compressed)"}), 400
+    try:
+        session = uploads.create(data['filename'], data.get('size'), data.get('chunk_size'))
+    except UploadError as e:
+        return jsonify({"error": str(e)}), e.status
+    return _upload_response(session, 201)
+
+@app.route('/uploads/<upload_id>', methods=['GET'])
+def upload_status(upload_id):
+    session = uploads.get(upload_id)
+    if session is None:
+        return jsonify({"error": "Upload not found"}), 404
+    return _upload_response(session)
+
+@app.route('/uploads/<upload_id>', methods=['DELETE'])
+def abort_upload(upload_id):
+    if uploads.get(upload_id) is None or not uploads.abort(upload_id):
+        return jsonify({"error": "Upload not found"}), 404
+    return '', 204
+
+@app.route('/uploads/<upload_id>/chunks/<int:number>', methods=['PUT'])
+def upload_chunk(upload_id, number):
+    """Store one chunk; the X-Chunk-Sha256 header carries the hex SHA-256 of the body"""
+    try:
+        session = uploads.write_chunk(upload_id, number, request.stream, request.headers.get('X-Chunk-Sha256'))
+    except UploadError as e:
+        return jsonify({"error": str(e)}), e.status
+    return jsonify({"id": upload_id, "number": number, "chunks": session['chunks'],
+                    "chunks_received": len(session['received']), "bytes_received": session['bytes_received'],
+                    "complete": session['complete']})
+
+@app.route('/uploads/<upload_id>/finalize', methods=['POST'])
+def finalize_upload(upload_id):
+    """Confirm every chunk arrived; an optional sha256 of the whole file is verified"""
+    data = request.get_json(silent=True) or {}
+    try:
+        session = uploads.finalize(upload_id, data.get('sha256'))
+    except UploadError as e:
+        return jsonify({"error": str(e)}), e.status
+    return _upload_response(session)
+
+def _start_upload_analysis(upload_id, session, aggregate, stages, mode, output_format, include_text, dedup_mode,
+                           similarity, estimate):
+    """Create and start an upload's analysis job; returns it, or None if another job claimed the upload first"""
+    settings = {'stages': list(stages), 'mode': mode, 'dedup': dedup_mode,
+                'similarity': similarity if dedup_mode == 'near' else None, 'estimate': estimate}
+    job = jobs.create(f'upload_{aggregate}' if aggregate else 'upload_session', upload_id=upload_id,
+                      filename=session['filename'], rows_read=0, rows_done=0, stages=list(stages), mode=mode,
+                      format=output_format, include_text=include_text, settings=settings)
+    if not uploads.claim_job(upload_id, job['id']):
+        jobs.update(job['id'], status='failed', finished=time.time(), error="Upload is already being analyzed")
+        return None
+    if aggregate == 'summary':
+        jobs.submit(job['id'], _run_summary_job, upload_id, stages, mode, dedup_mode, similarity)
+    elif aggregate == 'estimate':
+        jobs.submit(job['id'], _run_estimate_job, upload_id, stages, mode, estimate)
+    else:
+        jobs.submit(job['id'], _run_stream_job, upload_id, stages, mode, output_format, include_text, dedup_mode,
+                    similarity)
+    return job
+
+@app.route('/uploads/<upload_id>/analyze', methods=['POST'])
+def analyze_upload(upload_id):
+    """Start the upload's analysis job; it may start before the upload is finalized
+    and reads the file as its chunks arrive. format=summary produces a
+    /batch-summary style summary instead of per-row results, and
+    format=estimate a /batch-estimate style sampled estimate."""
+    session = uploads.get(upload_id)
+    if session is None:
+        return jsonify({"error": "Upload not found"}), 404
+    if session['job'] is not None:
+        return jsonify({"error": "Upload is already being analyzed", "job": session['job'],
+                        **_job_links(session['job'])}), 409
+    data = request.get_json(silent=True) or {}
+    aggregate = str(data.get('format', request.values.get('format', ''))).strip().lower()
+    aggregate = aggregate if aggregate in ('summary', 'estimate') else None
+    try:
+        stages = _requested_stages(data)
+        mode = _requested_mode(data)
+        output_format, include_text = (aggregate, False) if aggregate else _requested_output(data)
+        dedup_mode, similarity = _requested_dedup(data)
+        estimate = _requested_estimate(data) if aggregate == 'estimate' else None
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    
+    job = _start_upload_analysis(upload_id, session, aggregate, stages, mode, output_format, include_text,
+                                 dedup_mode, similarity, estimate)
+    if job is None:
+        return jsonify({"error": "Upload is already being analyzed"}), 409
+    response = jsonify(dict(job, **_job_links(job['id'])))
+    response.headers['Location'] = f"/jobs/{job['id']}"
+    return response, 202
+
+@app.route('/jobs/<job_id>/result', methods=['GET'])
+def job_result(job_id):
+    job = jobs.get(job_id)
+    if job is None:
+        return jsonify({"error": "Job not found"}), 404
+    if job['status'] != 'done':
+        return jsonify({"error": f"Job is {job['status']}", "status": job['status']}), 409
+    if job['kind'] in ('upload_summary', 'upload_estimate'):
+        return send_file(jobs.path(job_id, job['result']), mimetype='application/json')
+    if job['kind'] == 'profile':
+        response = send_file(jobs.path(job_id, job['result']), mimetype='text/plain')
+        response.headers['X-Profile-Samples'] = str(job['samples'])
+        response.headers['X-Profile-Requests'] = str(job['requests_seen'])
+        return response
+    output_format = job.get('format', 'csv')
+    response = send_file(jobs.path(job_id, job['result']), mimetype=OUTPUT_FORMATS[output_format][0],
+                         as_attachment=True, download_name=_download_name(output_format))
+    if job.get('model_versions'):
+        response.headers['X-Model-Versions'] = format_versions(job['model_versions'])
+    return response
+
+@app.route('/model-versions', methods=['GET'])
+def model_versions():
+    """Version tag of each stage's loaded model, as carried by results"""
+    return jsonify(models().pipeline.model_versions())
+
+def _refresh_results(results, current, mode, endpoint):
+    """Recompute the stale stages of results in place; returns rows refreshed per stage.
+    
+    A stage is stale when its model version tag differs from current.
+    Rows needing the same stages are analyzed together, each distinct
+    text once; stages that are still current keep their stored output.
+    Rows without text, or whose analysis fails, are left as they were.
+    """
+    groups = {}
+    for result in results:
+        if not result.get('text'):
+            continue
+        stale = tuple(stage for stage in STAGES
+                      if stage in result and result['model_versions'].get(stage) != current[stage])
+        if stale:
+            groups.setdefault(stale, {}).setdefault(result['text'], []).append(result)
+    
+    queued = []
+    for stale, rows in groups.items():
+        texts = list(rows)
+        queued.extend((stale, rows, texts, scheduler.submit('batch', _batch_analyze_chunk, chunk, stale, mode,
+                                                            endpoint))
+                      for chunk in chunked(list(enumerate(texts))))
+    refreshed = Counter()
+    for stale, rows, texts, future in queued:
+        for fresh in future.result():
+            for result in rows[texts[fresh['id'] - 1]]:
+                result.update((stage, fresh[stage]) for stage in stale)
+                result['model_versions'] = dict(result['model_versions'], **fresh['model_versions'])
+                refreshed.update(stale)
+    return refreshed
+
+def _run_reanalysis_job(job_id, input_format, output_format, mode, file_versions=None):
+    """Background body of a re-analysis job: stream the stored results block by block,
+    refresh their stale stages and write them in output_format.
+    
+    file_versions are the versions of rows that carry none of their own,
+    as CSV result files do.
+    """
+    endpoint = 'reanalyze'
+    pipeline = models().pipeline
+    current = pipeline.model_versions()
+    name = f"result.{OUTPUT_FORMATS[output_format][1]}"
+    writer = None
+    stages = ()
+    rows = 0
+    refreshed = Counter()
+    with open(jobs.path(job_id, 'input'), 'rb') as source, open(jobs.path(job_id, name), 'wb') as f:
+        for results in read_results(source, input_format):
+            if writer is None:
+                # The file's stages are those its first block carries
+                stages = tuple(stage for stage in STAGES if any(stage in result for result in results))
+                writer = result_writer(output_format, stages, include_text=True)
+            if file_versions:
+                for result in results:
+                    result['model_versions'] = result['model_versions'] or dict(file_versions)
+            refreshed.update(_refresh_results(results, current, mode, endpoint))
+            rows += len(results)
+            f.write(writer.write(results))
+            jobs.update(job_id, rows_done=rows, stages_refreshed=dict(refreshed))
+        if writer is None:
+            writer = result_writer(output_format, STAGES, include_text=True)
+        f.write(writer.close())
+    
+    # Share of a full rerun's analyzer time that was spent, from the pipeline's per-stage costs
+    full_cost = rows * sum(pipeline.expected_cost(stage) for stage in stages)
+    spent = sum(count * pipeline.expected_cost(stage) for stage, count in refreshed.items())
+    return dict(rows_done=rows, rows_total=rows, stages=list(stages), stages_refreshed=dict(refreshed),
+                model_versions=current, cost_fraction=round(spent / full_cost, 4) if full_cost else None,
+                result=name)
+
+def _start_reanalysis(save, filename, input_format, output_format, mode, file_versions):
+    """Create a re-analysis job, store its input with save(path) and start it"""
+    job = jobs.create('reanalysis', filename=filename, input_format=input_format, format=output_format,
+                      include_text=True, mode=mode, file_versions=file_versions, rows_done=0)
+    save(jobs.path(job['id'], 'input'))
+    jobs.submit(job['id'], _run_reanalysis_job, input_format, output_format, mode, file_versions)
+    return job
+
+@app.route('/reanalyze', methods=['POST'])
+def reanalyze():
+    """Bring a stored result file (CSV, NDJSON, Parquet or Arrow, with text) up to date
+    with the loaded models by recomputing only the stages whose version tags are stale"""
+    try:
+        if 'file' not in request.files:
+            return jsonify({"error": "No file provided"}), 400
+        file = request.files['file']
+        input_format = format_for_filename(file.filename)
+        if input_format is None:
+            return jsonify({"error": "Upload a result file: .csv, .ndjson, .parquet or .arrow"}), 400
+        try:
+            mode = _requested_mode()
+            # CSV result files carry their versions outside the file (the X-Model-Versions header they came with)
+            file_versions = parse_versions(request.values.get('model_versions'))
+            output_format = resolve_format(request.values.get('format') or input_format)
+            if input_format in ('parquet', 'arrow'):
+                resolve_format(input_format)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        
+        job = _start_reanalysis(file.save, file.filename, input_format, output_format, mode, file_versions)
+        response = jsonify(dict(job, **_job_links(job['id'])))
+        response.headers['Location'] = f"/jobs/{job['id']}"
+        return response, 202
+        
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/feedback', methods=['POST'])
+def feedback():
+    """Log corrected sentiment and/or emotion labels for one text or a records list.
+    
+    Only the append happens here; the background trainer applies the
+    records to the models and publishes new versions (see utils/feedback.py).
+    """
+    try:
+        try:
+            records = parse_feedback(request.get_json(silent=True))
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        
+        version = models().version
+        received = time.time()
+        feedback_log.append([dict(record, model_version=version, received=received) for record in records])
+        for stage in FEEDBACK_LABELS:
+            metrics.FEEDBACK_RECORDS.inc(stage, 'received', amount=sum(stage in record for record in records))
+        return jsonify({"accepted": len(records), "model_version": version}), 202
         
     except Exception as e:
         return jsonify({"error": str(e)}), 500
@@ -354,7 +1648,12 @@ def sentiment_only():
         if not text:
             return jsonify({"error": "No text provided"}), 400
         
-        result = text_classifier.predict_sentiment(text)
+        try:
+            mode = _requested_mode(data)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        
+        result = scheduler.run('interactive', _timed_stage, 'sentiment', models().text_classifier.predict_sentiment, text, mode=mode)
         return jsonify(result)
         
     except Exception as e:
@@ -369,11 +1668,11 @@ def topics_only():
         if not text:
             return jsonify({"error": "No text provided"}), 400
         
-        result = text_classifier.predict_topics(text)
+        result = scheduler.run('interactive', _timed_stage, 'topics', models().text_classifier.predict_topics, text)
         return jsonify({"topics": result})
         
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
 if __name__ == '__main__':
-    app.run(debug=True, host='0.0.0.0', port=5000)
+    create_app().run(debug=True, host='0.0.0.0', port=5000)
@@ -0,0 +1,714 @@
+"""ASGI entry point serving the same API as app.py.
+
+Run from backend/:
+    uvicorn asgi:create_app --factory --port 5000
+    gunicorn -c gunicorn.conf.py -k uvicorn.workers.UvicornWorker 'asgi:create_app()'
+
+Request bodies and client I/O are handled on the event loop, so a slow
+upload or a slow reader does not hold a thread. Analyzer calls go to
+the same bounded priority scheduler the Flask app uses and are awaited
+without blocking the loop. /batch-analyze streams its results back as
+chunks finish. Every route that takes a file (/batch-analyze,
+/upload-csv, /batch-summary, /batch-estimate, /reanalyze and the
+/uploads chunk endpoint) is native, so its body is spooled to a
+temporary file rather than held in memory. Routes without a native
+handler are served by the Flask app through WSGIMiddleware.
+"""
+import io
+import csv
+import time
+import shutil
+import asyncio
+import tempfile
+import functools
+
+import pandas as pd
+from starlette.applications import Starlette
+from starlette.background import BackgroundTask
+from starlette.middleware import Middleware
+from starlette.middleware.cors import CORSMiddleware
+from starlette.middleware.wsgi import WSGIMiddleware
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.responses import JSONResponse, Response, StreamingResponse
+from starlette.routing import Mount, Route
+
+import app as flask_api
+from utils import metrics, profiling
+from utils.admission import AdmissionRejected, AsyncAdmissionController, build_controllers
+from utils.ingest import find_text_column, is_csv_filename, read_text_column, open_text_column
+from utils.compression import (open_decompressed, negotiate_encoding, StreamCompressor, COMPRESS_MIN_BYTES,
+                               COMPRESSIBLE_MIMETYPES)
+from utils.metrics import server_timing_header
+from utils.dedup import resolve_dedup, parse_similarity, LOSSY_DEDUP_MODES
+from utils.result_formats import OUTPUT_FORMATS, resolve_format, result_writer, format_for_filename
+from utils.pipeline import parse_fields, resolve_fields, resolve_mode, parse_deadline_ms, skipped_stages
+from utils.scheduler import chunked
+from utils.progress import JobEventStream, PROGRESS_EVENT_INTERVAL
+from utils.versions import format_versions, parse_versions
+from utils.uploads import UploadError, UPLOAD_MAX_CHUNK_BYTES
+
+admission_controllers = build_controllers(AsyncAdmissionController)
+
+# Raw request bodies (upload chunks) are kept in memory up to this size, then spooled to disk
+SPOOL_MAX_MEMORY = 1024 * 1024
+# Room for the multipart framing and form fields around an uploaded file
+FORM_OVERHEAD_BYTES = 64 * 1024
+
+
+def _run(priority, fn, *args, **kwargs):
+    """Submit analyzer work to the shared scheduler and await it from the event loop"""
+    return asyncio.wrap_future(flask_api.scheduler.submit(priority, fn, *args, **kwargs))
+
+
+def endpoint(admission=None, max_body=None):
+    """Wrap a handler with request metrics, admission control and JSON error handling.
+
+    The request body is received before an admission slot is taken, so a
+    slow upload never holds a slot; a Content-Length over max_body bytes
+    is refused before any of it is read. The slot and request metrics
+    are released in a background task, which Starlette runs after the
+    response body has been sent, so streamed responses hold their slot
+    until they finish.
+    """
+    def decorate(handler):
+        name = handler.__name__
+
+        @functools.wraps(handler)
+        async def wrapped(request):
+            request.state.start = time.perf_counter()
+            # Pinned in this request's task context, which the scheduler copies to its tasks
+            models = flask_api.model_registry.pin()
+            # The event loop's CPU time is shared by every request, so only scheduler tasks are counted
+            cpu_account = metrics.open_cpu_account()
+            metrics.REQUESTS_IN_FLIGHT.inc(name)
+            controller = admission_controllers[admission] if admission else None
+            admitted_at = None
+            length = request.headers.get('content-length', '')
+            try:
+                if max_body is not None and length.isdigit() and int(length) > max_body:
+                    response = _error(f"Request body must be at most {max_body} bytes", 413)
+                else:
+                    await _receive_body(request)
+                    if controller is not None:
+                        admitted_at = await controller.acquire()
+                    response = await handler(request)
+            except AdmissionRejected as e:
+                response = JSONResponse({"error": str(e), "retry_after": e.retry_after}, status_code=e.status,
+                                        headers={'Retry-After': str(e.retry_after)})
+            except Exception as e:
+                response = JSONResponse({"error": str(e)}, status_code=500)
+
+            async def finish():
+                if admitted_at is not None:
+                    await controller.release(admitted_at)
+                if getattr(request.state, 'body_file', None) is not None:
+                    request.state.body_file.close()
+                metrics.REQUESTS_TOTAL.inc(name, request.method, response.status_code)
+                metrics.REQUEST_SECONDS.observe(name, value=time.perf_counter() - request.state.start)
+                metrics.REQUEST_CPU_SECONDS.observe(name, value=cpu_account.seconds)
+                metrics.REQUESTS_IN_FLIGHT.dec(name)
+
+            response.headers['X-Model-Version'] = models.version
+            response.background = BackgroundTask(finish)
+            return response
+        return wrapped
+    return decorate
+
+
+async def _receive_body(request):
+    """Read the whole body on the event loop. Multipart uploads and PUT bodies (upload
+    chunks) are spooled, to disk past SPOOL_MAX_MEMORY, rather than buffered"""
+    if request.method not in ('POST', 'PUT', 'PATCH'):
+        return
+    if request.headers.get('content-type', '').startswith('multipart/form-data'):
+        await request.form()
+    elif request.method == 'PUT':
+        spool = request.state.body_file = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_MEMORY)
+        async for block in request.stream():
+            if spool.tell() + len(block) > SPOOL_MAX_MEMORY:
+                await asyncio.to_thread(spool.write, block)
+            else:
+                spool.write(block)
+        spool.seek(0)
+    else:
+        await request.body()
+
+
+async def _json_body(request):
+    try:
+        data = await request.json()
+    except ValueError:
+        return None
+    return data if isinstance(data, dict) else None
+
+
+def _option(request, data, *names):
+    """First of names found in data (a JSON body or form), then the query string"""
+    for name in names:
+        if data and data.get(name) is not None:
+            return data[name]
+    for name in names:
+        if name in request.query_params:
+            return request.query_params[name]
+    return None
+
+
+def _error(message, status=400):
+    return JSONResponse({"error": message}, status_code=status)
+
+
+@endpoint()
+async def health_check(request):
+    return JSONResponse({"status": "healthy", "message": "Text Classification API is running"})
+
+
+@endpoint()
+async def metrics_endpoint(request):
+    return Response(metrics.registry.render(), media_type='text/plain; version=0.0.4')
+
+
+@endpoint('interactive')
+async def classify_text(request):
+    data = await _json_body(request)
+    text = data.get('text', '') if data else ''
+    if not text:
+        return _error("No text provided")
+
+    try:
+        stages = resolve_fields(parse_fields(_option(request, data, 'fields', 'include')))
+        mode = resolve_mode(_option(request, data, 'mode'))
+        deadline_ms = parse_deadline_ms(request.headers.get('X-Request-Deadline-Ms')
+                                        or _option(request, data, 'deadline_ms'))
+    except ValueError as e:
+        return _error(str(e))
+    deadline = None
+    if deadline_ms is not None:
+        deadline = request.state.start + (deadline_ms - flask_api.DEADLINE_RESERVE_MS) / 1000
+
+    timings = {}
+    if str(_option(request, data, 'profile') or '').lower() in ('1', 'true', 'yes'):
+        if not profiling.profiling_enabled():
+            return _error("Profiling is disabled", 403)
+        token = request.headers.get('X-Profiling-Token') or request.query_params.get('token')
+        if not profiling.check_token(token):
+            return _error("Invalid profiling token", 403)
+        result, profile_summary = await _run('interactive', profiling.profile_call, flask_api._analyze_text,
+                                             text, timings, stages, mode, deadline)
+        result["profile"] = profile_summary
+    else:
+        result = await _run('interactive', flask_api._analyze_text, text, timings, stages, mode, deadline)
+
+    total_ms = (time.perf_counter() - request.state.start) * 1000
+    return JSONResponse(result, headers={'Server-Timing': server_timing_header(timings, total_ms)})
+
+
+@endpoint('interactive')
+async def sentiment_only(request):
+    data = await _json_body(request)
+    text = data.get('text', '') if data else ''
+    if not text:
+        return _error("No text provided")
+    try:
+        mode = resolve_mode(_option(request, data, 'mode'))
+    except ValueError as e:
+        return _error(str(e))
+    result = await _run('interactive', flask_api._timed_stage, 'sentiment',
+                        flask_api.models().text_classifier.predict_sentiment, text, mode=mode)
+    return JSONResponse(result)
+
+
+@endpoint('interactive')
+async def topics_only(request):
+    data = await _json_body(request)
+    text = data.get('text', '') if data else ''
+    if not text:
+        return _error("No text provided")
+    result = await _run('interactive', flask_api._timed_stage, 'topics',
+                        flask_api.models().text_classifier.predict_topics, text)
+    return JSONResponse({"topics": result})
+
+
+def _form_file(form, csv_only=True):
+    """The uploaded file of a form; returns (file, None) or (None, error response)"""
+    upload = form.get('file')
+    if upload is None or not hasattr(upload, 'filename'):
+        return None, _error("No file provided")
+    if upload.filename == '':
+        return None, _error("No file selected")
+    if csv_only and not is_csv_filename(upload.filename):
+        return None, _error("Only CSV files are supported (optionally .gz or .zst compressed)")
+    return upload, None
+
+
+async def _uploaded_csv(form, max_rows, max_bytes=None):
+    """Read the uploaded CSV; returns (rows, None) or (None, error response).
+
+    The multipart body has already been spooled by the event loop as it
+    arrived; only parsing the finished file runs on a worker.
+    """
+    upload, error = _form_file(form)
+    if error is not None:
+        return None, error
+    if max_bytes is not None and upload.size is not None and upload.size > max_bytes:
+        return None, _error(f"File size must be less than {max_bytes // (1024 * 1024)}MB")
+
+    try:
+        df = await _run('batch', lambda: pd.read_csv(open_decompressed(upload.file), nrows=max_rows))
+    except Exception as e:
+        return None, _error(f"Failed to read CSV file: {str(e)}")
+    if df.empty:
+        return None, _error("CSV file is empty")
+
+    text_column = find_text_column(df.columns)
+    if text_column is None:
+        return None, _error(f"CSV must have a 'text' column. Found columns: {list(df.columns)}")
+    if df[text_column].isna().all():
+        return None, _error("Text column is empty")
+    return [(index, str(value)) for index, value in df[text_column].items()], None
+
+
+def _stream_csv(header, futures, to_row):
+    """Yield CSV text as each chunk future completes; cancel the rest if the client goes away"""
+    async def generate():
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(header)
+        try:
+            for future in futures:
+                for result in await asyncio.wrap_future(future):
+                    writer.writerow(to_row(result))
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+            if buffer.tell():
+                yield buffer.getvalue()
+        finally:
+            for future in futures:
+                future.cancel()
+    return generate()
+
+
+def _stream_blocks(blocks, futures):
+    """Drive a blocking generator of (bytes, rows) blocks from a worker thread, one block at a time.
+
+    If the client goes away the chunk futures are cancelled, which also
+    ends a next() still waiting on one of them.
+    """
+    async def generate():
+        try:
+            while True:
+                block = await asyncio.to_thread(next, blocks, None)
+                if block is None:
+                    break
+                if block[0]:
+                    yield block[0]
+        finally:
+            for future in futures:
+                future.cancel()
+    return generate()
+
+
+def _output_options(request, data):
+    """Result format and include_text from a form or JSON body, then the query string"""
+    output_format = resolve_format(_option(request, data, 'format'))
+    include_text = _option(request, data, 'include_text')
+    include_text = str('true' if include_text is None else include_text).lower()
+    if include_text not in ('1', 'true', 'yes', '0', 'false', 'no'):
+        raise ValueError(f"Invalid include_text: {include_text}")
+    return output_format, include_text in ('1', 'true', 'yes')
+
+
+def _dedup_options(request, data):
+    return resolve_dedup(_option(request, data, 'dedup')), parse_similarity(_option(request, data, 'similarity'))
+
+
+def _stages_option(request, data):
+    return resolve_fields(parse_fields(_option(request, data, 'fields', 'include')))
+
+
+@endpoint('batch', max_body=flask_api.BATCH_ANALYZE_MAX_BYTES + FORM_OVERHEAD_BYTES)
+async def batch_analyze(request):
+    async with request.form() as form:
+        try:
+            stages = resolve_fields(parse_fields(_option(request, form, 'fields', 'include')))
+            mode = resolve_mode(_option(request, form, 'mode'))
+            output_format, include_text = _output_options(request, form)
+            dedup_mode, similarity = _dedup_options(request, form)
+        except ValueError as e:
+            return _error(str(e))
+        # Same 50 row and 10MB limits as the Flask endpoint
+        rows, error = await _uploaded_csv(form, max_rows=50, max_bytes=flask_api.BATCH_ANALYZE_MAX_BYTES)
+    if error is not None:
+        return error
+
+    texts = [text for _, text in rows]
+    unique, row_map, dedup_stats = await _run('batch', flask_api._deduplicate, texts, dedup_mode, similarity,
+                                              stages, 'batch_analyze')
+    load_chunk, futures = flask_api._submit_unique(unique, stages, mode, 'batch_analyze')
+    writer = result_writer(output_format, stages, include_text)
+    return StreamingResponse(
+        _stream_blocks(flask_api._result_blocks(writer, zip(row_map, texts), load_chunk, futures,
+                                                recount=dedup_mode in LOSSY_DEDUP_MODES), futures),
+        media_type=OUTPUT_FORMATS[output_format][0],
+        headers={
+            'Content-Disposition': f'attachment; filename="{flask_api._download_name(output_format)}"',
+            'X-Skipped-Stages': ','.join(skipped_stages(stages)),
+            'X-Unique-Rows': str(dedup_stats['analyzed']),
+            'X-Dedup-Ratio': str(dedup_stats['dedup_ratio']),
+            'X-Model-Versions': format_versions(flask_api._model_versions(stages))
+        })
+
+
+def _simple_csv_row(result):
+    sentiment = result['sentiment']
+    return [result['id'], result['text'], sentiment['label'], sentiment['confidence'], result['length']]
+
+
+@endpoint('batch')
+async def simple_batch(request):
+    async with request.form() as form:
+        try:
+            mode = resolve_mode(_option(request, form, 'mode'))
+        except ValueError as e:
+            return _error(str(e))
+        # Max 20 rows, as in the Flask endpoint
+        rows, error = await _uploaded_csv(form, max_rows=20)
+    if error is not None:
+        return error
+
+    futures = [flask_api.scheduler.submit('batch', flask_api._simple_batch_chunk, chunk, mode)
+               for chunk in chunked(rows)]
+    return StreamingResponse(
+        _stream_csv(['ID', 'Text', 'Sentiment', 'Confidence', 'Length'], futures, _simple_csv_row),
+        media_type='text/csv',
+        headers={'Content-Disposition': 'attachment; filename="simple_analysis_results.csv"'})
+
+
+def _job_response(job):
+    return JSONResponse(dict(job, **flask_api._job_links(job['id'])), status_code=202,
+                        headers={'Location': f"/jobs/{job['id']}"})
+
+
+@endpoint('batch')
+async def upload_csv(request):
+    """Bulk ingest as in the Flask endpoint: stream the result of a small file, or start a
+    checkpointed job for a large one"""
+    async with request.form() as form:
+        upload, error = _form_file(form)
+        if error is not None:
+            return error
+        try:
+            stages = _stages_option(request, form)
+            mode = resolve_mode(_option(request, form, 'mode'))
+            output_format, include_text = _output_options(request, form)
+            dedup_mode, similarity = _dedup_options(request, form)
+            text_column, texts = await _run('batch', read_text_column, upload.file)
+        except ValueError as e:
+            return _error(str(e))
+
+        unique, row_map, dedup_stats = await _run('batch', flask_api._deduplicate, texts, dedup_mode, similarity,
+                                                  stages, 'upload_csv')
+        if not unique:
+            return _error("Text column is empty")
+        if len(unique) > flask_api.UPLOAD_CSV_STREAM_ROWS:
+            # The spooled file is hashed and copied to the checkpoint before the form is closed
+            job = await asyncio.to_thread(flask_api._start_upload_job, upload.file, upload.filename, text_column,
+                                          texts, row_map, unique, dedup_stats, stages, mode, output_format,
+                                          include_text)
+            return _job_response(job)
+
+    load_chunk, futures = flask_api._submit_unique(unique, stages, mode)
+    writer = result_writer(output_format, stages, include_text)
+    return StreamingResponse(
+        _stream_blocks(flask_api._result_blocks(writer, zip(row_map, texts), load_chunk, futures,
+                                                recount=dedup_mode in LOSSY_DEDUP_MODES), futures),
+        media_type=OUTPUT_FORMATS[output_format][0],
+        headers={
+            'Content-Disposition': f'attachment; filename="{flask_api._download_name(output_format)}"',
+            'X-Skipped-Stages': ','.join(skipped_stages(stages)),
+            'X-Rows-Total': str(len(texts)),
+            'X-Unique-Rows': str(dedup_stats['analyzed']),
+            'X-Dedup-Ratio': str(dedup_stats['dedup_ratio']),
+            'X-Model-Versions': format_versions(flask_api._model_versions(stages))
+        })
+
+
+def _summarize_file(file, stages, mode, dedup_mode, similarity):
+    text_column, blocks = open_text_column(file)
+    summary, dedup_stats = flask_api._summarize_blocks(blocks, stages, mode, dedup_mode, similarity,
+                                                       'batch_summary')
+    return dict(summary.to_dict(), text_column=text_column, stages=list(stages), dedup=dedup_stats), dedup_stats
+
+
+@endpoint('batch')
+async def batch_summary(request):
+    """Aggregates of a CSV of any size; the spooled file is read in blocks, never whole"""
+    async with request.form() as form:
+        upload, error = _form_file(form)
+        if error is not None:
+            return error
+        try:
+            stages = _stages_option(request, form)
+            mode = resolve_mode(_option(request, form, 'mode'))
+            dedup_mode, similarity = _dedup_options(request, form)
+            # A plain thread rather than a scheduler task, since it waits on the scheduler tasks it submits
+            summary, dedup_stats = await asyncio.to_thread(_summarize_file, upload.file, stages, mode, dedup_mode,
+                                                           similarity)
+        except ValueError as e:
+            return _error(str(e))
+    return JSONResponse(summary, headers={'X-Unique-Rows': str(dedup_stats['analyzed']),
+                                          'X-Dedup-Ratio': str(dedup_stats['dedup_ratio']),
+                                          'X-Skipped-Stages': ','.join(skipped_stages(stages))})
+
+
+def _estimate_file(file, stages, mode, settings):
+    text_column, blocks = open_text_column(file, key_column=settings['stratify'])
+    estimate = flask_api._estimate(blocks, stages, mode, settings, 'batch_estimate')
+    return dict(estimate, text_column=text_column, stages=list(stages))
+
+
+@endpoint('batch')
+async def batch_estimate(request):
+    """Sampled estimates of label proportions for a CSV of any size"""
+    started = time.monotonic()
+    async with request.form() as form:
+        upload, error = _form_file(form)
+        if error is not None:
+            return error
+        try:
+            stages = _stages_option(request, form)
+            mode = resolve_mode(_option(request, form, 'mode'))
+            settings = flask_api._estimate_settings(lambda name: _option(request, form, name))
+            # A plain thread rather than a scheduler task, since it waits on the scheduler tasks it submits
+            estimate = await asyncio.to_thread(_estimate_file, upload.file, stages, mode, settings)
+        except ValueError as e:
+            return _error(str(e))
+    return JSONResponse(dict(estimate, elapsed_seconds=round(time.monotonic() - started, 1)))
+
+
+def _save_file(file, path):
+    file.seek(0)
+    with open(path, 'wb') as f:
+        shutil.copyfileobj(file, f)
+
+
+@endpoint('batch')
+async def reanalyze(request):
+    """Start a job refreshing the stale stages of a stored result file"""
+    async with request.form() as form:
+        upload, error = _form_file(form, csv_only=False)
+        if error is not None:
+            return error
+        input_format = format_for_filename(upload.filename)
+        if input_format is None:
+            return _error("Upload a result file: .csv, .ndjson, .parquet or .arrow")
+        try:
+            mode = resolve_mode(_option(request, form, 'mode'))
+            file_versions = parse_versions(_option(request, form, 'model_versions'))
+            output_format = resolve_format(_option(request, form, 'format') or input_format)
+            if input_format in ('parquet', 'arrow'):
+                resolve_format(input_format)
+        except ValueError as e:
+            return _error(str(e))
+        job = await asyncio.to_thread(flask_api._start_reanalysis, functools.partial(_save_file, upload.file),
+                                      upload.filename, input_format, output_format, mode, file_versions)
+    return _job_response(job)
+
+
+def _upload_response(session, status_code=200):
+    return JSONResponse(dict(session, upload_url=f"/uploads/{session['id']}"), status_code=status_code,
+                        headers={'Location': f"/uploads/{session['id']}"})
+
+
+@endpoint()
+async def create_upload(request):
+    data = await _json_body(request) or {}
+    if not is_csv_filename(data.get('filename')):
+        return _error("Only CSV files are supported (optionally .gz or .zst compressed)")
+    try:
+        session = await asyncio.to_thread(flask_api.uploads.create, data['filename'], data.get('size'),
+                                          data.get('chunk_size'))
+    except UploadError as e:
+        return _error(str(e), e.status)
+    return _upload_response(session, 201)
+
+
+@endpoint()
+async def upload_status(request):
+    session = await asyncio.to_thread(flask_api.uploads.get, request.path_params['upload_id'])
+    if session is None:
+        return _error("Upload not found", 404)
+    return _upload_response(session)
+
+
+@endpoint()
+async def abort_upload(request):
+    upload_id = request.path_params['upload_id']
+    if await asyncio.to_thread(flask_api.uploads.get, upload_id) is None:
+        return _error("Upload not found", 404)
+    if not await asyncio.to_thread(flask_api.uploads.abort, upload_id):
+        return _error("Upload not found", 404)
+    return Response(status_code=204)
+
+
+@endpoint(max_body=UPLOAD_MAX_CHUNK_BYTES)
+async def upload_chunk(request):
+    """Store one chunk from the spooled body; the X-Chunk-Sha256 header carries its hex SHA-256"""
+    upload_id = request.path_params['upload_id']
+    number = request.path_params['number']
+    try:
+        session = await asyncio.to_thread(flask_api.uploads.write_chunk, upload_id, number,
+                                          request.state.body_file, request.headers.get('X-Chunk-Sha256'))
+    except UploadError as e:
+        return _error(str(e), e.status)
+    return JSONResponse({"id": upload_id, "number": number, "chunks": session['chunks'],
+                         "chunks_received": len(session['received']), "bytes_received": session['bytes_received'],
+                         "complete": session['complete']})
+
+
+@endpoint()
+async def finalize_upload(request):
+    data = await _json_body(request) or {}
+    try:
+        session = await asyncio.to_thread(flask_api.uploads.finalize, request.path_params['upload_id'],
+                                          data.get('sha256'))
+    except UploadError as e:
+        return _error(str(e), e.status)
+    return _upload_response(session)
+
+
+@endpoint('batch')
+async def analyze_upload(request):
+    """Start an upload's analysis job, as in the Flask endpoint"""
+    upload_id = request.path_params['upload_id']
+    session = await asyncio.to_thread(flask_api.uploads.get, upload_id)
+    if session is None:
+        return _error("Upload not found", 404)
+    if session['job'] is not None:
+        return JSONResponse({"error": "Upload is already being analyzed", "job": session['job'],
+                             **flask_api._job_links(session['job'])}, status_code=409)
+    data = await _json_body(request) or {}
+    aggregate = str(_option(request, data, 'format') or '').strip().lower()
+    aggregate = aggregate if aggregate in ('summary', 'estimate') else None
+    try:
+        stages = _stages_option(request, data)
+        mode = resolve_mode(_option(request, data, 'mode'))
+        output_format, include_text = (aggregate, False) if aggregate else _output_options(request, data)
+        dedup_mode, similarity = _dedup_options(request, data)
+        estimate = (flask_api._estimate_settings(lambda name: _option(request, data, name))
+                    if aggregate == 'estimate' else None)
+    except ValueError as e:
+        return _error(str(e))
+    job = await asyncio.to_thread(flask_api._start_upload_analysis, upload_id, session, aggregate, stages, mode,
+                                  output_format, include_text, dedup_mode, similarity, estimate)
+    if job is None:
+        return _error("Upload is already being analyzed", 409)
+    return _job_response(job)
+
+
+@endpoint()
+async def job_events(request):
+    """Server-sent job progress; waiting between reads holds no thread"""
+    job_id = request.path_params['job_id']
+    if await asyncio.to_thread(flask_api.jobs.get, job_id) is None:
+        return JSONResponse({"error": "Job not found"}, status_code=404)
+
+    async def generate():
+        stream = JobEventStream()
+        yield stream.preamble
+        while True:
+            event = stream.next(await asyncio.to_thread(flask_api.jobs.get, job_id))
+            if event:
+                yield event
+            if stream.finished:
+                return
+            await asyncio.sleep(PROGRESS_EVENT_INTERVAL)
+
+    return StreamingResponse(generate(), media_type='text/event-stream',
+                             headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+
+class CompressionMiddleware:
+    """Compress text responses per Accept-Encoding, message by message, so streams stay streamed.
+
+    Responses that already carry a Content-Encoding, such as those from
+    the mounted Flask app, pass through untouched.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        encoding = negotiate_encoding(Headers(scope=scope).get('accept-encoding')) if scope['type'] == 'http' else None
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+        start = None
+        compressor = None
+
+        async def compressing_send(message):
+            nonlocal start, compressor
+            if message['type'] == 'http.response.start':
+                start = message
+                return
+            if message['type'] != 'http.response.body':
+                await send(message)
+                return
+            if start is not None:
+                headers = MutableHeaders(raw=start['headers'])
+                mimetype = headers.get('content-type', '').split(';')[0].strip()
+                small = not message.get('more_body', False) and len(message.get('body', b'')) < COMPRESS_MIN_BYTES
+                if (start['status'] == 200 and mimetype in COMPRESSIBLE_MIMETYPES
+                        and 'content-encoding' not in headers and not small):
+                    compressor = StreamCompressor(encoding)
+                    headers['Content-Encoding'] = encoding
+                    headers.add_vary_header('Accept-Encoding')
+                    for name in ('content-length', 'accept-ranges'):
+                        if name in headers:
+                            del headers[name]
+                await send(start)
+                start = None
+            if compressor is None:
+                await send(message)
+                return
+            more_body = message.get('more_body', False)
+            body = compressor.compress(message.get('body', b''))
+            if not more_body:
+                body += compressor.finish()
+            if body or not more_body:
+                await send({'type': 'http.response.body', 'body': body, 'more_body': more_body})
+
+        await self.app(scope, receive, compressing_send)
+
+
+def create_app(warm=True):
+    """Build and warm the analyzers (once) and return the ASGI application"""
+    wsgi_app = flask_api.create_app(warm=warm)
+    routes = [
+        Route('/health', health_check, methods=['GET']),
+        Route('/metrics', metrics_endpoint, methods=['GET']),
+        Route('/classify', classify_text, methods=['POST']),
+        Route('/sentiment-only', sentiment_only, methods=['POST']),
+        Route('/topics-only', topics_only, methods=['POST']),
+        Route('/batch-analyze', batch_analyze, methods=['POST']),
+        Route('/simple-batch', simple_batch, methods=['POST']),
+        Route('/batch-summary', batch_summary, methods=['POST']),
+        Route('/batch-estimate', batch_estimate, methods=['POST']),
+        Route('/upload-csv', upload_csv, methods=['POST']),
+        Route('/reanalyze', reanalyze, methods=['POST']),
+        Route('/uploads', create_upload, methods=['POST']),
+        Route('/uploads/{upload_id}', upload_status, methods=['GET']),
+        Route('/uploads/{upload_id}', abort_upload, methods=['DELETE']),
+        Route('/uploads/{upload_id}/chunks/{number:int}', upload_chunk, methods=['PUT']),
+        Route('/uploads/{upload_id}/finalize', finalize_upload, methods=['POST']),
+        Route('/uploads/{upload_id}/analyze', analyze_upload, methods=['POST']),
+        Route('/jobs/{job_id}/events', job_events, methods=['GET']),
+        # Everything else (/, /jobs/..., /admin/..., /feedback, /debug-upload) is served by the Flask app
+        Mount('/', app=WSGIMiddleware(wsgi_app))
+    ]
+    middleware = [Middleware(CompressionMiddleware),
+                  Middleware(CORSMiddleware, allow_origins=['*'], allow_methods=['*'], allow_headers=['*'],
+                             expose_headers=['Server-Timing', 'Retry-After', 'X-Skipped-Stages',
+                                             'X-Unique-Rows', 'X-Dedup-Ratio', 'X-Model-Version',
+                                             'X-Model-Versions'])]
+    return Starlette(routes=routes, middleware=middleware)
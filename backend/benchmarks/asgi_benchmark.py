@@ -0,0 +1,144 @@
+"""Compare the Flask (gthread) and ASGI (uvicorn) servers under slow clients.
+
+Usage (from backend/):
+    python benchmarks/asgi_benchmark.py [--levels 0,4,16,64,256] [--probes N] [--threads N]
+
+For each server, one gunicorn worker is started from gunicorn.conf.py
+with GUNICORN_THREADS threads (Flask) or the uvicorn worker class
+(ASGI). At each concurrency level, that many clients hold a /classify
+upload open, trickling the body a byte at a time. Meanwhile a probe
+client sends ordinary /classify requests and records their latency.
+The report gives probe p50/p99 and failures per level, and the highest
+level at which probe p99 stays within --p99-ms.
+"""
+import os
+import sys
+import json
+import time
+import signal
+import asyncio
+import subprocess
+
+BACKEND = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+BODY = json.dumps({"text": "The acting was brilliant but the plot dragged and the soundtrack was far too loud."})
+PROBE_TIMEOUT = 10.0
+
+
+def _request(port, body, content_length=None):
+    length = len(body) if content_length is None else content_length
+    return (f"POST /classify HTTP/1.1\r\nHost: 127.0.0.1:{port}\r\nContent-Type: application/json\r\n"
+            f"Content-Length: {length}\r\nConnection: close\r\n\r\n").encode()
+
+
+async def _slow_client(port, stop):
+    """Hold a request open by trickling its body until stop is set"""
+    body = BODY.encode()
+    try:
+        reader, writer = await asyncio.open_connection('127.0.0.1', port)
+        writer.write(_request(port, body))
+        await writer.drain()
+        for index in range(len(body)):
+            if stop.is_set():
+                break
+            writer.write(body[index:index + 1])
+            await writer.drain()
+            try:
+                await asyncio.wait_for(stop.wait(), 0.25)
+            except asyncio.TimeoutError:
+                pass
+        writer.close()
+    except (OSError, asyncio.IncompleteReadError):
+        pass
+
+
+async def _probe(port):
+    start = time.perf_counter()
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    writer.write(_request(port, BODY.encode()) + BODY.encode())
+    await writer.drain()
+    status_line = await reader.readline()
+    await reader.read()
+    writer.close()
+    if b' 200 ' not in status_line:
+        raise RuntimeError(status_line.decode(errors='replace').strip())
+    return (time.perf_counter() - start) * 1000
+
+
+async def _run_level(port, concurrency, probes):
+    stop = asyncio.Event()
+    slow = [asyncio.ensure_future(_slow_client(port, stop)) for _ in range(concurrency)]
+    # Give the slow clients time to connect and occupy the server
+    await asyncio.sleep(0.5 + concurrency * 0.002)
+    latencies, failures = [], 0
+    for _ in range(probes):
+        try:
+            latencies.append(await asyncio.wait_for(_probe(port), PROBE_TIMEOUT))
+        except (asyncio.TimeoutError, OSError, RuntimeError):
+            failures += 1
+    stop.set()
+    await asyncio.gather(*slow)
+    return latencies, failures
+
+
+def _percentile(values, fraction):
+    if not values:
+        return float('inf')
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def _start(kind, port, threads):
+    env = dict(os.environ, GUNICORN_WORKERS='1', GUNICORN_THREADS=str(threads),
+               GUNICORN_BIND=f'127.0.0.1:{port}', ADMISSION_INTERACTIVE_QUEUE='1000')
+    command = [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py']
+    if kind == 'asgi':
+        command += ['-k', 'uvicorn.workers.UvicornWorker', 'asgi:create_app()']
+    return subprocess.Popen(command, cwd=BACKEND, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+async def _wait_ready(port, timeout=120):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            await asyncio.wait_for(_probe(port), 2)
+            return
+        except (OSError, asyncio.TimeoutError, RuntimeError):
+            await asyncio.sleep(0.5)
+    raise RuntimeError(f"server on port {port} did not become ready")
+
+
+def benchmark(kind, port, levels, probes, threads):
+    server = _start(kind, port, threads)
+    try:
+        asyncio.run(_wait_ready(port))
+        results = []
+        for level in levels:
+            latencies, failures = asyncio.run(_run_level(port, level, probes))
+            results.append((level, _percentile(latencies, 0.5), _percentile(latencies, 0.99), failures))
+        return results
+    finally:
+        server.send_signal(signal.SIGTERM)
+        server.wait(timeout=30)
+
+
+def main(argv):
+    options = {'--levels': '0,4,16,64,256', '--probes': '50', '--threads': '4', '--p99-ms': '250'}
+    for name in options:
+        if name in argv:
+            options[name] = argv[argv.index(name) + 1]
+    levels = [int(level) for level in options['--levels'].split(',')]
+    probes, threads, p99_limit = int(options['--probes']), int(options['--threads']), float(options['--p99-ms'])
+
+    for kind, port in (('flask', 5101), ('asgi', 5102)):
+        print(f"\n{kind} (1 worker{f', {threads} threads' if kind == 'flask' else ''})")
+        print(f"{'slow clients':>12} {'p50 ms':>9} {'p99 ms':>9} {'failed':>7}")
+        sustained = None
+        for level, p50, p99, failures in benchmark(kind, port, levels, probes, threads):
+            print(f"{level:>12} {p50:>9.1f} {p99:>9.1f} {failures:>7}")
+            if p99 <= p99_limit and failures == 0:
+                sustained = level
+        print(f"highest level with p99 <= {p99_limit:.0f} ms: {sustained}")
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
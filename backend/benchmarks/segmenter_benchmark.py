@@ -0,0 +1,122 @@
+"""Compare the rule-based sentence segmenter against NLTK Punkt.
+
+Usage (from backend/):
+    python benchmarks/segmenter_benchmark.py [csv ...]
+
+Each CSV needs a 'text' column (sample_batch.csv format). Short single
+sentence rows are also concatenated into multi-sentence "reviews" so the
+comparison exercises real boundaries. Reports sentence-list agreement,
+boundary precision/recall with Punkt as the reference, and the
+per-document time of each segmenter.
+"""
+import os
+import sys
+import time
+
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from utils.segmenter import PunktSegmenter, RuleBasedSegmenter
+
+REPO_ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..')
+DEFAULT_FILES = ['sample_batch.csv', 'small_test.csv', 'test_frontend_batch.csv']
+
+# Review-style edge cases that rarely show up in the sample files
+EXTRA_REVIEWS = [
+    "Saw it with Dr. Patel last night. The acting was superb! Music? Not so much.",
+    "I loved it... then the third act happened. Terrible pacing, e.g. the car chase.",
+    "\"Best film of the year,\" said the critic. I disagree. It was fine.",
+    "Directed by J. J. Abrams. Runtime is approx. 2 hrs. Worth it!!",
+    "the plot was weak. the soundtrack was great though. 8.5/10 would watch again",
+    "Great cast (especially the lead). Weak script. Beautiful cinematography.\n\nOverall: decent.",
+    # Abbreviations that are also ordinary sentence-final words
+    "I said no. Then I left.",
+    "Took 5 min. Great food.",
+    "We went in Dec. The food was good.",
+    "Ordered the no. 5 combo. Waited 20 min. for it, from 6 p.m. until late."
+]
+
+
+def load_documents(paths):
+    documents = []
+    for path in paths:
+        df = pd.read_csv(path)
+        column = next((c for c in df.columns if c.lower() == 'text'), None)
+        if column is None:
+            continue
+        texts = [str(t) for t in df[column].dropna()]
+        documents.extend(texts)
+        # Join consecutive rows into multi-sentence reviews
+        for i in range(0, len(texts) - 2, 3):
+            documents.append('. '.join(t.rstrip('.') for t in texts[i:i + 3]) + '.')
+    documents.extend(EXTRA_REVIEWS)
+    return documents
+
+
+def boundaries(sentences):
+    """Character offsets (ignoring whitespace) at which sentences end"""
+    offsets = set()
+    position = 0
+    for sentence in sentences:
+        position += len(''.join(sentence.split()))
+        offsets.add(position)
+    return offsets
+
+
+def time_per_document(segmenter, documents, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for document in documents:
+            segmenter.split(document)
+    return (time.perf_counter() - start) / (repeat * len(documents))
+
+
+def main(argv):
+    paths = argv or [os.path.join(REPO_ROOT, name) for name in DEFAULT_FILES]
+    documents = load_documents([p for p in paths if os.path.exists(p)])
+    punkt, rule = PunktSegmenter(), RuleBasedSegmenter()
+
+    exact = 0
+    true_positive = false_positive = false_negative = 0
+    disagreements = []
+    for document in documents:
+        reference = punkt.split(document)
+        candidate = rule.split(document)
+        if reference == candidate:
+            exact += 1
+        else:
+            disagreements.append((document, reference, candidate))
+        ref_bounds, cand_bounds = boundaries(reference), boundaries(candidate)
+        true_positive += len(ref_bounds & cand_bounds)
+        false_positive += len(cand_bounds - ref_bounds)
+        false_negative += len(ref_bounds - cand_bounds)
+
+    precision = true_positive / max(true_positive + false_positive, 1)
+    recall = true_positive / max(true_positive + false_negative, 1)
+    print(f"Documents: {len(documents)}")
+    print(f"Identical segmentation: {exact}/{len(documents)} ({exact / len(documents):.1%})")
+    print(f"Boundary precision vs Punkt: {precision:.3f}, recall: {recall:.3f}")
+
+    # Warm Punkt's lazily loaded model before timing
+    punkt.split("Warm up. Twice.")
+    repeat = max(1, 2000 // len(documents))
+    punkt_time = time_per_document(punkt, documents, repeat)
+    rule_time = time_per_document(rule, documents, repeat)
+    long_document = [' '.join(documents) * 20]
+    punkt_long = time_per_document(punkt, long_document, 5)
+    rule_long = time_per_document(rule, long_document, 5)
+    print(f"Punkt: {punkt_time * 1e6:.1f} us/doc, rule: {rule_time * 1e6:.1f} us/doc "
+          f"({punkt_time / rule_time:.1f}x faster)")
+    print(f"Long document ({len(long_document[0])} chars): Punkt {punkt_long * 1e3:.2f} ms, "
+          f"rule {rule_long * 1e3:.2f} ms ({punkt_long / rule_long:.1f}x faster)")
+
+    for document, reference, candidate in disagreements[:10]:
+        print("\n--- disagreement ---")
+        print(f"text:  {document!r}")
+        print(f"punkt: {reference}")
+        print(f"rule:  {candidate}")
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,83 @@
+"""Check the vectorized VADER scorer against NLTK and time both.
+
+Usage (from backend/):
+    python benchmarks/vader_benchmark.py [csv ...] [--synthetic N]
+
+Texts come from the 'text' column of each CSV plus N synthetic reviews
+built from lexicon words, boosters, negations, capitals and punctuation
+so every VADER rule is exercised. Reports mismatches beyond
+SCORE_TOLERANCE and per-text time for both engines.
+"""
+import os
+import sys
+import time
+import random
+
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from nltk.sentiment.vader import SentimentIntensityAnalyzer
+from utils.vader_batch import VaderBatchScorer, SCORE_TOLERANCE
+
+REPO_ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..')
+FILLER = ['the', 'movie', 'acting', 'plot', 'music', 'but', 'never', 'so', 'this', 'least',
+          'at', 'very', 'kind', 'of', 'sort', 'just', 'enough', "don't", 'I']
+PUNCTUATION = ['', '', '', '!', '!!', '?', '??', '...', ',', '.', '"']
+
+
+def synthetic_texts(analyzer, count, seed=0):
+    rng = random.Random(seed)
+    vocabulary = (rng.sample(sorted(analyzer.lexicon), 300) + list(analyzer.constants.BOOSTER_DICT)
+                  + list(analyzer.constants.NEGATE) + FILLER)
+    texts = []
+    for _ in range(count):
+        words = []
+        for _ in range(rng.randint(0, 30)):
+            word = rng.choice(vocabulary)
+            if rng.random() < 0.1:
+                word = word.upper()
+            words.append(word + rng.choice(PUNCTUATION))
+        texts.append(' '.join(words))
+    return texts
+
+
+def main(argv):
+    synthetic = 20000
+    if '--synthetic' in argv:
+        index = argv.index('--synthetic')
+        synthetic = int(argv[index + 1])
+        argv = argv[:index] + argv[index + 2:]
+    paths = argv or [os.path.join(REPO_ROOT, 'sample_batch.csv')]
+
+    analyzer = SentimentIntensityAnalyzer()
+    scorer = VaderBatchScorer(analyzer)
+    texts = synthetic_texts(analyzer, synthetic)
+    for path in paths:
+        df = pd.read_csv(path)
+        column = next((c for c in df.columns if c.lower() == 'text'), None)
+        if column is not None:
+            texts.extend(str(t) for t in df[column].dropna())
+
+    start = time.perf_counter()
+    reference = [analyzer.polarity_scores(text) for text in texts]
+    nltk_time = time.perf_counter() - start
+    start = time.perf_counter()
+    vectorized = scorer.score_batch(texts)
+    vector_time = time.perf_counter() - start
+
+    mismatches = [
+        (text, ref, got) for text, ref, got in zip(texts, reference, vectorized)
+        if any(abs(ref[key] - got[key]) > tolerance for key, tolerance in SCORE_TOLERANCE.items())
+    ]
+    exact = sum(ref == got for ref, got in zip(reference, vectorized))
+    print(f"Texts: {len(texts)}")
+    print(f"Identical: {exact}, outside tolerance: {len(mismatches)}")
+    print(f"NLTK: {nltk_time / len(texts) * 1e6:.1f} us/text, vectorized: "
+          f"{vector_time / len(texts) * 1e6:.1f} us/text ({nltk_time / vector_time:.1f}x faster)")
+    for text, ref, got in mismatches[:10]:
+        print(f"\n{text!r}\n  nltk:       {ref}\n  vectorized: {got}")
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,120 @@
+"""Measure per-worker memory under gunicorn with and without preloading.
+
+Usage (from backend/, Linux only):
+    python benchmarks/worker_memory.py [--workers N] [--requests N] [--port P]
+
+Starts gunicorn with gunicorn.conf.py twice, once with GUNICORN_PRELOAD=0
+and once with GUNICORN_PRELOAD=1. Each run sends /classify traffic to
+every worker, then reads /proc/<pid>/smaps_rollup for each worker. USS
+(Private_Clean + Private_Dirty) is the memory a worker would free if it
+exited; it is the figure that preloading and gc.freeze() should shrink.
+"""
+import os
+import sys
+import json
+import time
+import signal
+import subprocess
+import urllib.request
+
+BACKEND = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+TEXT = "The acting was brilliant but the plot dragged and the soundtrack was far too loud."
+
+
+def _smaps_rollup(pid):
+    values = {}
+    with open(f'/proc/{pid}/smaps_rollup') as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) >= 3 and parts[1].isdigit():
+                values[parts[0].rstrip(':')] = int(parts[1])
+    return {
+        'rss': values.get('Rss', 0),
+        'pss': values.get('Pss', 0),
+        'uss': values.get('Private_Clean', 0) + values.get('Private_Dirty', 0)
+    }
+
+
+def _children(pid):
+    children = []
+    for entry in os.listdir('/proc'):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f'/proc/{entry}/stat') as f:
+                # The command name may contain spaces, so split after its closing parenthesis
+                fields = f.read().rsplit(')', 1)[1].split()
+        except OSError:
+            continue
+        if int(fields[1]) == pid:
+            children.append(int(entry))
+    return children
+
+
+def _post(url, payload):
+    request = urllib.request.Request(url, data=json.dumps(payload).encode(),
+                                     headers={'Content-Type': 'application/json'})
+    with urllib.request.urlopen(request, timeout=30) as response:
+        return response.status
+
+
+def _wait_ready(url, timeout=120):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            with urllib.request.urlopen(url, timeout=2):
+                return
+        except OSError:
+            # Connection refused, or accepted by the listen backlog before any worker has booted
+            time.sleep(0.5)
+    raise RuntimeError(f"gunicorn did not become ready at {url}")
+
+
+def measure(preload, workers, requests, port):
+    env = dict(os.environ, GUNICORN_PRELOAD='1' if preload else '0', GUNICORN_WORKERS=str(workers),
+               GUNICORN_BIND=f'127.0.0.1:{port}')
+    master = subprocess.Popen([sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py'],
+                              cwd=BACKEND, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        base = f'http://127.0.0.1:{port}'
+        _wait_ready(base + '/health')
+        # Without preloading every worker trains its own models; wait until all have booted
+        deadline = time.time() + 120
+        while len(_children(master.pid)) < workers and time.time() < deadline:
+            time.sleep(0.5)
+        for _ in range(requests):
+            _post(base + '/classify', {'text': TEXT})
+        time.sleep(1)
+        return {pid: _smaps_rollup(pid) for pid in _children(master.pid)}
+    finally:
+        master.send_signal(signal.SIGTERM)
+        master.wait(timeout=30)
+
+
+def _report(label, samples):
+    print(f"\n{label}: {len(samples)} workers")
+    for pid, sample in sorted(samples.items()):
+        print(f"  pid {pid}: USS {sample['uss'] / 1024:7.1f} MiB  PSS {sample['pss'] / 1024:7.1f} MiB  "
+              f"RSS {sample['rss'] / 1024:7.1f} MiB")
+    if samples:
+        mean_uss = sum(s['uss'] for s in samples.values()) / len(samples) / 1024
+        print(f"  mean USS per worker: {mean_uss:.1f} MiB")
+        return mean_uss
+    return 0.0
+
+
+def main(argv):
+    options = {'--workers': 4, '--requests': 200, '--port': 5077}
+    for name in options:
+        if name in argv:
+            options[name] = int(argv[argv.index(name) + 1])
+    args = (options['--workers'], options['--requests'], options['--port'])
+
+    before = _report('Without preload', measure(False, *args))
+    after = _report('With preload + gc.freeze', measure(True, *args))
+    if before:
+        print(f"\nUSS per worker: {before:.1f} -> {after:.1f} MiB ({(1 - after / before) * 100:.0f}% less)")
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,36 @@
+"""gunicorn settings: train and warm the models once in the master, then fork.
+
+Run from backend/:
+    gunicorn -c gunicorn.conf.py
+
+Workers inherit the trained analyzers copy-on-write. To keep those pages
+shared, the cyclic GC is kept off in the master (so collections do not
+free objects and leave holes in shared pages), everything alive is moved
+into the permanent generation with gc.freeze() just before each fork (so
+worker collections never write to the parents' objects), and each worker
+turns the GC back on.
+"""
+import gc
+import os
+
+wsgi_app = 'app:create_app()'
+bind = os.environ.get('GUNICORN_BIND', '0.0.0.0:5000')
+workers = int(os.environ.get('GUNICORN_WORKERS', os.cpu_count() or 1))
+threads = int(os.environ.get('GUNICORN_THREADS', 4))
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 120))
+preload_app = os.environ.get('GUNICORN_PRELOAD', '1').lower() not in ('0', 'false', 'no')
+
+if preload_app:
+    # The config file is read before the app is preloaded, so this covers model training
+    gc.disable()
+
+
+def pre_fork(server, worker):
+    if preload_app:
+        gc.collect()
+        gc.freeze()
+
+
+def post_fork(server, worker):
+    if preload_app:
+        gc.enable()
@@ -5,14 +5,21 @@ from sklearn.feature_extraction.text import TfidfVectorizer
 from sklearn.linear_model import LogisticRegression
 import nltk
 from nltk.sentiment.vader import SentimentIntensityAnalyzer
-from nltk.tokenize import sent_tokenize
 import random
+from utils.segmenter import get_segmenter
 
 class AspectAnalyzer:
-    def __init__(self):
-        self.sentiment_analyzer = SentimentIntensityAnalyzer()
+    def __init__(self, segmenter=None, sentiment_analyzer=None):
+        self.sentiment_analyzer = sentiment_analyzer or SentimentIntensityAnalyzer()
+        self.segmenter = segmenter or get_segmenter()
         self.aspect_vectorizer = None
         self.aspect_models = {}
+        self.aspect_keywords = {
+            'acting': ['acting', 'performance', 'actor', 'actress', 'cast', 'role', 'character'],
+            'story': ['story', 'plot', 'narrative', 'script', 'screenplay', 'storyline'],
+            'music': ['music', 'soundtrack', 'score', 'song', 'audio', 'sound'],
+            'direction': ['direction', 'director', 'cinematography', 'visuals', 'camera']
+        }
         
         # Initialize models
         self._initialize_aspect_models()
@@ -119,6 +126,9 @@ class AspectAnalyzer:
         # Fit vectorizer
         self.aspect_vectorizer.fit(all_texts)
         
+        # Seeded like the models' random_state, so every process trains the same models
+        rng = random.Random(42)
+        
         # Train model for each aspect-sentiment combination
         for aspect, sentiments in aspect_data.items():
             self.aspect_models[aspect] = {}
@@ -139,7 +149,7 @@ class AspectAnalyzer:
                 
                 # Shuffle
                 combined = list(zip(training_texts, training_labels))
-                random.shuffle(combined)
+                rng.shuffle(combined)
                 training_texts, training_labels = zip(*combined)
                 
                 # Train model
@@ -160,19 +170,12 @@ class AspectAnalyzer:
     
     def _extract_aspect_sentences(self, text):
         """Extract sentences that mention specific aspects"""
-        sentences = sent_tokenize(text)
+        sentences = self.segmenter.split(text)
         aspect_sentences = defaultdict(list)
         
-        aspect_keywords = {
-            'acting': ['acting', 'performance', 'actor', 'actress', 'cast', 'role', 'character'],
-            'story': ['story', 'plot', 'narrative', 'script', 'screenplay', 'storyline'],
-            'music': ['music', 'soundtrack', 'score', 'song', 'audio', 'sound'],
-            'direction': ['direction', 'director', 'cinematography', 'visuals', 'camera']
-        }
-        
         for sentence in sentences:
             sentence_lower = sentence.lower()
-            for aspect, keywords in aspect_keywords.items():
+            for aspect, keywords in self.aspect_keywords.items():
                 if any(keyword in sentence_lower for keyword in keywords):
                     aspect_sentences[aspect].append(sentence)
                     break
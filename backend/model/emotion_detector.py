@@ -11,8 +11,8 @@ from nltk.corpus import stopwords
 import random
 
 class EmotionDetector:
-    def __init__(self):
-        self.sentiment_analyzer = SentimentIntensityAnalyzer()
+    def __init__(self, sentiment_analyzer=None):
+        self.sentiment_analyzer = sentiment_analyzer or SentimentIntensityAnalyzer()
         self.emotion_vectorizer = None
         self.emotion_model = None
         
@@ -81,6 +81,8 @@ class EmotionDetector:
         # Train model
         self.emotion_model = LogisticRegression(random_state=42, max_iter=1000)
         self.emotion_model.fit(X, y)
+        # Kept as the starting point for incremental training from feedback
+        self.emotion_training_data = list(zip(all_texts, all_labels))
     
     def _preprocess_text(self, text):
         """Preprocess text for analysis"""
@@ -130,9 +132,10 @@ class EmotionDetector:
         
         return found_emotions
     
-    def _calculate_vader_emotion(self, text):
+    def _calculate_vader_emotion(self, text, scores=None):
         """Calculate emotion using VADER sentiment analysis"""
-        scores = self.sentiment_analyzer.polarity_scores(text)
+        if scores is None:
+            scores = self.sentiment_analyzer.polarity_scores(text)
         
         # Map VADER scores to emotions
         if scores['compound'] >= 0.6:
@@ -142,9 +145,10 @@ class EmotionDetector:
         else:
             return 'Neutral', abs(scores['compound'])
     
-    def _calculate_lexical_emotion(self, text):
+    def _calculate_lexical_emotion(self, text, emotion_keywords=None):
         """Calculate emotion using lexical analysis"""
-        emotion_keywords = self._extract_emotion_keywords(text)
+        if emotion_keywords is None:
+            emotion_keywords = self._extract_emotion_keywords(text)
         
         if not emotion_keywords:
             return 'Neutral', 0.5
@@ -167,8 +171,54 @@ class EmotionDetector:
         
         return emotion_map.get(max_emotion, 'Neutral'), confidence
     
-    def detect_emotion(self, text):
-        """Main method to detect emotion with confidence"""
+    def _predict_ml_emotion(self, text):
+        """Return (label, confidence) from the ML model"""
+        processed_text = self._preprocess_text(text)
+        X = self.emotion_vectorizer.transform([processed_text])
+        ml_proba = self.emotion_model.predict_proba(X)[0]
+        # argmax of the probabilities is the model's prediction, without a second predict() pass
+        ml_index = int(np.argmax(ml_proba))
+        ml_prediction = self.emotion_model.classes_[ml_index]
+        ml_confidence = ml_proba[ml_index]
+        
+        # Map to our labels
+        emotion_map = {
+            'happy': 'Happy',
+            'sad': 'Sad',
+            'angry': 'Angry',
+            'neutral': 'Neutral'
+        }
+        return emotion_map.get(ml_prediction, 'Neutral'), ml_confidence
+    
+    def _emotion_scores(self, emotion_keywords):
+        """Calculate the emotion distribution from keyword counts"""
+        total_keywords = sum(emotion_keywords.values()) if emotion_keywords else 1
+        
+        scores = {
+            'happy': emotion_keywords.get('happy', 0) / total_keywords,
+            'sad': emotion_keywords.get('sad', 0) / total_keywords,
+            'angry': emotion_keywords.get('angry', 0) / total_keywords,
+            'neutral': emotion_keywords.get('neutral', 0) / total_keywords
+        }
+        
+        # Normalize scores
+        score_sum = sum(scores.values())
+        if score_sum > 0:
+            return {k: round(v/score_sum, 3) for k, v in scores.items()}
+        return {'happy': 0.25, 'sad': 0.25, 'angry': 0.25, 'neutral': 0.25}
+    
+    def detect_emotion(self, text, mode='full', include_scores=None):
+        """Main method to detect emotion with confidence.
+        
+        The ML model is consulted first because a confident ML prediction
+        wins outright; VADER and the lexical scan only run when the label
+        is still open, and keyword counts are shared between the lexical
+        vote and the score distribution. mode='fast' skips the
+        distribution unless include_scores is set.
+        """
+        if include_scores is None:
+            include_scores = mode != 'fast'
+        
         if not text:
             return {
                 'label': 'Neutral',
@@ -176,70 +226,46 @@ class EmotionDetector:
                 'scores': {'happy': 0.25, 'sad': 0.25, 'angry': 0.25, 'neutral': 0.25}
             }
         
-        # Get emotion from different methods
-        vader_emotion, vader_confidence = self._calculate_vader_emotion(text)
-        lexical_emotion, lexical_confidence = self._calculate_lexical_emotion(text)
+        emotion_keywords = None
         
         # Get ML model prediction
         try:
-            processed_text = self._preprocess_text(text)
-            X = self.emotion_vectorizer.transform([processed_text])
-            ml_prediction = self.emotion_model.predict(X)[0]
-            ml_proba = self.emotion_model.predict_proba(X)[0]
-            
-            # Get probability for predicted emotion
-            emotion_classes = list(self.emotion_model.classes_)
-            if ml_prediction in emotion_classes:
-                ml_index = emotion_classes.index(ml_prediction)
-                ml_confidence = ml_proba[ml_index]
-            else:
-                ml_confidence = 0.5
-            
-            # Map to our labels
-            emotion_map = {
-                'happy': 'Happy',
-                'sad': 'Sad',
-                'angry': 'Angry',
-                'neutral': 'Neutral'
-            }
-            ml_emotion = emotion_map.get(ml_prediction, 'Neutral')
+            ml_emotion, ml_confidence = self._predict_ml_emotion(text)
+        except:
+            ml_emotion, ml_confidence = None, None
+        
+        if ml_confidence is not None and ml_confidence > 0.7:
+            final_emotion = ml_emotion
+            confidence = ml_confidence
+        else:
+            # Get emotion from the lexical and VADER methods
+            emotion_keywords = self._extract_emotion_keywords(text)
+            lexical_emotion, lexical_confidence = self._calculate_lexical_emotion(text, emotion_keywords)
             
-            # Combine results with weighted voting
-            if ml_confidence > 0.7:
-                final_emotion = ml_emotion
-                confidence = ml_confidence
-            elif lexical_confidence > vader_confidence:
+            if ml_confidence is None:
+                # Fallback to lexical analysis
                 final_emotion = lexical_emotion
                 confidence = lexical_confidence
             else:
-                final_emotion = vader_emotion
-                confidence = vader_confidence
-            
-        except:
-            # Fallback to lexical analysis
-            final_emotion = lexical_emotion
-            confidence = lexical_confidence
+                vader_emotion, vader_confidence = self._calculate_vader_emotion(text)
+                
+                # Combine results with weighted voting
+                if lexical_confidence > vader_confidence:
+                    final_emotion = lexical_emotion
+                    confidence = lexical_confidence
+                else:
+                    final_emotion = vader_emotion
+                    confidence = vader_confidence
         
-        # Calculate emotion distribution scores
-        emotion_keywords = self._extract_emotion_keywords(text)
-        total_keywords = sum(emotion_keywords.values()) if emotion_keywords else 1
+        if not include_scores:
+            return {'label': final_emotion, 'confidence': min(confidence, 1.0)}
         
-        scores = {
-            'happy': emotion_keywords.get('happy', 0) / total_keywords,
-            'sad': emotion_keywords.get('sad', 0) / total_keywords,
-            'angry': emotion_keywords.get('angry', 0) / total_keywords,
-            'neutral': emotion_keywords.get('neutral', 0) / total_keywords
-        }
-        
-        # Normalize scores
-        score_sum = sum(scores.values())
-        if score_sum > 0:
-            scores = {k: round(v/score_sum, 3) for k, v in scores.items()}
-        else:
-            scores = {'happy': 0.25, 'sad': 0.25, 'angry': 0.25, 'neutral': 0.25}
+        # Calculate emotion distribution scores
+        if emotion_keywords is None:
+            emotion_keywords = self._extract_emotion_keywords(text)
         
         return {
             'label': final_emotion,
             'confidence': min(confidence, 1.0),
-            'scores': scores
+            'scores': self._emotion_scores(emotion_keywords)
         }
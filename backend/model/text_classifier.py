@@ -16,10 +16,14 @@ from nltk.tokenize import word_tokenize
 from nltk.corpus import stopwords
 import random
 
+# Training data read when no data_dir is given
+DEFAULT_DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data')
+
 class TextClassifier:
-    def __init__(self):
+    def __init__(self, sentiment_analyzer=None, data_dir=None):
+        self.data_dir = data_dir or DEFAULT_DATA_DIR
         try:
-            self.sentiment_analyzer = SentimentIntensityAnalyzer()
+            self.sentiment_analyzer = sentiment_analyzer or SentimentIntensityAnalyzer()
         except:
             # Fallback if VADER lexicon is not available
             self.sentiment_analyzer = None
@@ -52,7 +56,7 @@ class TextClassifier:
     def _initialize_models(self):
         """Initialize and train the ML models"""
         # Try to load custom dataset first
-        dataset_path = os.path.join(os.path.dirname(__file__), '..', 'data', 'df_file.csv')
+        dataset_path = os.path.join(self.data_dir, 'df_file.csv')
         texts, labels = self.load_dataset(dataset_path)
         
         if texts and labels:
@@ -121,6 +125,8 @@ class TextClassifier:
         # Train model
         self.sentiment_model = LogisticRegression(random_state=42)
         self.sentiment_model.fit(X, y)
+        # Kept as the starting point for incremental training from feedback
+        self.sentiment_training_data = list(zip(texts, y))
     
     def _train_sentiment_model_with_data(self, texts, labels):
         """Train sentiment model with custom dataset"""
@@ -173,6 +179,8 @@ class TextClassifier:
         
         # Store label mapping for predictions
         self.label_mapping = label_mapping
+        # Kept as the starting point for incremental training from feedback
+        self.sentiment_training_data = list(zip(texts, mapped_labels))
     
     def _train_topic_models(self, topic_data):
         """Train multi-label topic classification models"""
@@ -190,6 +198,9 @@ class TextClassifier:
         # Fit vectorizer on all texts
         self.topic_vectorizer.fit(all_texts)
         
+        # Seeded like the models' random_state, so every process trains the same models
+        rng = random.Random(42)
+        
         # Train a model for each topic (binary classification)
         for topic, texts in topic_data.items():
             # Create labels: 1 for texts belonging to this topic, 0 for others
@@ -200,7 +211,7 @@ class TextClassifier:
                     other_texts.extend(other_text_list)
             
             # Balance the dataset
-            other_texts = random.sample(other_texts, min(len(other_texts), len(topic_texts) * 2))
+            other_texts = rng.sample(other_texts, min(len(other_texts), len(topic_texts) * 2))
             
             training_texts = topic_texts + other_texts
             training_labels = [1] * len(topic_texts) + [0] * len(other_texts)
@@ -249,8 +260,8 @@ class TextClassifier:
             'direction': ['direction', 'director', 'cinematography', 'visuals']
         }
     
-    def _calculate_vader_sentiment(self, text):
-        """Calculate sentiment using VADER"""
+    def _calculate_vader_sentiment(self, text, scores=None):
+        """Calculate sentiment using VADER, reusing precomputed polarity scores if given"""
         if self.sentiment_analyzer is None:
             # Fallback to rule-based sentiment
             text_lower = text.lower()
@@ -264,7 +275,8 @@ class TextClassifier:
             else:
                 return 'Neutral'
         else:
-            scores = self.sentiment_analyzer.polarity_scores(text)
+            if scores is None:
+                scores = self.sentiment_analyzer.polarity_scores(text)
             
             if scores['compound'] >= 0.05:
                 return 'Positive'
@@ -273,36 +285,56 @@ class TextClassifier:
             else:
                 return 'Neutral'
     
-    def predict_sentiment(self, text):
-        """Predict sentiment with confidence score"""
+    def _predict_ml_sentiment(self, processed_text):
+        """Return (label, confidence) from the ML model"""
+        X = self.sentiment_vectorizer.transform([processed_text])
+        ml_proba = self.sentiment_model.predict_proba(X)[0]
+        # argmax of the probabilities is the model's prediction, without a second predict() pass
+        best = int(np.argmax(ml_proba))
+        ml_prediction = self.sentiment_model.classes_[best]
+        
+        # Map to our labels
+        label_map = {'positive': 'Positive', 'negative': 'Negative', 'neutral': 'Neutral'}
+        return label_map.get(ml_prediction, 'Neutral'), ml_proba[best]
+    
+    def predict_sentiment(self, text, mode='full', include_scores=None):
+        """Predict sentiment with confidence score.
+        
+        Signals are evaluated cheapest-decisive-first: a confident ML
+        prediction settles the label, and VADER only runs when it is needed
+        for the label or for the score breakdown. mode='fast' skips the
+        score breakdown unless include_scores is set; mode='full' returns
+        exactly what the original combined model did.
+        """
+        if include_scores is None:
+            include_scores = mode != 'fast'
+        
         if not text:
             return {"label": "Neutral", "confidence": 0.5, "scores": {"positive": 0.33, "negative": 0.33, "neutral": 0.34}}
         
         # Preprocess
         processed_text = self._preprocess_text(text)
-        
-        # Get VADER sentiment
-        vader_sentiment = self._calculate_vader_sentiment(text)
-        vader_scores = self.sentiment_analyzer.polarity_scores(text)
+        vader_scores = None
         
         # Get ML model prediction
         try:
-            X = self.sentiment_vectorizer.transform([processed_text])
-            ml_prediction = self.sentiment_model.predict(X)[0]
-            ml_proba = self.sentiment_model.predict_proba(X)[0]
-            
-            # Map to our labels
-            label_map = {'positive': 'Positive', 'negative': 'Negative', 'neutral': 'Neutral'}
-            ml_sentiment = label_map.get(ml_prediction, 'Neutral')
+            ml_sentiment, ml_confidence = self._predict_ml_sentiment(processed_text)
             
             # Combine VADER and ML results
-            if ml_proba.max() > 0.7:
+            if ml_confidence > 0.7:
                 final_sentiment = ml_sentiment
-                confidence = ml_proba.max()
+                confidence = ml_confidence
             else:
-                final_sentiment = vader_sentiment
+                vader_scores = self.sentiment_analyzer.polarity_scores(text)
+                final_sentiment = self._calculate_vader_sentiment(text, vader_scores)
                 confidence = abs(vader_scores['compound'])
             
+            if not include_scores:
+                return {'label': final_sentiment, 'confidence': min(confidence, 1.0)}
+            
+            if vader_scores is None:
+                vader_scores = self.sentiment_analyzer.polarity_scores(text)
+            
             # Calculate detailed scores
             scores = {
                 'positive': max(0, vader_scores['pos']),
@@ -319,7 +351,9 @@ class TextClassifier:
             
         except:
             # Fallback to VADER
-            final_sentiment = vader_sentiment
+            if vader_scores is None:
+                vader_scores = self.sentiment_analyzer.polarity_scores(text)
+            final_sentiment = self._calculate_vader_sentiment(text, vader_scores)
             confidence = abs(vader_scores['compound'])
             scores = {
                 'positive': max(0, vader_scores['pos']),
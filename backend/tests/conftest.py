@@ -0,0 +1,5 @@
+import os
+import sys
+
+# Tests import the backend's packages (utils, model) the way app.py does
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
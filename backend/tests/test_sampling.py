@@ -0,0 +1,120 @@
+import random
+from collections import Counter
+
+import pytest
+
+from utils.sampling import Reservoir, StratifiedSampler, ProportionEstimate
+
+
+def _result(sentiment, emotion='Happy', topics=('Overall',)):
+    return {'sentiment': {'label': sentiment}, 'emotion': {'label': emotion}, 'topics': list(topics),
+            'aspects': {'acting': 'Positive'}}
+
+
+def test_reservoir_keeps_a_short_stream_whole():
+    reservoir = Reservoir(10, random.Random(1))
+    reservoir.extend(list(range(4)))
+    reservoir.extend(list(range(4, 7)))
+    assert reservoir.items == list(range(7))
+    assert reservoir.seen == 7
+
+
+def _sample(size, length, rng):
+    reservoir = Reservoir(size, rng)
+    stream = list(range(length))
+    # Uneven blocks, so fills and skips cross block boundaries
+    position = 0
+    while position < length:
+        step = rng.randint(1, 30)
+        reservoir.extend(stream[position:position + step])
+        position += step
+    assert reservoir.seen == length
+    assert len(reservoir.items) == size
+    assert len(set(reservoir.items)) == size
+    return reservoir.items
+
+
+def test_reservoir_includes_every_item_with_equal_probability():
+    size, length, trials = 10, 200, 20000
+    rng = random.Random(5)
+    inclusions = Counter()
+    for _ in range(trials):
+        inclusions.update(_sample(size, length, rng))
+
+    expected = trials * size / length
+    chi_square = sum((inclusions[item] - expected) ** 2 / expected for item in range(length))
+    # 99.9th percentile of chi-square with 199 degrees of freedom
+    assert chi_square < 263.0
+    # The items that filled the reservoir are replaced at the right rate
+    assert abs(sum(inclusions[item] for item in range(size)) - size * expected) < 0.05 * size * expected
+
+
+def test_reservoir_sample_is_uniform_over_a_long_stream():
+    size, length, trials, buckets = 10, 5000, 2000, 10
+    rng = random.Random(7)
+    inclusions = Counter()
+    for _ in range(trials):
+        reservoir = Reservoir(size, rng)
+        stream = list(range(length))
+        # Uneven blocks, so fills and skips cross block boundaries
+        position = 0
+        while position < length:
+            step = rng.randint(1, 700)
+            reservoir.extend(stream[position:position + step])
+            position += step
+        assert reservoir.seen == length
+        assert len(reservoir.items) == size
+        assert len(set(reservoir.items)) == size
+        inclusions.update(item * buckets // length for item in reservoir.items)
+
+    expected = trials * size / buckets
+    chi_square = sum((inclusions[bucket] - expected) ** 2 / expected for bucket in range(buckets))
+    # 99.9th percentile of chi-square with 9 degrees of freedom
+    assert chi_square < 27.88, inclusions
+    # The first and last items in particular are neither favored nor starved
+    assert abs(inclusions[0] - expected) < 0.1 * expected
+    assert abs(inclusions[buckets - 1] - expected) < 0.1 * expected
+
+
+def test_rounds_allocate_in_proportion_and_cover_every_row():
+    sampler = StratifiedSampler(size=1000, seed=3)
+    sampler.add([f'a{i}' for i in range(300)] + [f'b{i}' for i in range(100)], ['a'] * 300 + ['b'] * 100)
+    rounds = sampler.rounds(first=40)
+    first = next(rounds)
+    assert Counter(key for key, _ in first) == {'a': 30, 'b': 10}
+    taken = list(first)
+    try:
+        while True:
+            taken.extend(rounds.send(100))
+    except StopIteration:
+        pass
+    assert len(taken) == 400
+    assert len({text for _, text in taken}) == 400
+
+
+def test_interval_has_zero_width_when_every_stratum_is_fully_sampled():
+    strata = {'a': 4, 'b': 2}
+    estimate = ProportionEstimate(strata)
+    for label in ('Positive', 'Positive', 'Negative', 'Neutral'):
+        estimate.add('a', _result(label))
+    for label in ('Negative', 'Negative'):
+        estimate.add('b', _result(label))
+
+    proportion, low, high = estimate.interval(('sentiment', 'Negative'))
+    assert proportion == pytest.approx(4 / 6 * 1 / 4 + 2 / 6 * 1)
+    assert low == high == proportion
+    assert estimate.margin() == 0
+
+
+def test_interval_shrinks_as_a_stratum_fills_up():
+    strata = {'a': 100}
+    widths = []
+    estimate = ProportionEstimate(strata)
+    for i in range(100):
+        estimate.add('a', _result('Positive' if i % 2 else 'Negative'))
+        if i + 1 in (10, 50, 90, 100):
+            _, low, high = estimate.interval(('sentiment', 'Positive'))
+            widths.append(high - low)
+    assert widths == sorted(widths, reverse=True)
+    assert widths[0] > 0
+    assert widths[-1] == 0
@@ -0,0 +1,87 @@
+import hashlib
+import io
+import random
+
+import pytest
+
+from utils.uploads import UploadStore, UploadError, UPLOAD_MIN_CHUNK_BYTES
+
+CHUNK = UPLOAD_MIN_CHUNK_BYTES
+
+
+@pytest.fixture
+def store(tmp_path):
+    return UploadStore(root=str(tmp_path))
+
+
+@pytest.fixture
+def data():
+    rng = random.Random(11)
+    return bytes(rng.getrandbits(8) for _ in range(3 * CHUNK + 1234))
+
+
+def _chunks(data):
+    return [data[start:start + CHUNK] for start in range(0, len(data), CHUNK)]
+
+
+def _send(store, upload_id, number, chunk, sha256=None):
+    return store.write_chunk(upload_id, number, io.BytesIO(chunk), sha256 or hashlib.sha256(chunk).hexdigest())
+
+
+def _assembled(store, upload_id):
+    with open(store.path(upload_id, 'data'), 'rb') as f:
+        return f.read()
+
+
+def test_chunks_in_order_assemble_the_file(store, data):
+    session = store.create('reviews.csv', len(data), CHUNK)
+    for number, chunk in enumerate(_chunks(data)):
+        _send(store, session['id'], number, chunk)
+    final = store.finalize(session['id'], hashlib.sha256(data).hexdigest())
+    assert final['complete']
+    assert _assembled(store, session['id']) == data
+
+
+def test_out_of_order_and_retried_chunks_give_the_same_file(store, data):
+    session = store.create('reviews.csv', len(data), CHUNK)
+    chunks = _chunks(data)
+    for number in (3, 1, 0, 1, 2, 3, 0):
+        status = _send(store, session['id'], number, chunks[number])
+    assert status['received'] == [0, 1, 2, 3]
+    assert status['bytes_received'] == len(data)
+    store.finalize(session['id'], hashlib.sha256(data).hexdigest())
+    assert _assembled(store, session['id']) == data
+
+
+def test_missing_chunks_block_finalize(store, data):
+    session = store.create('reviews.csv', len(data), CHUNK)
+    _send(store, session['id'], 2, _chunks(data)[2])
+    with pytest.raises(UploadError) as error:
+        store.finalize(session['id'])
+    assert error.value.status == 409
+    assert store.get(session['id'])['received'] == [2]
+
+
+def test_conflicting_checksum_is_409_and_keeps_the_first_chunk(store, data):
+    session = store.create('reviews.csv', len(data), CHUNK)
+    chunks = _chunks(data)
+    _send(store, session['id'], 1, chunks[1])
+    other = bytes(reversed(chunks[1]))
+    with pytest.raises(UploadError) as error:
+        _send(store, session['id'], 1, other)
+    assert error.value.status == 409
+    for number in (0, 2, 3):
+        _send(store, session['id'], number, chunks[number])
+    store.finalize(session['id'], hashlib.sha256(data).hexdigest())
+    assert _assembled(store, session['id']) == data
+
+
+def test_corrupt_chunk_is_rejected_and_not_marked_received(store, data):
+    session = store.create('reviews.csv', len(data), CHUNK)
+    chunk = _chunks(data)[0]
+    with pytest.raises(UploadError) as error:
+        _send(store, session['id'], 0, chunk, sha256=hashlib.sha256(b'other').hexdigest())
+    assert error.value.status == 400
+    assert store.get(session['id'])['received'] == []
+    with pytest.raises(UploadError):
+        _send(store, session['id'], 0, chunk[:-1])
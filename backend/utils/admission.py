@@ -0,0 +1,167 @@
+import os
+import math
+import asyncio
+import time
+import threading
+
+from utils import metrics
+
+CPU_COUNT = os.cpu_count() or 1
+
+# Endpoints gated by each admission class; everything else is admitted unconditionally.
+# Resumable upload calls other than analyze are I/O only, so they do not take an analysis slot.
+INTERACTIVE_ENDPOINTS = ('classify_text', 'sentiment_only', 'topics_only')
+BATCH_ENDPOINTS = ('batch_analyze', 'simple_batch', 'upload_csv', 'retry_job', 'analyze_upload',
+                   'batch_summary', 'batch_estimate', 'reanalyze')
+
+
+class AdmissionRejected(Exception):
+    """Raised when a request cannot be admitted; carries the HTTP status and Retry-After seconds"""
+
+    def __init__(self, message, status, retry_after):
+        super().__init__(message)
+        self.status = status
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    """Bounded concurrency with a bounded wait queue for one class of requests.
+
+    Up to max_concurrent requests run at once and up to max_queue more
+    wait up to queue_timeout seconds for a slot. A request arriving to a
+    full queue is rejected at once with 429; one that waits too long is
+    rejected with 503. Both carry a Retry-After estimate derived from the
+    recent time each admitted request held its slot.
+    """
+
+    # Weight of the newest observation in the running hold-time estimate
+    HOLD_SMOOTHING = 0.2
+
+    def __init__(self, name, max_concurrent, max_queue, queue_timeout):
+        self.name = name
+        self.max_concurrent = max(1, int(max_concurrent))
+        self.max_queue = max(0, int(max_queue))
+        self.queue_timeout = float(queue_timeout)
+        self.active = 0
+        self.waiting = 0
+        self.average_hold = 0.0
+        self._condition = threading.Condition()
+
+    def retry_after(self):
+        """Seconds until a slot is likely to be free for a new arrival, at least 1"""
+        backlog = (self.waiting + 1) / self.max_concurrent
+        return max(1, math.ceil(self.average_hold * backlog))
+
+    def _reject(self, reason, status):
+        metrics.ADMISSION_REJECTED.inc(self.name, reason)
+        raise AdmissionRejected(f"Server busy ({self.name} {reason})", status, self.retry_after())
+
+    def acquire(self):
+        """Take a slot, waiting in the queue if needed; returns the admission time.
+
+        Raises AdmissionRejected when the queue is full or the wait times out.
+        """
+        with self._condition:
+            if self.active >= self.max_concurrent:
+                if self.waiting >= self.max_queue:
+                    self._reject('queue_full', 429)
+                self.waiting += 1
+                metrics.ADMISSION_QUEUED.inc(self.name)
+                deadline = time.monotonic() + self.queue_timeout
+                try:
+                    while self.active >= self.max_concurrent:
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            self._reject('queue_timeout', 503)
+                        self._condition.wait(remaining)
+                finally:
+                    self.waiting -= 1
+                    metrics.ADMISSION_QUEUED.dec(self.name)
+            self.active += 1
+            metrics.ADMISSION_ACTIVE.inc(self.name)
+        return time.monotonic()
+
+    def release(self, admitted_at):
+        """Free a slot taken at admitted_at and wake one waiter"""
+        held = time.monotonic() - admitted_at
+        with self._condition:
+            self.active -= 1
+            self.average_hold += self.HOLD_SMOOTHING * (held - self.average_hold)
+            metrics.ADMISSION_ACTIVE.dec(self.name)
+            self._condition.notify()
+
+
+class AsyncAdmissionController(AdmissionController):
+    """AdmissionController for an asyncio server: waiting requests park on the event loop.
+
+    Must be used from a single event loop; acquire and release are coroutines.
+    """
+
+    def __init__(self, name, max_concurrent, max_queue, queue_timeout):
+        super().__init__(name, max_concurrent, max_queue, queue_timeout)
+        # Created on first use so it binds to the serving loop
+        self._condition = None
+
+    async def acquire(self):
+        if self._condition is None:
+            self._condition = asyncio.Condition()
+        if self.active >= self.max_concurrent:
+            if self.waiting >= self.max_queue:
+                self._reject('queue_full', 429)
+            self.waiting += 1
+            metrics.ADMISSION_QUEUED.inc(self.name)
+            try:
+                async with self._condition:
+                    await asyncio.wait_for(
+                        self._condition.wait_for(lambda: self.active < self.max_concurrent),
+                        self.queue_timeout)
+                    self._take()
+                    return time.monotonic()
+            except asyncio.TimeoutError:
+                self._reject('queue_timeout', 503)
+            finally:
+                self.waiting -= 1
+                metrics.ADMISSION_QUEUED.dec(self.name)
+        self._take()
+        return time.monotonic()
+
+    def _take(self):
+        self.active += 1
+        metrics.ADMISSION_ACTIVE.inc(self.name)
+
+    async def release(self, admitted_at):
+        held = time.monotonic() - admitted_at
+        self.active -= 1
+        self.average_hold += self.HOLD_SMOOTHING * (held - self.average_hold)
+        metrics.ADMISSION_ACTIVE.dec(self.name)
+        async with self._condition:
+            self._condition.notify()
+
+
+def _setting(name, default):
+    return float(os.environ.get(name, default))
+
+
+def build_controllers(controller_class=AdmissionController):
+    """Build the interactive and batch controllers from ADMISSION_* settings"""
+    return {
+        'interactive': controller_class(
+            'interactive',
+            max_concurrent=_setting('ADMISSION_INTERACTIVE_CONCURRENCY', CPU_COUNT),
+            max_queue=_setting('ADMISSION_INTERACTIVE_QUEUE', 4 * CPU_COUNT),
+            queue_timeout=_setting('ADMISSION_INTERACTIVE_QUEUE_TIMEOUT', 2.0)),
+        'batch': controller_class(
+            'batch',
+            max_concurrent=_setting('ADMISSION_BATCH_CONCURRENCY', max(1, CPU_COUNT // 2)),
+            max_queue=_setting('ADMISSION_BATCH_QUEUE', 2),
+            queue_timeout=_setting('ADMISSION_BATCH_QUEUE_TIMEOUT', 30.0))
+    }
+
+
+def admission_class(endpoint):
+    """Return the admission class for a Flask endpoint name, or None if it is not gated"""
+    if endpoint in INTERACTIVE_ENDPOINTS:
+        return 'interactive'
+    if endpoint in BATCH_ENDPOINTS:
+        return 'batch'
+    return None
@@ -0,0 +1,196 @@
+import os
+from collections import Counter
+
+import numpy as np
+
+from utils.result_formats import ASPECTS
+
+# Equal-width bins over [0, 1] for the confidence histograms
+SUMMARY_HISTOGRAM_BINS = 20
+# Keywords tracked by the heavy-hitter sketch; counts are exact while fewer distinct keywords are seen
+SUMMARY_KEYWORD_CAPACITY = int(os.environ.get('SUMMARY_KEYWORD_CAPACITY', 1000))
+SUMMARY_TOP_KEYWORDS = int(os.environ.get('SUMMARY_TOP_KEYWORDS', 25))
+
+
+class KeywordSketch:
+    """Misra-Gries heavy hitters over keyword counts.
+
+    Holds at most capacity keywords (twice that between prunes). Every
+    keyword occurring more than total / (capacity + 1) times is kept, and
+    a kept count is at most `error` below the true count. Sketches merge
+    by adding counts and pruning again, with the same bound.
+    """
+
+    def __init__(self, capacity=SUMMARY_KEYWORD_CAPACITY):
+        self.capacity = capacity
+        self.counts = {}
+        self.error = 0
+
+    def add(self, keyword, weight=1):
+        self.counts[keyword] = self.counts.get(keyword, 0) + weight
+        if len(self.counts) > 2 * self.capacity:
+            self._prune()
+
+    def merge(self, other):
+        for keyword, count in other.counts.items():
+            self.counts[keyword] = self.counts.get(keyword, 0) + count
+        self.error += other.error
+        self._prune()
+
+    def _prune(self):
+        if len(self.counts) <= self.capacity:
+            return
+        # Subtract the (capacity + 1)-th largest count from every keyword
+        cut = sorted(self.counts.values(), reverse=True)[self.capacity]
+        self.counts = {keyword: count - cut for keyword, count in self.counts.items() if count > cut}
+        self.error += cut
+
+    def top(self, n):
+        return sorted(self.counts.items(), key=lambda item: (-item[1], item[0]))[:n]
+
+
+def _histogram(values):
+    histogram = np.zeros(SUMMARY_HISTOGRAM_BINS, dtype=np.int64)
+    if values is not None:
+        if len(values) != SUMMARY_HISTOGRAM_BINS:
+            raise ValueError(f"Histograms must have {SUMMARY_HISTOGRAM_BINS} bins")
+        histogram += np.asarray(values, dtype=np.int64)
+    return histogram
+
+
+def _bin(confidence):
+    return min(max(int(float(confidence) * SUMMARY_HISTOGRAM_BINS), 0), SUMMARY_HISTOGRAM_BINS - 1)
+
+
+class ResultSummary:
+    """Aggregates of batch results that do not grow with the number of rows.
+
+    Label counts for sentiment, emotion, tone and topics, confidence
+    histograms per label, an aspect-by-sentiment count matrix, text
+    length totals and a KeywordSketch. Summaries of disjoint parts of
+    a file merge into the summary of the whole, so parts can be
+    summarized by different workers or servers: to_dict() is both the
+    response and the state that from_dict() reads back for merging.
+    """
+
+    def __init__(self, keyword_capacity=SUMMARY_KEYWORD_CAPACITY):
+        self.rows = 0
+        self.errors = 0
+        self.skipped = 0
+        self.sentiment = Counter()
+        self.emotion = Counter()
+        self.tone = Counter()
+        self.topics = Counter()
+        self.aspects = {aspect: Counter() for aspect in ASPECTS}
+        self.sentiment_confidence = {}
+        self.emotion_confidence = {}
+        self.length_total = 0
+        self.length_min = None
+        self.length_max = None
+        self.keywords = KeywordSketch(keyword_capacity)
+
+    def add(self, result, weight=1):
+        """Count one analyzed result weight times (once per row carrying its text)"""
+        self.rows += weight
+        sentiment = result.get('sentiment')
+        if sentiment is not None:
+            self._label(self.sentiment, self.sentiment_confidence, sentiment, weight)
+        emotion = result.get('emotion')
+        if emotion is not None:
+            self._label(self.emotion, self.emotion_confidence, emotion, weight)
+        for topic in result.get('topics') or ():
+            self.topics[topic] += weight
+        aspects = result.get('aspects')
+        if aspects is not None:
+            for aspect in ASPECTS:
+                self.aspects[aspect][aspects.get(aspect, 'Neutral')] += weight
+        text_analysis = result.get('text_analysis')
+        if text_analysis is not None:
+            self.tone[text_analysis['tone']] += weight
+            length = text_analysis['length']
+            self.length_total += length * weight
+            self.length_min = length if self.length_min is None else min(self.length_min, length)
+            self.length_max = length if self.length_max is None else max(self.length_max, length)
+        for keyword in result.get('keywords') or ():
+            self.keywords.add(keyword, weight)
+
+    @staticmethod
+    def _label(counts, histograms, value, weight):
+        label = value['label']
+        counts[label] += weight
+        histogram = histograms.get(label)
+        if histogram is None:
+            histogram = histograms[label] = _histogram(None)
+        histogram[_bin(value['confidence'])] += weight
+
+    def merge(self, other):
+        """Add another summary's counts into this one; returns self"""
+        self.rows += other.rows
+        self.errors += other.errors
+        self.skipped += other.skipped
+        for name in ('sentiment', 'emotion', 'tone', 'topics'):
+            getattr(self, name).update(getattr(other, name))
+        for aspect, counts in other.aspects.items():
+            self.aspects.setdefault(aspect, Counter()).update(counts)
+        for name in ('sentiment_confidence', 'emotion_confidence'):
+            histograms = getattr(self, name)
+            for label, histogram in getattr(other, name).items():
+                histograms[label] = histograms.get(label, _histogram(None)) + histogram
+        self.length_total += other.length_total
+        for name, pick in (('length_min', min), ('length_max', max)):
+            values = [value for value in (getattr(self, name), getattr(other, name)) if value is not None]
+            setattr(self, name, pick(values) if values else None)
+        self.keywords.merge(other.keywords)
+        return self
+
+    def to_dict(self, top_keywords=SUMMARY_TOP_KEYWORDS):
+        self.keywords._prune()
+        lengths = sum(self.tone.values())
+        return {
+            'rows': self.rows,
+            'errors': self.errors,
+            'skipped': self.skipped,
+            'sentiment': dict(self.sentiment),
+            'sentiment_confidence': {label: histogram.tolist()
+                                     for label, histogram in self.sentiment_confidence.items()},
+            'emotion': dict(self.emotion),
+            'emotion_confidence': {label: histogram.tolist()
+                                   for label, histogram in self.emotion_confidence.items()},
+            'histogram_bins': SUMMARY_HISTOGRAM_BINS,
+            'aspects': {aspect: dict(counts) for aspect, counts in self.aspects.items()},
+            'topics': dict(self.topics),
+            'tone': dict(self.tone),
+            'text_length': {'total': self.length_total, 'min': self.length_min, 'max': self.length_max,
+                            'mean': round(self.length_total / lengths, 1) if lengths else None},
+            'top_keywords': [[keyword, count] for keyword, count in self.keywords.top(top_keywords)],
+            'keyword_sketch': {'capacity': self.keywords.capacity, 'error': self.keywords.error,
+                               'counts': dict(self.keywords.counts)}
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        """Rebuild a summary from to_dict() output; raises ValueError if it is malformed"""
+        try:
+            sketch = data['keyword_sketch']
+            summary = cls(int(sketch['capacity']))
+            summary.keywords.error = int(sketch['error'])
+            summary.keywords.counts = {str(keyword): int(count) for keyword, count in sketch['counts'].items()}
+            if data.get('histogram_bins', SUMMARY_HISTOGRAM_BINS) != SUMMARY_HISTOGRAM_BINS:
+                raise ValueError(f"Histograms must have {SUMMARY_HISTOGRAM_BINS} bins")
+            summary.rows = int(data['rows'])
+            summary.errors = int(data.get('errors', 0))
+            summary.skipped = int(data.get('skipped', 0))
+            for name in ('sentiment', 'emotion', 'tone', 'topics'):
+                getattr(summary, name).update({str(label): int(count) for label, count in data[name].items()})
+            for aspect, counts in data['aspects'].items():
+                summary.aspects.setdefault(aspect, Counter()).update(
+                    {str(label): int(count) for label, count in counts.items()})
+            for name in ('sentiment_confidence', 'emotion_confidence'):
+                setattr(summary, name, {str(label): _histogram(values) for label, values in data[name].items()})
+            lengths = data['text_length']
+            summary.length_total = int(lengths['total'])
+            summary.length_min = lengths['min']
+            summary.length_max = lengths['max']
+        except (KeyError, TypeError, AttributeError) as e:
+            raise ValueError(f"Invalid summary: {e!r}")
+        return summary
@@ -0,0 +1,286 @@
+import os
+import sys
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+# Rebuilt result dicts kept per batch, so duplicate rows of a popular text reuse one
+RESULT_ROW_CACHE = int(os.environ.get('RESULT_ROW_CACHE', 1024))
+
+_INITIAL_CAPACITY = 64
+_INT32_RANGE = (-(1 << 31), (1 << 31) - 1)
+
+
+def _grow(array, size, fill=0):
+    """Return array with room for at least size entries, doubling its capacity"""
+    if size <= len(array):
+        return array
+    grown = np.full(max(size, 2 * len(array), _INITIAL_CAPACITY), fill, dtype=array.dtype)
+    grown[:len(array)] = array
+    return grown
+
+
+class _Vocabulary:
+    """Interned strings with small-integer codes"""
+
+    def __init__(self):
+        self.values = []
+        self._codes = {}
+        self.nbytes = 0
+
+    def code(self, value):
+        code = self._codes.get(value)
+        if code is None:
+            code = self._codes[value] = len(self.values)
+            self.values.append(value)
+            self.nbytes += sys.getsizeof(value)
+        return code
+
+
+class _Column:
+    """One leaf of the result dicts (e.g. sentiment.confidence) for every stored row"""
+
+    def __init__(self):
+        self.present = np.zeros(0, dtype=bool)
+
+    def accepts(self, value):
+        raise NotImplementedError
+
+    def set(self, position, value):
+        self.present = _grow(self.present, position + 1, False)
+        self.present[position] = True
+        self._set(position, value)
+
+    @property
+    def nbytes(self):
+        return self.present.nbytes
+
+
+class _NumberColumn(_Column):
+    """int32 or float32 values; an int column becomes float32 when a float arrives"""
+
+    def __init__(self, dtype):
+        super().__init__()
+        self.values = np.zeros(0, dtype=dtype)
+
+    def accepts(self, value):
+        if isinstance(value, (bool, np.bool_)):
+            return False
+        if isinstance(value, (int, np.integer)):
+            return _INT32_RANGE[0] <= value <= _INT32_RANGE[1]
+        if isinstance(value, (float, np.floating)):
+            if self.values.dtype != np.float32:
+                self.values = self.values.astype(np.float32)
+            return True
+        return False
+
+    def _set(self, position, value):
+        self.values = _grow(self.values, position + 1)
+        self.values[position] = value
+
+    def get(self, position):
+        value = self.values[position]
+        if self.values.dtype == np.float32:
+            # str() of a float32 is its shortest round-tripping form, so 0.8591 comes back as 0.8591
+            return float(str(value))
+        return int(value)
+
+    @property
+    def nbytes(self):
+        return super().nbytes + self.values.nbytes
+
+
+class _LabelColumn(_Column):
+    """Strings as int16 codes into a vocabulary (int32 once it outgrows int16)"""
+
+    def __init__(self):
+        super().__init__()
+        self.codes = np.zeros(0, dtype=np.int16)
+        self.vocabulary = _Vocabulary()
+
+    def accepts(self, value):
+        return isinstance(value, str)
+
+    def _set(self, position, value):
+        code = self.vocabulary.code(value)
+        if code > np.iinfo(self.codes.dtype).max:
+            self.codes = self.codes.astype(np.int32)
+        self.codes = _grow(self.codes, position + 1)
+        self.codes[position] = code
+
+    def get(self, position):
+        return self.vocabulary.values[self.codes[position]]
+
+    @property
+    def nbytes(self):
+        return super().nbytes + self.codes.nbytes + self.vocabulary.nbytes
+
+
+class _ListColumn(_Column):
+    """Lists of strings (topics, keywords) as int32 codes in one flat array, indexed by per-row offsets"""
+
+    def __init__(self):
+        super().__init__()
+        self.starts = np.zeros(0, dtype=np.int64)
+        self.lengths = np.zeros(0, dtype=np.int32)
+        self.codes = np.zeros(0, dtype=np.int32)
+        self.size = 0
+        self.vocabulary = _Vocabulary()
+
+    def accepts(self, value):
+        return isinstance(value, list) and all(isinstance(item, str) for item in value)
+
+    def _set(self, position, value):
+        self.starts = _grow(self.starts, position + 1)
+        self.lengths = _grow(self.lengths, position + 1)
+        self.codes = _grow(self.codes, self.size + len(value))
+        self.starts[position] = self.size
+        self.lengths[position] = len(value)
+        for item in value:
+            self.codes[self.size] = self.vocabulary.code(item)
+            self.size += 1
+
+    def get(self, position):
+        start = self.starts[position]
+        return [self.vocabulary.values[code] for code in self.codes[start:start + self.lengths[position]]]
+
+    @property
+    def nbytes(self):
+        return (super().nbytes + self.starts.nbytes + self.lengths.nbytes + self.codes.nbytes
+                + self.vocabulary.nbytes)
+
+
+class _ObjectColumn(_Column):
+    """Fallback for values no typed column takes: None, empty dicts, mixed lists"""
+
+    def __init__(self):
+        super().__init__()
+        self.values = {}
+
+    def accepts(self, value):
+        return True
+
+    def _set(self, position, value):
+        self.values[position] = value
+
+    def get(self, position):
+        return self.values[position]
+
+    @property
+    def nbytes(self):
+        return super().nbytes + sum(sys.getsizeof(value) for value in self.values.values())
+
+
+def _column_for(value):
+    if isinstance(value, (int, np.integer)) and not isinstance(value, (bool, np.bool_)):
+        column = _NumberColumn(np.int32)
+    elif isinstance(value, (float, np.floating)):
+        column = _NumberColumn(np.float32)
+    elif isinstance(value, str):
+        column = _LabelColumn()
+    elif isinstance(value, list):
+        column = _ListColumn()
+    else:
+        column = _ObjectColumn()
+    return column if column.accepts(value) else _ObjectColumn()
+
+
+def _leaves(value, path=()):
+    """(path, value) for every non-dict leaf of a nested result dict; empty dicts are leaves"""
+    if isinstance(value, dict) and value:
+        for key, item in value.items():
+            yield from _leaves(item, path + (key,))
+    else:
+        yield path, value
+
+
+class BatchResults:
+    """Analysis results of a batch's distinct texts, held column by column.
+
+    Every leaf of the per-text result dicts becomes a typed NumPy column:
+    labels (sentiment, emotion, aspects, tone) as small-integer codes,
+    confidences and scores as float32, counts as int32, and topics and
+    keywords as offset-indexed code arrays. A row costs a few hundred
+    bytes instead of the several kilobytes of its nested dicts. Results
+    are turned back into dicts only by get(), when they are serialized.
+
+    add() may be called from several analysis workers at once; rows are
+    looked up by distinct-text index (the result's id - 1).
+    """
+
+    def __init__(self, cache_rows=RESULT_ROW_CACHE):
+        self.cache_rows = cache_rows
+        self._recent = OrderedDict()
+        self._columns = {}
+        self._positions = np.zeros(0, dtype=np.int32)
+        self._count = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return self._count
+
+    def add(self, results):
+        """Store results as returned by the batch analyzers (dicts with 'id' and 'text')"""
+        with self._lock:
+            for result in results:
+                position = self._count
+                self._count += 1
+                index = result['id'] - 1
+                self._positions = _grow(self._positions, index + 1, -1)
+                self._positions[index] = position
+                for key, value in result.items():
+                    if key in ('id', 'text'):
+                        continue
+                    for path, leaf in _leaves(value, (key,)):
+                        self._set(path, position, leaf)
+
+    def _set(self, path, position, value):
+        column = self._columns.get(path)
+        if column is None:
+            column = self._columns[path] = _column_for(value)
+        elif not column.accepts(value):
+            column = self._columns[path] = self._as_objects(column)
+        column.set(position, value)
+
+    def _as_objects(self, column):
+        objects = _ObjectColumn()
+        for position in np.flatnonzero(column.present):
+            objects.set(int(position), column.get(position))
+        return objects
+
+    def get(self, index):
+        """The result dict for distinct text index, without its text, or None if it failed.
+
+        Recently rebuilt rows are cached, so rows repeating a popular text
+        are not rebuilt each time; callers must not modify the dict.
+        """
+        with self._lock:
+            result = self._recent.get(index)
+            if result is not None:
+                self._recent.move_to_end(index)
+                return result
+            if not 0 <= index < len(self._positions) or self._positions[index] < 0:
+                return None
+            position = int(self._positions[index])
+            result = {'id': index + 1}
+            for path, column in self._columns.items():
+                if position >= len(column.present) or not column.present[position]:
+                    continue
+                target = result
+                for key in path[:-1]:
+                    target = target.setdefault(key, {})
+                target[path[-1]] = column.get(position)
+            self._recent[index] = result
+            if len(self._recent) > self.cache_rows:
+                self._recent.popitem(last=False)
+        return result
+
+    @property
+    def nbytes(self):
+        """Bytes held by the columns, index and vocabularies"""
+        with self._lock:
+            return self._positions.nbytes + sum(column.nbytes for column in self._columns.values())
+
+    def bytes_per_row(self):
+        return round(self.nbytes / self._count, 1) if self._count else 0.0
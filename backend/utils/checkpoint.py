@@ -0,0 +1,151 @@
+import os
+import json
+import time
+import shutil
+import hashlib
+import tempfile
+import threading
+
+from utils.jobs import JOB_TTL
+from utils.result_formats import json_default
+
+# Completed analysis chunks of large batch jobs, so a retried job or upload resumes
+CHECKPOINT_DIR = os.environ.get('CHECKPOINT_DIR', os.path.join(tempfile.gettempdir(), 'text-analysis-checkpoints'))
+
+_BLOCK_SIZE = 1 << 20
+
+
+def file_digest(stream):
+    """SHA-256 of a seekable binary stream, read in blocks; the stream is rewound"""
+    digest = hashlib.sha256()
+    stream.seek(0)
+    for block in iter(lambda: stream.read(_BLOCK_SIZE), b''):
+        digest.update(block)
+    stream.seek(0)
+    return digest.hexdigest()
+
+
+def write_durably(path, data):
+    """Write bytes to path atomically and fsync them, so a crash leaves the old file or the new one"""
+    temporary = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+    with open(temporary, 'wb') as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temporary, path)
+
+
+class BatchCheckpoint:
+    """Analysis results of one input file under one set of settings, one file per chunk.
+
+    Chunk n holds the results for distinct texts [n * chunk_size,
+    (n + 1) * chunk_size). A chunk file exists only once it is complete, so
+    its presence is the checkpoint; manifest.json records progress as
+    the completed chunks and the distinct-row offset below which every
+    chunk is done.
+    """
+
+    def __init__(self, directory, manifest):
+        self.directory = directory
+        self.manifest = manifest
+        self._lock = threading.Lock()
+
+    @property
+    def key(self):
+        return self.manifest['key']
+
+    @property
+    def chunk_size(self):
+        return self.manifest['chunk_size']
+
+    @property
+    def upload_path(self):
+        """Copy of the uploaded file as received (possibly compressed), kept so the job can be retried"""
+        return os.path.join(self.directory, 'upload')
+
+    def _chunk_path(self, number):
+        return os.path.join(self.directory, f'chunk-{number:06d}.json')
+
+    def done(self, number):
+        return os.path.exists(self._chunk_path(number))
+
+    def save_input(self, stream):
+        """Keep a copy of the uploaded file unless one is already stored"""
+        if os.path.exists(self.upload_path):
+            return
+        temporary = f'{self.upload_path}.{os.getpid()}.tmp'
+        stream.seek(0)
+        with open(temporary, 'wb') as f:
+            shutil.copyfileobj(stream, f, _BLOCK_SIZE)
+            f.flush()
+            os.fsync(f.fileno())
+        stream.seek(0)
+        os.replace(temporary, self.upload_path)
+
+    def save(self, number, results):
+        """Durably store a completed chunk and record it in the manifest"""
+        write_durably(self._chunk_path(number), json.dumps(results, default=json_default).encode())
+        with self._lock:
+            done = set(self.manifest['chunks_done'])
+            done.add(number)
+            offset = self.manifest['rows_checkpointed'] // self.chunk_size
+            while offset in done:
+                offset += 1
+            self.manifest['chunks_done'] = sorted(done)
+            self.manifest['rows_checkpointed'] = min(offset * self.chunk_size, self.manifest['unique_rows'])
+            self.manifest['updated'] = time.time()
+            write_durably(os.path.join(self.directory, 'manifest.json'), json.dumps(self.manifest).encode())
+
+    def load(self, number):
+        """Results of a completed chunk"""
+        with open(self._chunk_path(number)) as f:
+            return json.load(f)
+
+
+class CheckpointStore:
+    """Batch checkpoints in CHECKPOINT_DIR/<key>/, keyed by input file hash and settings"""
+
+    def __init__(self, root=CHECKPOINT_DIR, ttl=JOB_TTL):
+        self.root = root
+        self.ttl = ttl
+
+    @staticmethod
+    def checkpoint_key(file_hash, settings, chunk_size):
+        identity = json.dumps({'file': file_hash, 'settings': settings, 'chunk_size': chunk_size}, sort_keys=True)
+        return hashlib.sha256(identity.encode()).hexdigest()[:32]
+
+    def open(self, file_hash, settings, unique_rows, chunk_size):
+        """Return the checkpoint for this file and settings, creating it if needed"""
+        self.cleanup()
+        key = self.checkpoint_key(file_hash, settings, chunk_size)
+        checkpoint = self.get(key)
+        if checkpoint is not None:
+            return checkpoint
+        directory = os.path.join(self.root, key)
+        os.makedirs(directory, exist_ok=True)
+        manifest = {'key': key, 'file_sha256': file_hash, 'settings': settings, 'chunk_size': chunk_size,
+                    'unique_rows': unique_rows, 'chunks_done': [], 'rows_checkpointed': 0,
+                    'created': time.time(), 'updated': time.time()}
+        write_durably(os.path.join(directory, 'manifest.json'), json.dumps(manifest).encode())
+        return BatchCheckpoint(directory, manifest)
+
+    def get(self, key):
+        """Return an existing checkpoint, or None"""
+        directory = os.path.join(self.root, os.path.basename(str(key)))
+        try:
+            with open(os.path.join(directory, 'manifest.json')) as f:
+                return BatchCheckpoint(directory, json.load(f))
+        except (OSError, ValueError):
+            return None
+
+    def cleanup(self):
+        """Delete checkpoints not updated for more than ttl seconds"""
+        if not os.path.isdir(self.root):
+            return
+        cutoff = time.time() - self.ttl
+        for key in os.listdir(self.root):
+            directory = os.path.join(self.root, key)
+            checkpoint = self.get(key)
+            updated = checkpoint.manifest['updated'] if checkpoint is not None else os.path.getmtime(directory)
+            if updated < cutoff:
+                shutil.rmtree(directory, ignore_errors=True)
@@ -0,0 +1,130 @@
+import io
+import os
+import gzip
+import time
+import zlib
+
+try:
+    import zstandard
+except ImportError:
+    # Optional: without zstandard, zstd uploads are rejected and responses use gzip
+    zstandard = None
+
+GZIP_MAGIC = b'\x1f\x8b'
+ZSTD_MAGIC = b'\x28\xb5\x2f\xfd'
+
+# Responses smaller than this are sent uncompressed
+COMPRESS_MIN_BYTES = int(os.environ.get('COMPRESS_MIN_BYTES', 1024))
+# A streamed compressed response is flushed at least this often, so clients see progress
+COMPRESS_FLUSH_INTERVAL = float(os.environ.get('COMPRESS_FLUSH_INTERVAL', 0.25))
+# Level 1 gzip compresses ~5x faster than level 6 for ~35% more bytes on review CSVs
+GZIP_LEVEL = int(os.environ.get('GZIP_LEVEL', 1))
+ZSTD_LEVEL = int(os.environ.get('ZSTD_LEVEL', 3))
+
+# Parquet is compressed internally, so it is not listed
+COMPRESSIBLE_MIMETYPES = ('text/csv', 'text/plain', 'application/json', 'application/x-ndjson',
+                          'application/vnd.apache.arrow.file')
+
+
+def detect_compression(stream):
+    """Return 'gzip', 'zstd' or None from the magic bytes of a seekable binary stream"""
+    position = stream.tell()
+    magic = stream.read(4)
+    stream.seek(position)
+    if magic.startswith(GZIP_MAGIC):
+        return 'gzip'
+    if magic.startswith(ZSTD_MAGIC):
+        return 'zstd'
+    return None
+
+
+def open_decompressed(stream):
+    """Wrap an uploaded binary stream so gzip or zstd content is decompressed as it is read.
+
+    Plain streams are returned unchanged. Raises ValueError for zstd
+    content when zstandard is not installed.
+    """
+    compression = detect_compression(stream)
+    if compression == 'gzip':
+        return gzip.GzipFile(fileobj=stream, mode='rb')
+    if compression == 'zstd':
+        if zstandard is None:
+            raise ValueError("zstd-compressed uploads require the zstandard package")
+        reader = zstandard.ZstdDecompressor().stream_reader(stream, read_across_frames=True, closefd=False)
+        return io.BufferedReader(reader, buffer_size=1 << 20)
+    return stream
+
+
+def available_encodings():
+    """Content codings responses can use, most preferred first"""
+    return ('zstd', 'gzip') if zstandard is not None else ('gzip',)
+
+
+def negotiate_encoding(accept_encoding):
+    """Pick the response content coding from an Accept-Encoding header, or None for identity"""
+    weights = {}
+    for part in (accept_encoding or '').split(','):
+        name, _, params = part.strip().partition(';')
+        name = name.strip().lower()
+        if not name:
+            continue
+        weight = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                weight = float(params[2:])
+            except ValueError:
+                weight = 0.0
+        weights[name] = weight
+    best, best_weight = None, 0.0
+    for encoding in available_encodings():
+        weight = weights.get(encoding, weights.get('*', 0.0))
+        if weight > best_weight:
+            best, best_weight = encoding, weight
+    return best
+
+
+class StreamCompressor:
+    """Incremental gzip or zstd encoder for streamed response bodies.
+
+    compress() buffers inside the encoder for a better ratio, but flushes
+    whatever is pending once COMPRESS_FLUSH_INTERVAL has passed since the
+    last output, so a slowly produced stream still reaches the client.
+    """
+
+    def __init__(self, encoding, flush_interval=COMPRESS_FLUSH_INTERVAL):
+        self.encoding = encoding
+        self.flush_interval = flush_interval
+        if encoding == 'zstd':
+            self._encoder = zstandard.ZstdCompressor(level=ZSTD_LEVEL).compressobj()
+            self._sync_flush = zstandard.COMPRESSOBJ_FLUSH_BLOCK
+        else:
+            # wbits=31 writes a gzip header and trailer
+            self._encoder = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)
+            self._sync_flush = zlib.Z_SYNC_FLUSH
+        self._last_output = time.monotonic()
+
+    def compress(self, data):
+        output = self._encoder.compress(data)
+        if time.monotonic() - self._last_output >= self.flush_interval:
+            output += self._encoder.flush(self._sync_flush)
+        if output:
+            self._last_output = time.monotonic()
+        return output
+
+    def finish(self):
+        return self._encoder.flush()
+
+
+def compress_chunks(chunks, encoding):
+    """Compress an iterable of byte chunks as a stream; closing it closes the source"""
+    compressor = StreamCompressor(encoding)
+    try:
+        for chunk in chunks:
+            output = compressor.compress(chunk)
+            if output:
+                yield output
+        yield compressor.finish()
+    finally:
+        if hasattr(chunks, 'close'):
+            chunks.close()
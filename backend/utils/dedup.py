@@ -0,0 +1,206 @@
+import os
+import time
+import zlib
+import hashlib
+from collections import defaultdict
+
+import numpy as np
+
+# 'off' analyzes every row, 'exact' collapses identical texts, 'normalized'
+# collapses texts that preprocess to the same string (case, punctuation and
+# whitespace variants), 'near' additionally clusters near-duplicates by MinHash
+DEDUP_MODES = ('off', 'exact', 'normalized', 'near')
+# Exact by default: the analyzers are case- and punctuation-sensitive, so the lossy modes are opt-in
+DEFAULT_DEDUP_MODE = os.environ.get('DEDUP_MODE', 'exact')
+# Modes whose clusters can hold different texts, so a member's result is only its representative's
+LOSSY_DEDUP_MODES = ('normalized', 'near')
+# Minimum estimated Jaccard similarity of word shingles for two texts to share a result
+NEAR_DUPLICATE_THRESHOLD = float(os.environ.get('NEAR_DUPLICATE_THRESHOLD', 0.8))
+MINHASH_PERMUTATIONS = int(os.environ.get('MINHASH_PERMUTATIONS', 64))
+SHINGLE_WORDS = 3
+
+_MERSENNE_PRIME = (1 << 31) - 1
+
+
+def resolve_dedup(value):
+    """Validate a dedup mode, defaulting to DEFAULT_DEDUP_MODE"""
+    mode = str(value or DEFAULT_DEDUP_MODE).strip().lower()
+    if mode not in DEDUP_MODES:
+        raise ValueError(f"Unknown dedup mode: {mode}. Valid modes: {', '.join(DEDUP_MODES)}")
+    return mode
+
+
+def parse_similarity(value):
+    """Parse a near-duplicate similarity threshold in (0, 1], defaulting to NEAR_DUPLICATE_THRESHOLD"""
+    if value is None or value == '':
+        return NEAR_DUPLICATE_THRESHOLD
+    try:
+        threshold = float(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"Invalid similarity: {value}")
+    if not 0 < threshold <= 1:
+        raise ValueError(f"similarity must be in (0, 1], got {value}")
+    return threshold
+
+
+def lsh_bands(permutations, threshold):
+    """(bands, rows per band) whose LSH S-curve midpoint (1/b)^(1/r) is closest to threshold"""
+    options = [(bands, permutations // bands) for bands in range(1, permutations + 1)
+               if permutations % bands == 0]
+    return min(options, key=lambda option: abs((1 / option[0]) ** (1 / option[1]) - threshold))
+
+
+class MinHasher:
+    """MinHash signatures over word shingles, using universal hashes modulo a Mersenne prime"""
+
+    def __init__(self, permutations=MINHASH_PERMUTATIONS, shingle_words=SHINGLE_WORDS, seed=1):
+        rng = np.random.RandomState(seed)
+        self.shingle_words = shingle_words
+        self.a = rng.randint(1, _MERSENNE_PRIME, permutations).astype(np.uint64)
+        self.b = rng.randint(0, _MERSENNE_PRIME, permutations).astype(np.uint64)
+
+    def shingles(self, text):
+        words = text.split()
+        if len(words) <= self.shingle_words:
+            return {text}
+        return {' '.join(words[i:i + self.shingle_words]) for i in range(len(words) - self.shingle_words + 1)}
+
+    def signature(self, text):
+        shingles = self.shingles(text)
+        hashes = np.fromiter((zlib.crc32(shingle.encode()) for shingle in shingles),
+                             dtype=np.uint64, count=len(shingles)) % _MERSENNE_PRIME
+        # a, b and hashes are all below 2**31, so a * hash + b fits in 64 bits
+        return ((np.outer(self.a, hashes) + self.b[:, None]) % _MERSENNE_PRIME).min(axis=1)
+
+
+class _NearDuplicateIndex:
+    """LSH index over cluster representatives.
+
+    A text joins the most similar earlier representative it collides with
+    if their estimated similarity reaches the threshold; otherwise it
+    becomes a representative itself. Comparing only against
+    representatives keeps clusters from chaining into loosely related texts.
+    """
+
+    def __init__(self, threshold, permutations=MINHASH_PERMUTATIONS):
+        self.threshold = threshold
+        self.hasher = MinHasher(permutations)
+        self.bands, self.rows = lsh_bands(permutations, threshold)
+        self.buckets = [defaultdict(list) for _ in range(self.bands)]
+        self.signatures = {}
+
+    def _keys(self, signature):
+        return [signature[band * self.rows:(band + 1) * self.rows].tobytes() for band in range(self.bands)]
+
+    def match(self, text):
+        """Return (id of the representative text belongs to or None, entry to pass to add())"""
+        signature = self.hasher.signature(text)
+        keys = self._keys(signature)
+        candidates = set()
+        for bucket, key in zip(self.buckets, keys):
+            candidates.update(bucket.get(key, ()))
+        best, best_similarity = None, 0.0
+        for candidate in sorted(candidates):
+            similarity = float(np.mean(self.signatures[candidate] == signature))
+            if similarity >= self.threshold and similarity > best_similarity:
+                best, best_similarity = candidate, similarity
+        return best, (signature, keys)
+
+    def add(self, representative, entry):
+        """Register an unmatched text as a representative"""
+        signature, keys = entry
+        self.signatures[representative] = signature
+        for bucket, key in zip(self.buckets, keys):
+            bucket[key].append(representative)
+
+
+class Deduplicator:
+    """Incremental duplicate collapsing, so rows can be fed in blocks as a file is read.
+
+    Texts are keyed by a 128-bit digest of the text (exact) or of
+    normalize(text) (normalized and near), so memory grows with the
+    number of distinct texts rather than their length. The first text
+    seen in a cluster is its representative.
+    """
+
+    def __init__(self, mode=DEFAULT_DEDUP_MODE, normalize=None, threshold=NEAR_DUPLICATE_THRESHOLD):
+        self.mode = mode
+        self.normalize = normalize
+        self.threshold = threshold
+        self._index = _NearDuplicateIndex(threshold) if mode == 'near' else None
+        self._positions = {}
+        self.unique_count = 0
+        self.rows = 0
+        self.rows_with_text = 0
+        self.exact_duplicates = 0
+        self.near_duplicates = 0
+        self.seconds = 0.0
+
+    def add(self, texts):
+        """Returns (per-row index into the representatives or None for empty text,
+        representatives first seen in these texts)"""
+        start = time.perf_counter()
+        row_map = []
+        new = []
+        for text in texts:
+            self.rows += 1
+            if not text or not text.strip():
+                row_map.append(None)
+                continue
+            self.rows_with_text += 1
+            if self.mode == 'off':
+                row_map.append(self.unique_count + len(new))
+                new.append(text)
+                continue
+            key = text
+            if self.mode in ('normalized', 'near') and self.normalize is not None:
+                # Texts made only of punctuation normalize to nothing; keep them distinct
+                key = self.normalize(text) or text
+            digest = hashlib.blake2b(key.encode(), digest_size=16).digest()
+            position = self._positions.get(digest)
+            if position is not None:
+                self.exact_duplicates += 1
+                row_map.append(position)
+                continue
+            entry = None
+            if self._index is not None:
+                position, entry = self._index.match(key)
+            if position is not None:
+                self.near_duplicates += 1
+            else:
+                position = self.unique_count + len(new)
+                new.append(text)
+                if self._index is not None:
+                    self._index.add(position, entry)
+            self._positions[digest] = position
+            row_map.append(position)
+        self.unique_count += len(new)
+        self.seconds += time.perf_counter() - start
+        return row_map, new
+
+    def stats(self):
+        stats = {
+            "mode": self.mode,
+            "rows_with_text": self.rows_with_text,
+            "exact_duplicates": self.exact_duplicates,
+            "near_duplicates": self.near_duplicates,
+            "analyzed": self.unique_count,
+            "dedup_ratio": round(1 - self.unique_count / self.rows_with_text, 4) if self.rows_with_text else 0.0,
+            "dedup_seconds": round(self.seconds, 4)
+        }
+        if self.mode == 'near':
+            stats["similarity"] = self.threshold
+        return stats
+
+
+def deduplicate(texts, mode=DEFAULT_DEDUP_MODE, normalize=None, threshold=NEAR_DUPLICATE_THRESHOLD):
+    """Collapse duplicate texts so each is analyzed once.
+
+    normalize maps a text to the key used by the 'normalized' and 'near'
+    modes (the analyzers' own preprocessing). Returns (representative
+    texts in first-seen order, per-row index into them, stats); rows with
+    empty text map to None.
+    """
+    deduplicator = Deduplicator(mode, normalize, threshold)
+    row_map, unique = deduplicator.add(texts)
+    return unique, row_map, deduplicator.stats()
@@ -0,0 +1,331 @@
+import os
+import copy
+import json
+import time
+import pickle
+import threading
+
+from sklearn.feature_extraction.text import HashingVectorizer
+from sklearn.linear_model import SGDClassifier
+
+from utils import metrics
+from utils.checkpoint import write_durably
+from utils.registry import MODEL_DATA_DIR
+from utils.versions import fingerprint
+
+# Append-only log of corrected labels; a subdirectory, so appending does not count as a model change
+FEEDBACK_DIR = os.environ.get('FEEDBACK_DIR', os.path.join(MODEL_DATA_DIR, 'feedback'))
+# Seconds between training passes over newly logged feedback; 0 turns training off
+FEEDBACK_TRAIN_INTERVAL = float(os.environ.get('FEEDBACK_TRAIN_INTERVAL', 10))
+# Least seconds between publications of retrained models (each one is swapped into every worker)
+FEEDBACK_PUBLISH_INTERVAL = float(os.environ.get('FEEDBACK_PUBLISH_INTERVAL', 300))
+# Records per incremental update
+FEEDBACK_BATCH_SIZE = int(os.environ.get('FEEDBACK_BATCH_SIZE', 256))
+# Records accepted by one /feedback request
+FEEDBACK_MAX_RECORDS = int(os.environ.get('FEEDBACK_MAX_RECORDS', 1000))
+# Passes over the base training data before any feedback is applied
+FEEDBACK_SEED_EPOCHS = 5
+# Fixed feature space, so a word first seen in feedback needs no vocabulary refit
+HASHING_FEATURES = 2 ** 18
+
+# Published models; a subdirectory, so the registry swaps them in as a component instead of rebuilding everything
+ONLINE_MODEL_DIR = os.environ.get('ONLINE_MODEL_DIR', os.path.join(MODEL_DATA_DIR, 'online'))
+ONLINE_MODEL_FILE = 'online_models.pkl'
+
+# Labels feedback may carry per stage, as the stage's models name them
+FEEDBACK_LABELS = {
+    'sentiment': ('positive', 'negative', 'neutral'),
+    'emotion': ('happy', 'sad', 'angry', 'neutral')
+}
+
+
+def parse_feedback(data):
+    """Validate a /feedback body: one record or {"records": [...]}, each with text and a
+    corrected sentiment and/or emotion label. Returns the records; raises ValueError."""
+    if not isinstance(data, dict):
+        raise ValueError("Send a JSON object with text and sentiment and/or emotion, or a records list")
+    records = data['records'] if 'records' in data else [data]
+    if not isinstance(records, list) or not records:
+        raise ValueError("records must be a non-empty list")
+    if len(records) > FEEDBACK_MAX_RECORDS:
+        raise ValueError(f"At most {FEEDBACK_MAX_RECORDS} records per request")
+    parsed = []
+    for number, record in enumerate(records, 1):
+        if not isinstance(record, dict) or not isinstance(record.get('text'), str) or not record['text'].strip():
+            raise ValueError(f"Record {number}: text is required")
+        entry = {'text': record['text']}
+        for stage, labels in FEEDBACK_LABELS.items():
+            label = record.get(stage)
+            if isinstance(label, dict):
+                label = label.get('label')
+            if label is None:
+                continue
+            label = str(label).strip().lower()
+            if label not in labels:
+                raise ValueError(f"Record {number}: unknown {stage} label {label!r}. Valid labels: {', '.join(labels)}")
+            entry[stage] = label
+        if len(entry) == 1:
+            raise ValueError(f"Record {number}: give a corrected sentiment or emotion label")
+        parsed.append(entry)
+    return parsed
+
+
+def hashing_vectorizer():
+    return HashingVectorizer(n_features=HASHING_FEATURES, ngram_range=(1, 2), stop_words='english',
+                             alternate_sign=False, norm='l2')
+
+
+def seed_data(text_classifier, emotion_detector):
+    """Base training examples of each stage, preprocessed as at prediction time"""
+    examples = {'sentiment': getattr(text_classifier, 'sentiment_training_data', []),
+                'emotion': getattr(emotion_detector, 'emotion_training_data', [])}
+    seed = {}
+    for stage, labels in FEEDBACK_LABELS.items():
+        pairs = ((text_classifier._preprocess_text(str(text)), str(label).lower()) for text, label in examples[stage])
+        seed[stage] = [(text, label) for text, label in pairs if text and label in labels]
+    return seed
+
+
+class FeedbackLog:
+    """Feedback records appended as JSON lines to FEEDBACK_DIR/feedback.ndjson.
+
+    Each append is one write to a file opened for appending, so workers
+    can share the log. Readers resume from a byte offset and only take
+    complete lines.
+    """
+
+    def __init__(self, directory=FEEDBACK_DIR):
+        self.directory = directory
+        self.path = os.path.join(directory, 'feedback.ndjson')
+        self._lock = threading.Lock()
+
+    def append(self, records):
+        data = ''.join(json.dumps(record) + '\n' for record in records).encode()
+        os.makedirs(self.directory, exist_ok=True)
+        with self._lock, open(self.path, 'ab', buffering=0) as f:
+            f.write(data)
+
+    def read(self, offset, max_records):
+        """Up to max_records complete records from offset; returns (records, next offset)"""
+        records = []
+        try:
+            f = open(self.path, 'rb')
+        except FileNotFoundError:
+            return records, offset
+        with f:
+            f.seek(offset)
+            while len(records) < max_records:
+                line = f.readline()
+                if not line.endswith(b'\n'):
+                    # Nothing more, or a record still being written
+                    break
+                offset += len(line)
+                try:
+                    records.append(json.loads(line))
+                except ValueError:
+                    metrics.FEEDBACK_RECORDS.inc('unknown', 'malformed')
+        return records, offset
+
+
+class OnlineModels:
+    """Sentiment and emotion classifiers over hashed features, trained incrementally.
+
+    Each stage's SGD logistic regression first takes a few passes over
+    the base training data (the seed), then every feedback record in log
+    order, a mini-batch at a time. offset is the feedback log position
+    reached. Only stages that have had feedback replace the base
+    models when applied. Instances are pickled to publish them, with
+    sparse coefficients: only hashed features seen in training are
+    non-zero, a small part of the feature space.
+    """
+
+    def __init__(self, seed, epochs=FEEDBACK_SEED_EPOCHS):
+        self.seed_digest = fingerprint(seed)
+        self.offset = 0
+        self.records = {stage: 0 for stage in FEEDBACK_LABELS}
+        self.models = {stage: SGDClassifier(loss='log_loss', alpha=1e-4, random_state=42)
+                       for stage in FEEDBACK_LABELS}
+        vectorizer = hashing_vectorizer()
+        for stage, examples in seed.items():
+            if not examples:
+                continue
+            texts, labels = zip(*examples)
+            features = vectorizer.transform(texts)
+            for _ in range(epochs):
+                self.models[stage].partial_fit(features, labels, classes=FEEDBACK_LABELS[stage])
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['models'] = {stage: self._sparse(model) for stage, model in self.models.items()}
+        return state
+
+    @staticmethod
+    def _sparse(model):
+        if not hasattr(model, 'coef_'):
+            return model
+        model = copy.copy(model)
+        return model.sparsify()
+
+    def matches(self, seed):
+        """True if these models grew from this seed (the base training data has not changed)"""
+        return self.seed_digest == fingerprint(seed)
+
+    def update(self, records, preprocess):
+        """Apply one mini-batch of feedback records"""
+        vectorizer = hashing_vectorizer()
+        for stage, labels in FEEDBACK_LABELS.items():
+            examples = [(preprocess(record['text']), record[stage]) for record in records
+                        if record.get(stage) in labels and isinstance(record.get('text'), str)]
+            if not examples:
+                continue
+            texts, targets = zip(*examples)
+            if hasattr(self.models[stage], 'coef_'):
+                # Loaded models keep sparse coefficients, which partial_fit cannot update
+                self.models[stage].densify()
+            self.models[stage].partial_fit(vectorizer.transform(texts), targets, classes=labels)
+            self.records[stage] += len(examples)
+            metrics.FEEDBACK_RECORDS.inc(stage, 'applied', amount=len(examples))
+
+    def apply(self, text_classifier, emotion_detector):
+        """Serve the stages that have had feedback from these models"""
+        if self.records['sentiment']:
+            text_classifier.sentiment_vectorizer = hashing_vectorizer()
+            text_classifier.sentiment_model = self.models['sentiment']
+        if self.records['emotion']:
+            emotion_detector.emotion_vectorizer = hashing_vectorizer()
+            emotion_detector.emotion_model = self.models['emotion']
+
+
+def load_online_models(directory=ONLINE_MODEL_DIR):
+    """The published OnlineModels, or None if there are none (or they cannot be read)"""
+    path = os.path.join(directory, ONLINE_MODEL_FILE)
+    try:
+        with open(path, 'rb') as f:
+            return pickle.load(f)
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        print(f"Could not load {path}: {e}")
+        return None
+
+
+def _alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class FeedbackTrainer:
+    """Folds logged feedback into OnlineModels on a background thread and publishes them.
+
+    One process trains at a time: it holds a lease file with its pid in
+    the feedback directory, and another takes over once that process has
+    exited. A new trainer starts from the published models, or from the
+    seed (replaying the whole log) if the base training data changed.
+    Every interval it applies the records logged since, in mini-batches,
+    and at most once per publish_interval writes the models atomically
+    to model_dir, where every worker's model registry sees them and
+    swaps them in; on_publish runs after each write. Unpublished progress that
+    is lost with its process is redone from the published offset.
+    """
+
+    def __init__(self, log, models, on_publish=None, model_dir=ONLINE_MODEL_DIR, interval=FEEDBACK_TRAIN_INTERVAL,
+                 publish_interval=FEEDBACK_PUBLISH_INTERVAL, batch_size=FEEDBACK_BATCH_SIZE):
+        self.log = log
+        self.models = models
+        self.on_publish = on_publish
+        self.model_dir = model_dir
+        self.interval = interval
+        self.publish_interval = publish_interval
+        self.batch_size = batch_size
+        self._lease = os.path.join(log.directory, 'trainer.pid')
+        self._state = None
+        self._unpublished = 0
+        self._published_at = None
+        self._thread_pid = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        # Started lazily, once per process, so forked workers each run one
+        if self.interval <= 0 or self._thread_pid == os.getpid():
+            return
+        with self._lock:
+            if self._thread_pid == os.getpid():
+                return
+            self._thread_pid = os.getpid()
+        threading.Thread(target=self._run, name='feedback-trainer', daemon=True).start()
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            try:
+                self.step()
+            except Exception as e:
+                print(f"Feedback training failed: {e}")
+
+    def step(self):
+        """One training pass: take the lease, apply pending feedback and publish if due"""
+        if not self._hold_lease():
+            self._state = None
+            return
+        current = self.models()
+        if self._state is None:
+            seed = seed_data(current.text_classifier, current.emotion_detector)
+            state = load_online_models(self.model_dir)
+            if state is None or not state.matches(seed):
+                state = OnlineModels(seed)
+            self._state = state
+            self._unpublished = 0
+
+        while True:
+            records, offset = self.log.read(self._state.offset, self.batch_size)
+            if offset == self._state.offset:
+                break
+            self._state.update(records, current.text_classifier._preprocess_text)
+            self._state.offset = offset
+            self._unpublished += len(records)
+
+        due = self._published_at is None or time.monotonic() - self._published_at >= self.publish_interval
+        if self._unpublished and due:
+            self.publish()
+
+    def publish(self):
+        os.makedirs(self.model_dir, exist_ok=True)
+        write_durably(os.path.join(self.model_dir, ONLINE_MODEL_FILE), pickle.dumps(self._state))
+        self._published_at = time.monotonic()
+        self._unpublished = 0
+        metrics.FEEDBACK_PUBLICATIONS.inc()
+        print(f"Published online models at feedback offset {self._state.offset}")
+        if self.on_publish is not None:
+            self.on_publish()
+
+    def _hold_lease(self):
+        """True if this process is the trainer, taking the lease if it is free or its holder has exited"""
+        try:
+            with open(self._lease) as f:
+                owner = int(f.read() or 0)
+        except FileNotFoundError:
+            owner = None
+        except (OSError, ValueError):
+            owner = 0
+        if owner == os.getpid():
+            return True
+        if owner and _alive(owner):
+            return False
+        if owner is not None:
+            try:
+                os.remove(self._lease)
+            except FileNotFoundError:
+                pass
+        try:
+            os.makedirs(self.log.directory, exist_ok=True)
+            fd = os.open(self._lease, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        except FileExistsError:
+            return False
+        with os.fdopen(fd, 'w') as f:
+            f.write(str(os.getpid()))
+        return True
@@ -0,0 +1,154 @@
+import os
+import csv
+import io
+
+import pandas as pd
+
+from utils.compression import open_decompressed
+
+try:
+    import pyarrow as pa
+    import pyarrow.csv as pa_csv
+except ImportError:
+    # Optional: without pyarrow, CSVs are parsed with pandas' single-threaded C reader
+    pa = None
+    pa_csv = None
+
+
+COMPRESSED_SUFFIXES = ('.gz', '.gzip', '.zst', '.zstd')
+# Rows parsed per block when a CSV is read incrementally
+INGEST_BLOCK_ROWS = int(os.environ.get('INGEST_BLOCK_ROWS', 5000))
+
+
+def is_csv_filename(filename):
+    """True for .csv names, optionally with a .gz or .zst suffix; the content decides the codec"""
+    name = (filename or '').lower()
+    for suffix in COMPRESSED_SUFFIXES:
+        if name.endswith(suffix):
+            name = name[:-len(suffix)]
+            break
+    return name.endswith('.csv')
+
+
+class _PrefixedStream(io.RawIOBase):
+    """Replays bytes already read from a forward-only stream before the rest of it"""
+
+    def __init__(self, prefix, stream):
+        self._prefix = prefix
+        self._stream = stream
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        if self._prefix:
+            size = min(len(buffer), len(self._prefix))
+            buffer[:size] = self._prefix[:size]
+            self._prefix = self._prefix[size:]
+            return size
+        data = self._stream.read(len(buffer))
+        buffer[:len(data)] = data
+        return len(data)
+
+
+def find_text_column(columns):
+    """Return the column named 'text' (case insensitive) from column names, or None"""
+    for column in columns:
+        if str(column).lower() == 'text':
+            return column
+    return None
+
+
+def _header(stream):
+    """Read the CSV header row; returns (columns, stream positioned back at the start)"""
+    if stream.seekable():
+        position = stream.tell()
+        line = stream.readline()
+        stream.seek(position)
+    else:
+        # Decompressing readers only go forward, so replay the header line
+        line = stream.readline()
+        stream = io.BufferedReader(_PrefixedStream(line, stream), buffer_size=1 << 20)
+    if isinstance(line, bytes):
+        line = line.decode('utf-8-sig', errors='replace')
+    return next(csv.reader(io.StringIO(line)), []), stream
+
+
+def read_text_column(stream, max_rows=None):
+    """Parse only the text column of a CSV stream.
+
+    Gzip and zstd content is decompressed as the parser reads it. Uses
+    pyarrow's multi-threaded reader when it is installed, else pandas.
+    Returns (column name, list of str). Raises ValueError if the CSV has
+    no 'text' column or cannot be parsed.
+    """
+    columns, stream = _header(open_decompressed(stream))
+    column = find_text_column(columns)
+    if column is None:
+        raise ValueError(f"CSV must have a 'text' column. Found columns: {columns}")
+
+    try:
+        if pa_csv is not None:
+            table = pa_csv.read_csv(
+                stream,
+                read_options=pa_csv.ReadOptions(use_threads=True),
+                # Reviews often contain quoted line breaks
+                parse_options=pa_csv.ParseOptions(newlines_in_values=True),
+                convert_options=pa_csv.ConvertOptions(include_columns=[column],
+                                                      column_types={column: pa.string()}))
+            if max_rows is not None:
+                table = table.slice(0, max_rows)
+            texts = table.column(column).to_pylist()
+        else:
+            df = pd.read_csv(stream, usecols=[column], dtype=str, keep_default_na=False, nrows=max_rows)
+            texts = df[column].tolist()
+    except (ValueError, OSError, EOFError) as e:
+        # pandas' ParserError and pyarrow's ArrowInvalid are ValueErrors; corrupt gzip raises OSError or EOFError
+        raise ValueError(f"Failed to read CSV file: {str(e)}")
+    return column, ['' if text is None else text for text in texts]
+
+
+
+def open_text_column(stream, block_rows=INGEST_BLOCK_ROWS, key_column=None):
+    """Parse the text column of a CSV stream incrementally.
+
+    Returns (column name, iterator of lists of str), reading about
+    block_rows rows per list, so a file can be analyzed while it is
+    still being read (or received). With key_column, the iterator yields
+    (texts, keys) pairs with that column's values alongside. Raises
+    ValueError if the CSV has no 'text' column or no key_column; parse
+    errors surface as ValueError from the iterator.
+    """
+    columns, stream = _header(open_decompressed(stream))
+    column = find_text_column(columns)
+    if column is None:
+        raise ValueError(f"CSV must have a 'text' column. Found columns: {columns}")
+    if key_column is not None and key_column not in columns:
+        raise ValueError(f"CSV has no '{key_column}' column. Found columns: {columns}")
+    return column, _text_blocks(stream, column, block_rows, key_column)
+
+
+def _text_blocks(stream, column, block_rows, key_column=None):
+    names = [column] if key_column is None or key_column == column else [column, key_column]
+    try:
+        if pa_csv is not None:
+            # pyarrow sizes blocks in bytes; assume a few hundred bytes per review
+            reader = pa_csv.open_csv(
+                stream,
+                read_options=pa_csv.ReadOptions(use_threads=True, block_size=max(block_rows * 256, 1 << 20)),
+                parse_options=pa_csv.ParseOptions(newlines_in_values=True),
+                convert_options=pa_csv.ConvertOptions(include_columns=names,
+                                                      column_types={name: pa.string() for name in names}))
+            blocks = ([batch.column(name).to_pylist() for name in names] for batch in reader)
+        else:
+            blocks = ([df[name].tolist() for name in names]
+                      for df in pd.read_csv(stream, usecols=names, dtype=str, keep_default_na=False,
+                                            chunksize=block_rows))
+        for values in blocks:
+            texts = ['' if text is None else text for text in values[0]]
+            if key_column is None:
+                yield texts
+            else:
+                yield texts, ['' if key is None else key for key in values[-1]]
+    except (ValueError, OSError, EOFError) as e:
+        raise ValueError(f"Failed to read CSV file: {str(e)}")
@@ -0,0 +1,133 @@
+import os
+import re
+import json
+import time
+import uuid
+import shutil
+import tempfile
+import threading
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+
+# Job state lives on disk so every worker process can report on any job
+JOB_DIR = os.environ.get('JOB_DIR', os.path.join(tempfile.gettempdir(), 'text-analysis-jobs'))
+# Finished jobs and their results are removed after this many seconds
+JOB_TTL = float(os.environ.get('JOB_TTL', 24 * 3600))
+# Jobs run concurrently per process; the rest wait in order
+JOBS_MAX_RUNNING = int(os.environ.get('JOBS_MAX_RUNNING', 1))
+
+JOB_STATES = ('queued', 'running', 'done', 'failed')
+_JOB_ID = re.compile(r'^[0-9a-f]{32}$')
+
+
+class JobStore:
+    """Background jobs with their status and result files in JOB_DIR/<job id>/.
+
+    status.json is rewritten atomically on every update, so a job started
+    by one worker can be polled and downloaded through any other.
+    """
+
+    def __init__(self, root=JOB_DIR, ttl=JOB_TTL, max_running=JOBS_MAX_RUNNING):
+        self.root = root
+        self.ttl = ttl
+        self.max_running = max_running
+        self._executor = None
+        self._lock = threading.Lock()
+
+    @property
+    def executor(self):
+        # Created lazily so forked workers each start their own threads
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_running, thread_name_prefix='job')
+            return self._executor
+
+    def _directory(self, job_id):
+        if not isinstance(job_id, str) or not _JOB_ID.match(job_id):
+            raise KeyError(job_id)
+        return os.path.join(self.root, job_id)
+
+    def path(self, job_id, name):
+        """Path of a file belonging to the job"""
+        return os.path.join(self._directory(job_id), name)
+
+    def create(self, kind, **fields):
+        """Register a queued job and return its status"""
+        self.cleanup()
+        job_id = uuid.uuid4().hex
+        os.makedirs(self._directory(job_id))
+        status = {'id': job_id, 'kind': kind, 'status': 'queued', 'created': time.time(),
+                  'started': None, 'finished': None, 'error': None, 'owner': os.getpid()}
+        status.update(fields)
+        self._write(job_id, status)
+        return status
+
+    def get(self, job_id):
+        """Return the job's status, or None if it does not exist"""
+        try:
+            with open(self.path(job_id, 'status.json')) as f:
+                return json.load(f)
+        except (KeyError, OSError, ValueError):
+            return None
+
+    def update(self, job_id, **fields):
+        """Merge fields into the job's status and return it"""
+        with self._lock:
+            status = self.get(job_id)
+            if status is None:
+                raise KeyError(job_id)
+            status.update(fields)
+            self._write(job_id, status)
+        return status
+
+    def _write(self, job_id, status):
+        target = self.path(job_id, 'status.json')
+        temporary = f'{target}.{os.getpid()}.{threading.get_ident()}.tmp'
+        with open(temporary, 'w') as f:
+            json.dump(status, f)
+        os.replace(temporary, target)
+
+    def submit(self, job_id, fn, *args, **kwargs):
+        """Run fn(job_id, *args, **kwargs) in the background.
+
+        The job is marked running, then done with the fields fn returns
+        merged in, or failed with the exception message. fn sees the
+        caller's context variables, so a job keeps the model set of the
+        request that started it.
+        """
+        self.update(job_id, status='queued', owner=os.getpid(), error=None)
+
+        def run():
+            self.update(job_id, status='running', started=time.time())
+            try:
+                fields = fn(job_id, *args, **kwargs) or {}
+            except Exception as e:
+                print(f"Job {job_id} failed: {e}")
+                self.update(job_id, status='failed', finished=time.time(), error=str(e))
+                return
+            self.update(job_id, status='done', finished=time.time(), **fields)
+        return self.executor.submit(contextvars.copy_context().run, run)
+
+    def orphaned(self, status):
+        """True if a queued or running job's owning process has exited, e.g. a worker that died"""
+        if status['status'] not in ('queued', 'running'):
+            return False
+        try:
+            os.kill(status['owner'], 0)
+        except ProcessLookupError:
+            return True
+        except (PermissionError, KeyError, TypeError):
+            return False
+        return False
+
+    def cleanup(self):
+        """Delete jobs that finished (or were created) more than ttl seconds ago"""
+        if not os.path.isdir(self.root):
+            return
+        cutoff = time.time() - self.ttl
+        for job_id in os.listdir(self.root):
+            status = self.get(job_id)
+            if status is None or status['status'] in ('queued', 'running'):
+                continue
+            if (status['finished'] or status['created']) < cutoff:
+                shutil.rmtree(os.path.join(self.root, job_id), ignore_errors=True)
@@ -7,12 +7,17 @@ from nltk.corpus import stopwords
 from nltk.tokenize import word_tokenize
 from nltk.stem import WordNetLemmatizer
 import math
+from utils.metrics import record_cache_lookup
+
+# Upper bound on memoized lemmas before the cache is reset
+LEMMA_CACHE_SIZE = 50000
 
 class KeywordExtractor:
     def __init__(self):
         self.stop_words = set(stopwords.words('english'))
         self.lemmatizer = WordNetLemmatizer()
         self.tfidf_vectorizer = None
+        self._lemma_cache = {}
         
         # Initialize with some sample texts for TF-IDF
         self._initialize_tfidf()
@@ -40,6 +45,17 @@ class KeywordExtractor:
         
         self.tfidf_vectorizer.fit(sample_corpus)
     
+    def _lemmatize(self, token):
+        """Lemmatize a token, memoizing WordNet lookups"""
+        lemma = self._lemma_cache.get(token)
+        record_cache_lookup('lemma', lemma is not None)
+        if lemma is None:
+            if len(self._lemma_cache) >= LEMMA_CACHE_SIZE:
+                self._lemma_cache.clear()
+            lemma = self.lemmatizer.lemmatize(token)
+            self._lemma_cache[token] = lemma
+        return lemma
+    
     def _preprocess_text(self, text):
         """Preprocess text for keyword extraction"""
         # Convert to lowercase
@@ -58,7 +74,7 @@ class KeywordExtractor:
         filtered_tokens = []
         for token in tokens:
             if token not in self.stop_words and len(token) > 2:
-                lemmatized = self.lemmatizer.lemmatize(token)
+                lemmatized = self._lemmatize(token)
                 filtered_tokens.append(lemmatized)
         
         return ' '.join(filtered_tokens)
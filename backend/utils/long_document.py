@@ -0,0 +1,284 @@
+import os
+import time
+import threading
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+from utils.metrics import STAGE_DEADLINE_CUTS
+from utils.segmenter import RuleBasedSegmenter
+from utils.pipeline import STAGES
+
+# Documents longer than this many characters are scored in windows
+LONG_DOCUMENT_THRESHOLD = int(os.environ.get('LONG_DOCUMENT_THRESHOLD', 20000))
+# Target window size in characters; windows always end on a sentence boundary when possible
+LONG_DOCUMENT_WINDOW = int(os.environ.get('LONG_DOCUMENT_WINDOW', 4000))
+# At most this many windows are scored; longer documents are sampled evenly
+LONG_DOCUMENT_MAX_WINDOWS = int(os.environ.get('LONG_DOCUMENT_MAX_WINDOWS', 32))
+# Wall-clock budget per document in seconds; windows not finished by then are dropped
+# (if none has finished, the first one to finish is awaited)
+LONG_DOCUMENT_BUDGET = float(os.environ.get('LONG_DOCUMENT_BUDGET', 2.0))
+LONG_DOCUMENT_WORKERS = int(os.environ.get('LONG_DOCUMENT_WORKERS', 4))
+
+ASPECTS = ('acting', 'story', 'music', 'direction')
+
+
+def _weighted_label(entries):
+    """Pick the label with the largest summed weight; entries are (label, weight)"""
+    totals = Counter()
+    for label, weight in entries:
+        totals[label] += weight
+    if not totals:
+        return None, 0.0
+    label, weight = totals.most_common(1)[0]
+    total = sum(totals.values())
+    return label, (weight / total if total else 0.0)
+
+
+class LongDocumentAnalyzer:
+    """Scores very long texts in sentence-aligned windows.
+
+    Windows are analyzed concurrently on a shared thread pool, bounded by
+    a window count and a per-document time budget, and the per-window
+    results are merged back into the normal /classify response schema.
+    Windows still running when a document's budget runs out stop at
+    their next stage, so they do not hold the pool for other requests.
+    """
+
+    # Weight of the newest observation in the running estimate of splitting cost
+    COST_SMOOTHING = 0.2
+
+    def __init__(self, pipeline, threshold=LONG_DOCUMENT_THRESHOLD, window_chars=LONG_DOCUMENT_WINDOW,
+                 max_windows=LONG_DOCUMENT_MAX_WINDOWS, budget=LONG_DOCUMENT_BUDGET,
+                 workers=LONG_DOCUMENT_WORKERS):
+        self.pipeline = pipeline
+        self.threshold = threshold
+        self.window_chars = window_chars
+        self.max_windows = max_windows
+        self.budget = budget
+        self.segmenter = RuleBasedSegmenter()
+        self._workers = workers
+        self._executor = None
+        self._lock = threading.Lock()
+        # Smoothed seconds per character that split_windows has recently taken (0 until measured)
+        self.split_cost = 0.0
+
+    @property
+    def executor(self):
+        # Created lazily so forked workers each start their own threads
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self._workers,
+                                                    thread_name_prefix='long-document')
+            return self._executor
+
+    def with_pipeline(self, pipeline):
+        """An analyzer with these settings for another pipeline, sharing this one's thread pool"""
+        other = LongDocumentAnalyzer(pipeline, self.threshold, self.window_chars, self.max_windows,
+                                     self.budget, self._workers)
+        other._executor = self.executor
+        other.split_cost = self.split_cost
+        return other
+
+    def applies(self, text):
+        """Return True if text should go through windowed scoring"""
+        return self.threshold > 0 and len(text) > self.threshold
+
+    def split_windows(self, text):
+        """Split text into windows of about window_chars, ending on sentence boundaries.
+
+        Returns (windows, sentence_count).
+        """
+        windows = []
+        current = []
+        current_length = 0
+        sentences = self.segmenter.split(text)
+        for sentence in sentences:
+            # Hard-split run-on "sentences" longer than a window at whitespace
+            while len(sentence) > self.window_chars:
+                cut = sentence.rfind(' ', 0, self.window_chars)
+                cut = cut if cut > 0 else self.window_chars
+                if current:
+                    windows.append(' '.join(current))
+                    current, current_length = [], 0
+                windows.append(sentence[:cut])
+                sentence = sentence[cut:].strip()
+            if current and current_length + len(sentence) > self.window_chars:
+                windows.append(' '.join(current))
+                current, current_length = [], 0
+            if sentence:
+                current.append(sentence)
+                current_length += len(sentence) + 1
+        if current:
+            windows.append(' '.join(current))
+        return windows, len(sentences)
+
+    def _observe_split(self, text, seconds):
+        if text:
+            rate = seconds / len(text)
+            previous = self.split_cost
+            self.split_cost = rate if not previous else previous + self.COST_SMOOTHING * (rate - previous)
+
+    def _select_windows(self, windows):
+        """Evenly sample windows when there are more than max_windows"""
+        if len(windows) <= self.max_windows:
+            return list(range(len(windows)))
+        step = len(windows) / self.max_windows
+        return sorted({int(i * step) for i in range(self.max_windows)})
+
+    def run(self, text, stages=STAGES, max_keywords=10, fallbacks=None, mode='full', budget=None,
+            deadline=None):
+        """Analyze a long text; returns (results dict, long_document metadata).
+
+        A request deadline (absolute time.perf_counter() value) shortens the
+        budget and is passed on to every window, so stages that cannot
+        finish in time are missing from the merged results. If splitting
+        the document would already run past it, nothing is scored.
+        """
+        start = time.perf_counter()
+        budget = self.budget if budget is None else budget
+        if deadline is not None:
+            budget = min(budget, max(deadline - start, 0))
+            if start + self.split_cost * len(text) >= deadline:
+                for stage in stages:
+                    STAGE_DEADLINE_CUTS.inc(stage)
+                # Never re-measured while cut, so let the estimate drift down until it is tried again
+                self.split_cost *= 1 - self.COST_SMOOTHING
+                return {}, dict(self._metadata(text, [], [], [], budget, start), complete=False)
+        windows, sentence_count = self.split_windows(text)
+        self._observe_split(text, time.perf_counter() - start)
+        selected = self._select_windows(windows)
+
+        abandoned = threading.Event()
+        futures = {
+            self.executor.submit(self._score_window, windows[index], abandoned, stages,
+                                 max_keywords=max_keywords, fallbacks=fallbacks, mode=mode,
+                                 deadline=deadline): index
+            for index in selected
+        }
+        remaining = max(budget - (time.perf_counter() - start), 0)
+        done, not_done = wait(futures, timeout=remaining)
+        if not done:
+            # Never return empty-handed: overshoot the budget by at most one window
+            done, not_done = wait(futures, return_when=FIRST_COMPLETED)
+        # cancel() only stops windows that have not started; the running ones check this
+        abandoned.set()
+        for future in not_done:
+            future.cancel()
+
+        scored = []
+        for future in done:
+            try:
+                scored.append((futures[future], future.result()))
+            except Exception as e:
+                print(f"Long document window {futures[future]} failed: {e}")
+        scored.sort(key=lambda item: item[0])
+        if not scored:
+            raise RuntimeError("Every window of the long document failed")
+
+        weighted = [(len(windows[index]), result) for index, result in scored]
+        window_texts = [windows[index].lower() for index, _ in scored]
+        results = self._aggregate(text, weighted, window_texts, sentence_count, stages, max_keywords)
+        return results, self._metadata(text, windows, selected, scored, budget, start)
+
+    def _score_window(self, window, abandoned, stages, **options):
+        """Run the stages on one window, one at a time, until the document gives up on it"""
+        results = {}
+        for stage in stages:
+            if abandoned.is_set():
+                break
+            results.update(self.pipeline.run(window, (stage,), **options))
+        return results
+
+    def _metadata(self, text, windows, selected, scored, budget, start):
+        return {
+            'characters': len(text),
+            'windows_total': len(windows),
+            'windows_selected': len(selected),
+            'windows_scored': len(scored),
+            'budget_ms': round(budget * 1000, 1),
+            'elapsed_ms': round((time.perf_counter() - start) * 1000, 1),
+            'complete': len(scored) == len(windows)
+        }
+
+    def _aggregate(self, text, weighted, window_texts, sentence_count, stages, max_keywords):
+        results = {}
+        for stage in stages:
+            # Windows cut short by a deadline may lack some stages; merge only those that have it
+            present = [(item, window) for item, window in zip(weighted, window_texts) if stage in item[1]]
+            if not present:
+                continue
+            stage_weighted = [item for item, _ in present]
+            if stage in ('sentiment', 'emotion'):
+                results[stage] = self._merge_labelled(stage_weighted, stage)
+            elif stage == 'topics':
+                results[stage] = self._merge_topics(stage_weighted)
+            elif stage == 'aspects':
+                results[stage] = self._merge_aspects(stage_weighted, [window for _, window in present])
+            elif stage == 'keywords':
+                results[stage] = self._merge_keywords(stage_weighted, max_keywords)
+            elif stage == 'text_analysis':
+                results[stage] = self._merge_text_analysis(text, stage_weighted, sentence_count)
+        return results
+
+    def _merge_labelled(self, weighted, stage):
+        """Length- and confidence-weighted vote for sentiment or emotion"""
+        entries = [(result[stage]['label'], length * result[stage]['confidence'])
+                   for length, result in weighted]
+        label, share = _weighted_label(entries)
+        matching = [(length, result[stage]['confidence']) for length, result in weighted
+                    if result[stage]['label'] == label]
+        confidence = sum(l * c for l, c in matching) / sum(l for l, _ in matching)
+        merged = {'label': label, 'confidence': min(float(confidence), 1.0), 'agreement': round(share, 3)}
+
+        with_scores = [(length, result[stage]['scores']) for length, result in weighted
+                       if 'scores' in result[stage]]
+        if with_scores:
+            total = sum(length for length, _ in with_scores)
+            scores = defaultdict(float)
+            for length, window_scores in with_scores:
+                for key, value in window_scores.items():
+                    scores[key] += value * length / total
+            merged['scores'] = {key: round(value, 3) for key, value in scores.items()}
+        return merged
+
+    def _merge_topics(self, weighted):
+        counts = Counter()
+        for _, result in weighted:
+            counts.update(result['topics'])
+        topics = [topic for topic, _ in counts.most_common() if topic != 'Overall']
+        return topics or ['Overall']
+
+    def _merge_aspects(self, weighted, window_texts):
+        """Vote per aspect, preferring windows that actually mention the aspect"""
+        keywords = self.pipeline.aspect_analyzer.aspect_keywords
+        merged = {}
+        for aspect in ASPECTS:
+            mentioned = [(result['aspects'].get(aspect, 'Neutral'), length)
+                         for (length, result), window in zip(weighted, window_texts)
+                         if any(k in window for k in keywords.get(aspect, ()))]
+            entries = mentioned or [(result['aspects'].get(aspect, 'Neutral'), length)
+                                    for length, result in weighted]
+            merged[aspect] = _weighted_label(entries)[0] or 'Neutral'
+        return merged
+
+    def _merge_keywords(self, weighted, max_keywords):
+        """Rank keywords by reciprocal rank summed across windows"""
+        scores = Counter()
+        for _, result in weighted:
+            for rank, keyword in enumerate(result['keywords']):
+                scores[keyword] += 1.0 / (rank + 1)
+        return [keyword for keyword, _ in scores.most_common(max_keywords)]
+
+    def _merge_text_analysis(self, text, weighted, sentence_count):
+        analyses = [(length, result['text_analysis']) for length, result in weighted]
+        merged = {
+            'length': len(text),
+            'word_count': len(text.split()),
+            'sentence_count': sentence_count,
+            'sampled': len(analyses)
+        }
+        for key in ('tone', 'formality', 'sentiment_strength', 'complexity'):
+            entries = [(a[key], length) for length, a in analyses if key in a]
+            if entries:
+                merged[key] = _weighted_label(entries)[0]
+        return merged
@@ -0,0 +1,294 @@
+import time
+import threading
+import contextvars
+from bisect import bisect_left
+from contextlib import contextmanager
+
+# Latency buckets in seconds, from sub-millisecond regex stages up to slow batch requests
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1,
+                   0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def _format_labels(label_names, label_values, extra=None):
+    """Format a label set in Prometheus text exposition syntax"""
+    pairs = list(zip(label_names, label_values))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ''
+    escaped = []
+    for name, value in pairs:
+        value = str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+        escaped.append(f'{name}="{value}"')
+    return '{' + ','.join(escaped) + '}'
+
+
+def _format_value(value):
+    """Format a sample value the way Prometheus expects"""
+    if value == float('inf'):
+        return '+Inf'
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    """Base class for labelled metrics"""
+    metric_type = 'untyped'
+
+    def __init__(self, name, documentation, label_names=()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(label_names)
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def _key(self, labels):
+        if len(labels) != len(self.label_names):
+            raise ValueError(f"{self.name} expects labels {self.label_names}")
+        return tuple(str(label) for label in labels)
+
+    def render(self):
+        """Render this metric in Prometheus text format"""
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.metric_type}"
+        ]
+        with self._lock:
+            items = sorted(self._values.items())
+        for labels, value in items:
+            lines.extend(self._render_sample(labels, value))
+        return lines
+
+    def _render_sample(self, labels, value):
+        return [f"{self.name}{_format_labels(self.label_names, labels)} {_format_value(value)}"]
+
+
+class Counter(_Metric):
+    """Monotonically increasing counter"""
+    metric_type = 'counter'
+
+    def inc(self, *labels, amount=1):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def get(self, *labels):
+        with self._lock:
+            return self._values.get(self._key(labels), 0)
+
+
+class Gauge(_Metric):
+    """Value that can go up and down, e.g. requests in flight"""
+    metric_type = 'gauge'
+
+    def inc(self, *labels, amount=1):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, *labels, amount=1):
+        self.inc(*labels, amount=-amount)
+
+    def set(self, *labels, value=0):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def get(self, *labels):
+        with self._lock:
+            return self._values.get(self._key(labels), 0)
+
+
+class Histogram(_Metric):
+    """Bucketed distribution of observed values"""
+    metric_type = 'histogram'
+
+    def __init__(self, name, documentation, label_names=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, label_names)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, *labels, value):
+        key = self._key(labels)
+        # Buckets are stored non-cumulatively so an observation touches a single slot
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            state[0][index] += 1
+            state[1] += value
+            state[2] += 1
+
+    def snapshot(self, *labels):
+        """Return (count, sum) for a label set"""
+        with self._lock:
+            state = self._values.get(self._key(labels))
+            if state is None:
+                return 0, 0.0
+            return state[2], state[1]
+
+    def _render_sample(self, labels, state):
+        bucket_counts, total, count = state
+        lines = []
+        cumulative = 0
+        for bound, bucket_count in zip(self.buckets + (float('inf'),), bucket_counts):
+            cumulative += bucket_count
+            label_str = _format_labels(self.label_names, labels, ('le', _format_value(float(bound))))
+            lines.append(f"{self.name}_bucket{label_str} {cumulative}")
+        label_str = _format_labels(self.label_names, labels)
+        lines.append(f"{self.name}_sum{label_str} {_format_value(total)}")
+        lines.append(f"{self.name}_count{label_str} {count}")
+        return lines
+
+
+class MetricsRegistry:
+    """Collection of metrics rendered together on the /metrics endpoint"""
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _register(self, metric):
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                return existing
+            self._metrics[metric.name] = metric
+            return metric
+
+    def counter(self, name, documentation, label_names=()):
+        return self._register(Counter(name, documentation, label_names))
+
+    def gauge(self, name, documentation, label_names=()):
+        return self._register(Gauge(name, documentation, label_names))
+
+    def histogram(self, name, documentation, label_names=(), buckets=DEFAULT_BUCKETS):
+        return self._register(Histogram(name, documentation, label_names, buckets))
+
+    def get(self, name):
+        return self._metrics.get(name)
+
+    def render(self):
+        """Render every registered metric in Prometheus text format"""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+# Process-wide registry shared by the API and the analyzers
+registry = MetricsRegistry()
+
+STAGE_SECONDS = registry.histogram(
+    'analyzer_stage_seconds', 'Wall-clock time spent in an analyzer stage', ('stage',))
+STAGE_CPU_SECONDS = registry.histogram(
+    'analyzer_stage_cpu_seconds', 'CPU time spent in an analyzer stage', ('stage',))
+STAGE_ERRORS = registry.counter(
+    'analyzer_stage_errors_total', 'Analyzer stage calls that raised an exception', ('stage',))
+STAGE_DEADLINE_CUTS = registry.counter(
+    'analyzer_stage_deadline_cuts_total', 'Analyzer stages not started because the request deadline would be missed', ('stage',))
+REQUEST_SECONDS = registry.histogram(
+    'http_request_duration_seconds', 'Wall-clock time spent handling a request', ('endpoint',))
+REQUEST_CPU_SECONDS = registry.histogram(
+    'http_request_cpu_seconds', 'CPU time spent handling a request', ('endpoint',))
+REQUESTS_TOTAL = registry.counter(
+    'http_requests_total', 'Requests handled', ('endpoint', 'method', 'status'))
+REQUESTS_IN_FLIGHT = registry.gauge(
+    'http_requests_in_flight', 'Requests currently being handled', ('endpoint',))
+ROWS_TOTAL = registry.counter(
+    'batch_rows_total', 'Batch rows by outcome', ('endpoint', 'outcome'))
+CACHE_LOOKUPS = registry.counter(
+    'cache_lookups_total', 'Cache lookups by result', ('cache', 'result'))
+ADMISSION_ACTIVE = registry.gauge(
+    'admission_active_requests', 'Requests holding an admission slot', ('class',))
+ADMISSION_QUEUED = registry.gauge(
+    'admission_queued_requests', 'Requests waiting for an admission slot', ('class',))
+ADMISSION_REJECTED = registry.counter(
+    'admission_rejected_total', 'Requests turned away by admission control', ('class', 'reason'))
+SCHEDULER_QUEUE_DEPTH = registry.gauge(
+    'scheduler_queue_depth', 'Analyzer tasks waiting for a scheduler worker', ('class',))
+SCHEDULER_WAIT_SECONDS = registry.histogram(
+    'scheduler_wait_seconds', 'Time an analyzer task waited before a worker picked it up', ('class',))
+SCHEDULER_TASK_SECONDS = registry.histogram(
+    'scheduler_task_seconds', 'Time a scheduler worker spent running an analyzer task', ('class',))
+BATCH_RESULT_BYTES_PER_ROW = registry.gauge(
+    'batch_result_bytes_per_row', 'Memory held per analyzed distinct text by the latest batch', ('endpoint',))
+MODEL_GENERATION = registry.gauge(
+    'model_generation', 'Generation of the model set new requests are served by')
+MODEL_RELOADS = registry.counter(
+    'model_reloads_total', 'Model set loads by trigger and outcome', ('reason', 'outcome'))
+MODEL_RELOAD_SECONDS = registry.histogram(
+    'model_reload_seconds', 'Time spent building and warming a new model set in the background')
+FEEDBACK_RECORDS = registry.counter(
+    'feedback_records_total', 'Corrected labels by stage and outcome (received, applied, malformed)', ('stage', 'outcome'))
+FEEDBACK_PUBLICATIONS = registry.counter(
+    'feedback_publications_total', 'Incrementally retrained models published by the feedback trainer')
+
+
+@contextmanager
+def time_stage(stage, timings=None):
+    """Time an analyzer stage, recording wall and CPU time.
+
+    If a timings dict is given the wall time in milliseconds is also
+    accumulated under the stage name, for the Server-Timing header.
+    """
+    start_wall = time.perf_counter()
+    start_cpu = time.thread_time()
+    try:
+        yield
+    except Exception:
+        STAGE_ERRORS.inc(stage)
+        raise
+    finally:
+        wall = time.perf_counter() - start_wall
+        cpu = time.thread_time() - start_cpu
+        STAGE_SECONDS.observe(stage, value=wall)
+        STAGE_CPU_SECONDS.observe(stage, value=cpu)
+        if timings is not None:
+            timings[stage] = timings.get(stage, 0.0) + wall * 1000
+
+
+class CpuAccount:
+    """CPU seconds spent for one request on threads other than its own (scheduler workers)"""
+
+    def __init__(self):
+        self.seconds = 0.0
+        self._lock = threading.Lock()
+
+    def add(self, seconds):
+        with self._lock:
+            self.seconds += seconds
+
+
+# The account of the request being handled; copied with the context to the scheduler tasks it submits
+_cpu_account = contextvars.ContextVar('cpu_account', default=None)
+
+
+def open_cpu_account():
+    """Start a CPU account for the current request; returns it"""
+    account = CpuAccount()
+    _cpu_account.set(account)
+    return account
+
+
+def charge_cpu(seconds):
+    """Add CPU time spent on behalf of the current context to its request's account, if any"""
+    account = _cpu_account.get()
+    if account is not None:
+        account.add(seconds)
+
+
+def record_cache_lookup(cache, hit):
+    """Count a cache hit or miss"""
+    CACHE_LOOKUPS.inc(cache, 'hit' if hit else 'miss')
+
+
+def server_timing_header(timings, total_ms=None):
+    """Build a Server-Timing header value from stage timings in milliseconds"""
+    parts = [f"{stage};dur={duration:.2f}" for stage, duration in timings.items()]
+    if total_ms is not None:
+        parts.append(f"total;dur={total_ms:.2f}")
+    return ', '.join(parts)
@@ -0,0 +1,175 @@
+import time
+
+from utils.metrics import time_stage, STAGE_DEADLINE_CUTS
+from utils.versions import stage_versions
+
+# Analyzer stages in the order /classify runs them
+STAGES = ('sentiment', 'topics', 'aspects', 'emotion', 'text_analysis', 'keywords')
+
+# Evaluation modes: 'full' reproduces every field, 'fast' stops each cascade at the first decisive signal
+MODES = ('full', 'fast')
+
+# Response sub-fields callers may ask for directly, mapped to the stage producing them
+FIELD_ALIASES = {
+    'tone': 'text_analysis',
+    'formality': 'text_analysis',
+    'complexity': 'text_analysis',
+    'sentiment_strength': 'text_analysis',
+    'length': 'text_analysis',
+    'word_count': 'text_analysis',
+    'sentence_count': 'text_analysis',
+    'text': None
+}
+
+
+def parse_fields(value):
+    """Parse a fields/include value given as a list or a comma-separated string"""
+    if value is None:
+        return None
+    if isinstance(value, str):
+        value = value.split(',')
+    fields = [str(field).strip().lower() for field in value]
+    fields = [field for field in fields if field]
+    return fields or None
+
+
+def resolve_fields(fields):
+    """Resolve requested fields to the ordered tuple of stages that must run.
+
+    None or 'all' selects every stage. Stages only read the text, never
+    each other's output, so exactly the requested ones run. Raises
+    ValueError on unknown fields.
+    """
+    if not fields or 'all' in fields or '*' in fields:
+        return STAGES
+
+    requested = set()
+    unknown = []
+    for field in fields:
+        if field in STAGES:
+            requested.add(field)
+        elif field in FIELD_ALIASES:
+            if FIELD_ALIASES[field] is not None:
+                requested.add(FIELD_ALIASES[field])
+        else:
+            unknown.append(field)
+
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(unknown)}. Valid fields: {', '.join(STAGES)}")
+
+    return tuple(stage for stage in STAGES if stage in requested)
+
+
+def resolve_mode(value):
+    """Validate an evaluation mode, defaulting to 'full'"""
+    mode = str(value or 'full').strip().lower()
+    if mode not in MODES:
+        raise ValueError(f"Unknown mode: {mode}. Valid modes: {', '.join(MODES)}")
+    return mode
+
+
+def parse_deadline_ms(value):
+    """Parse a request deadline given in milliseconds; None when absent"""
+    if value is None or str(value).strip() == '':
+        return None
+    try:
+        deadline_ms = float(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"Invalid deadline: {value}. Expected milliseconds")
+    if deadline_ms <= 0:
+        raise ValueError("Deadline must be a positive number of milliseconds")
+    return deadline_ms
+
+
+def skipped_stages(stages):
+    """Return the stages not selected, in canonical order"""
+    return [stage for stage in STAGES if stage not in stages]
+
+
+class AnalysisPipeline:
+    """Runs a selected subset of analyzer stages over a text"""
+
+    # Weight of the newest observation in each stage's running cost estimate
+    COST_SMOOTHING = 0.2
+
+    def __init__(self, text_classifier, aspect_analyzer, emotion_detector,
+                 text_processor, keyword_extractor):
+        self.text_classifier = text_classifier
+        self.aspect_analyzer = aspect_analyzer
+        self.emotion_detector = emotion_detector
+        self.text_processor = text_processor
+        self.keyword_extractor = keyword_extractor
+        self.stage_costs = {}
+        self._warmed = set()
+        self._versions = None
+
+    def model_versions(self):
+        """Version tag of each stage's trained state (see utils.versions), computed once"""
+        if self._versions is None:
+            self._versions = stage_versions(self)
+        return self._versions
+
+    def expected_cost(self, stage):
+        """Smoothed wall-clock seconds a stage has recently taken (0 until measured)"""
+        return self.stage_costs.get(stage, 0.0)
+
+    def _observe_cost(self, stage, seconds):
+        if stage not in self._warmed:
+            # The first call loads lazy resources (WordNet, models) and is not representative
+            self._warmed.add(stage)
+            return
+        previous = self.stage_costs.get(stage)
+        if previous is None:
+            self.stage_costs[stage] = seconds
+        else:
+            self.stage_costs[stage] = previous + self.COST_SMOOTHING * (seconds - previous)
+
+    def _decay_cost(self, stage):
+        # A cut stage is never re-measured, so let its estimate drift down until it is tried again
+        if stage in self.stage_costs:
+            self.stage_costs[stage] *= 1 - self.COST_SMOOTHING
+
+    def _run_stage(self, stage, text, max_keywords, mode):
+        if stage == 'sentiment':
+            return self.text_classifier.predict_sentiment(text, mode=mode)
+        if stage == 'topics':
+            return self.text_classifier.predict_topics(text)
+        if stage == 'aspects':
+            return self.aspect_analyzer.analyze_aspects(text)
+        if stage == 'emotion':
+            return self.emotion_detector.detect_emotion(text, mode=mode)
+        if stage == 'text_analysis':
+            return self.text_processor.analyze_text(text)
+        if stage == 'keywords':
+            return self.keyword_extractor.extract_keywords(text, max_keywords=max_keywords)
+        raise ValueError(f"Unknown stage: {stage}")
+
+    def run(self, text, stages=STAGES, timings=None, max_keywords=10, fallbacks=None, mode='full',
+            deadline=None):
+        """Run the given stages and return a dict of stage name to result.
+
+        If fallbacks maps a stage to a value, errors in that stage are
+        swallowed and the fallback (or fallback(text) if callable) is used.
+
+        deadline is an absolute time.perf_counter() value. A stage whose
+        expected cost would run past it is not started and is left out of
+        the result; running stages are never interrupted.
+        """
+        results = {}
+        for stage in stages:
+            if deadline is not None and time.perf_counter() + self.expected_cost(stage) > deadline:
+                STAGE_DEADLINE_CUTS.inc(stage)
+                self._decay_cost(stage)
+                continue
+            start = time.perf_counter()
+            try:
+                with time_stage(stage, timings):
+                    results[stage] = self._run_stage(stage, text, max_keywords, mode)
+            except Exception:
+                if not fallbacks or stage not in fallbacks:
+                    raise
+                fallback = fallbacks[stage]
+                results[stage] = fallback(text) if callable(fallback) else fallback
+            finally:
+                self._observe_cost(stage, time.perf_counter() - start)
+        return results
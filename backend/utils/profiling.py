@@ -0,0 +1,164 @@
+import os
+import sys
+import hmac
+import time
+import pstats
+import cProfile
+import threading
+from collections import Counter
+
+# Profiling is opt-in: both variables must be set for any profiling surface to respond
+PROFILING_ENABLED = os.environ.get('PROFILING_ENABLED', '').lower() in ('1', 'true', 'yes')
+PROFILING_TOKEN = os.environ.get('PROFILING_TOKEN', '')
+
+# Hard limits so an admin cannot leave the sampler running (and slowing the worker) for too long
+MAX_PROFILE_SECONDS = 120
+MIN_SAMPLE_INTERVAL = 0.001
+
+# Innermost frames of threads that are blocked rather than working: lock, queue and socket
+# waits, idle pool workers, and polling loops asleep in time.sleep (a C call, so the loop's own
+# frame is innermost). Samples of these threads would mostly show waiting, so they are skipped.
+IDLE_FRAMES = frozenset({
+    'threading.py:wait', 'threading.py:wait_for', 'threading.py:_wait_for_tstate_lock',
+    'queue.py:get', 'selectors.py:select', 'socket.py:accept', 'thread.py:_worker',
+    'registry.py:_watch', 'feedback.py:_run'
+})
+
+# Modules whose functions are reported in per-request cProfile summaries
+ANALYZER_MODULES = (
+    'text_classifier.py', 'aspect_analyzer.py', 'emotion_detector.py',
+    'text_processor.py', 'keyword_extractor.py'
+)
+
+
+def profiling_enabled():
+    """Return True if profiling has been switched on and a token configured"""
+    return PROFILING_ENABLED and bool(PROFILING_TOKEN)
+
+
+def check_token(token):
+    """Compare a caller-supplied token with the configured one in constant time"""
+    if not profiling_enabled() or not token:
+        return False
+    return hmac.compare_digest(str(token), PROFILING_TOKEN)
+
+
+def _frame_label(frame):
+    code = frame.f_code
+    return f"{os.path.basename(code.co_filename)}:{code.co_name}"
+
+
+class SamplingProfiler:
+    """Wall-clock sampling profiler producing collapsed stacks.
+
+    A background thread walks every other thread's stack at a fixed
+    interval and counts identical stacks, skipping threads that are
+    idle (see IDLE_FRAMES). The output format is the
+    "collapsed" one consumed by flamegraph.pl and speedscope.
+    """
+
+    def __init__(self, interval=0.005):
+        self.interval = max(interval, MIN_SAMPLE_INTERVAL)
+        self.stacks = Counter()
+        self.samples = 0
+        self.requests_seen = 0
+        self._stop = threading.Event()
+
+    def note_request(self):
+        """Count a finished request for request-bounded sessions"""
+        self.requests_seen += 1
+
+    def _sample(self):
+        own_id = threading.get_ident()
+        for thread_id, frame in sys._current_frames().items():
+            if thread_id == own_id or _frame_label(frame) in IDLE_FRAMES:
+                continue
+            stack = []
+            while frame is not None:
+                stack.append(_frame_label(frame))
+                frame = frame.f_back
+            if stack:
+                self.stacks[';'.join(reversed(stack))] += 1
+        self.samples += 1
+
+    def run(self, seconds=None, max_requests=None):
+        """Sample until the time budget (default and at most MAX_PROFILE_SECONDS) or request count is reached"""
+        seconds = MAX_PROFILE_SECONDS if seconds is None else seconds
+        if not seconds > 0:
+            raise ValueError(f"seconds must be positive, got {seconds}")
+        seconds = min(seconds, MAX_PROFILE_SECONDS)
+        deadline = time.monotonic() + seconds
+        while not self._stop.is_set() and time.monotonic() < deadline:
+            if max_requests and self.requests_seen >= max_requests:
+                break
+            self._sample()
+            time.sleep(self.interval)
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+    def collapsed(self):
+        """Return aggregated stacks in collapsed-stack format"""
+        lines = [f"{stack} {count}" for stack, count in self.stacks.most_common()]
+        return '\n'.join(lines) + ('\n' if lines else '')
+
+
+class ProfilingSession:
+    """Tracks the single sampling session allowed per worker"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.active = None
+
+    def start(self, interval):
+        """Claim the session slot, returning a profiler or None if one is running"""
+        with self._lock:
+            if self.active is not None:
+                return None
+            self.active = SamplingProfiler(interval=interval)
+            return self.active
+
+    def finish(self):
+        with self._lock:
+            self.active = None
+
+    def note_request(self):
+        profiler = self.active
+        if profiler is not None:
+            profiler.note_request()
+
+
+session = ProfilingSession()
+
+
+def profile_call(func, *args, limit=30, **kwargs):
+    """Run func under cProfile and return (result, summary dict)"""
+    profiler = cProfile.Profile()
+    start = time.perf_counter()
+    result = profiler.runcall(func, *args, **kwargs)
+    elapsed = time.perf_counter() - start
+
+    stats = pstats.Stats(profiler)
+    entries = []
+    analyzer_totals = Counter()
+    for (filename, line, name), (_, ncalls, tottime, cumtime, _) in stats.stats.items():
+        basename = os.path.basename(filename)
+        entry = {
+            'function': f"{basename}:{line}({name})",
+            'calls': ncalls,
+            'tottime_ms': round(tottime * 1000, 3),
+            'cumtime_ms': round(cumtime * 1000, 3)
+        }
+        entries.append(entry)
+        if basename in ANALYZER_MODULES:
+            analyzer_totals[basename] += tottime * 1000
+
+    entries.sort(key=lambda e: e['cumtime_ms'], reverse=True)
+    summary = {
+        'total_ms': round(elapsed * 1000, 3),
+        'total_calls': stats.total_calls,
+        'analyzer_self_time_ms': {k: round(v, 3) for k, v in analyzer_totals.most_common()},
+        'top_functions': entries[:limit]
+    }
+    return result, summary
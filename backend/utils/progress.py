@@ -0,0 +1,113 @@
+import os
+import json
+import time
+from collections import Counter
+
+# Minimum seconds between progress snapshots written by a job
+JOB_PROGRESS_INTERVAL = float(os.environ.get('JOB_PROGRESS_INTERVAL', 0.5))
+# How often an event stream checks its job for new progress
+PROGRESS_EVENT_INTERVAL = float(os.environ.get('PROGRESS_EVENT_INTERVAL', 1.0))
+# An idle event stream sends a comment this often so proxies keep it open
+PROGRESS_HEARTBEAT = float(os.environ.get('PROGRESS_HEARTBEAT', 15))
+
+# Weight of the newest interval in the smoothed rows/s estimate
+RATE_SMOOTHING = 0.3
+
+
+class JobProgress:
+    """Running counters of a batch job: rows written, rows that failed analysis and
+    the sentiment distribution so far.
+
+    record() and error() are called per row and only bump counters;
+    rates, ETA and the distribution are computed in snapshot(), which
+    the job calls at most every interval seconds (when due() is true),
+    so reporting costs nothing measurable per row.
+    """
+
+    def __init__(self, rows_expected=None, interval=JOB_PROGRESS_INTERVAL):
+        self.rows_expected = rows_expected
+        self.interval = interval
+        self.rows_done = 0
+        self.errors = 0
+        self.sentiment = Counter()
+        self.rate = None
+        self.started = time.monotonic()
+        self._last_due = 0.0
+        self._last_rows = 0
+        self._last_time = self.started
+
+    def record(self, result):
+        self.rows_done += 1
+        sentiment = result.get('sentiment')
+        if sentiment is not None:
+            self.sentiment[sentiment['label']] += 1
+
+    def error(self):
+        self.errors += 1
+
+    def due(self):
+        """True at most once per interval"""
+        now = time.monotonic()
+        if now - self._last_due < self.interval:
+            return False
+        self._last_due = now
+        return True
+
+    def snapshot(self):
+        now = time.monotonic()
+        rows = self.rows_done + self.errors
+        if now > self._last_time:
+            rate = (rows - self._last_rows) / (now - self._last_time)
+            self.rate = rate if self.rate is None else RATE_SMOOTHING * rate + (1 - RATE_SMOOTHING) * self.rate
+            self._last_rows, self._last_time = rows, now
+        eta = None
+        if self.rows_expected is not None and self.rate:
+            eta = round(max(0, self.rows_expected - rows) / self.rate, 1)
+        return {
+            'rows_done': self.rows_done,
+            'rows_expected': self.rows_expected,
+            'errors': self.errors,
+            'rows_per_second': round(self.rate or 0.0, 1),
+            'eta_seconds': eta,
+            'elapsed_seconds': round(now - self.started, 1),
+            'sentiment_distribution': dict(self.sentiment)
+        }
+
+
+class JobEventStream:
+    """Turns successive reads of a job's status into server-sent events.
+
+    A 'progress' event is sent whenever the status changed since the
+    last read, then a final 'done' or 'failed' event ends the stream. A
+    job that disappears ends it with a 'not_found' event (not 'error',
+    which EventSource reserves for connection failures).
+    """
+
+    preamble = 'retry: 3000\n\n'
+
+    def __init__(self, heartbeat=PROGRESS_HEARTBEAT):
+        self.heartbeat = heartbeat
+        self.finished = False
+        self._last = None
+        self._last_sent = time.monotonic()
+
+    @staticmethod
+    def _event(name, data):
+        return f'event: {name}\ndata: {json.dumps(data)}\n\n'
+
+    def next(self, status):
+        """Event text to send for the latest status, or '' if there is nothing new"""
+        if status is None:
+            self.finished = True
+            return self._event('not_found', {'error': 'Job not found'})
+        if status['status'] in ('done', 'failed'):
+            self.finished = True
+            return self._event(status['status'], status)
+        if status != self._last:
+            self._last = status
+            self._last_sent = time.monotonic()
+            return self._event('progress', status)
+        if time.monotonic() - self._last_sent >= self.heartbeat:
+            self._last_sent = time.monotonic()
+            return ': keep-alive\n\n'
+        return ''
@@ -0,0 +1,265 @@
+import os
+import hmac
+import time
+import threading
+import contextvars
+from contextlib import contextmanager
+from concurrent.futures import Future
+
+from utils import metrics
+from utils.versions import fingerprint
+
+# Model artifacts (training data, published model files); a change to any file here loads a new generation
+MODEL_DATA_DIR = os.environ.get('MODEL_DATA_DIR',
+                                os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data'))
+# Seconds between checks of MODEL_DATA_DIR in each worker; 0 turns the watcher off
+MODEL_WATCH_INTERVAL = float(os.environ.get('MODEL_WATCH_INTERVAL', 30))
+# Token for POST /admin/models/reload; the endpoint is off while it is unset
+MODEL_RELOAD_TOKEN = os.environ.get('MODEL_RELOAD_TOKEN', '')
+# Touched by the reload endpoint so every worker process reloads, not only the one that served it
+RELOAD_TRIGGER = '.reload'
+
+
+def _file_signature(path):
+    """Modification time and size of a file, or None if it does not exist"""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+def check_reload_token(token):
+    """Compare a caller-supplied token with MODEL_RELOAD_TOKEN in constant time"""
+    if not MODEL_RELOAD_TOKEN or not token:
+        return False
+    return hmac.compare_digest(str(token), MODEL_RELOAD_TOKEN)
+
+
+class ModelSet:
+    """One generation of trained analyzers and the pipeline over them.
+
+    A set is never changed once published: a reload builds and warms a
+    whole new set and swaps the registry's reference to it, so work that
+    started on a set finishes on it.
+    """
+
+    def __init__(self, generation, vader_engine, pipeline, long_document_analyzer):
+        self.generation = generation
+        self.vader_engine = vader_engine
+        self.pipeline = pipeline
+        self.long_document_analyzer = long_document_analyzer
+        self.text_classifier = pipeline.text_classifier
+        self.aspect_analyzer = pipeline.aspect_analyzer
+        self.emotion_detector = pipeline.emotion_detector
+        self.text_processor = pipeline.text_processor
+        self.keyword_extractor = pipeline.keyword_extractor
+        self.loaded_at = time.time()
+        # Content digest of every stage's version, the same in every process that loaded the same models
+        self.version = fingerprint(pipeline.model_versions())
+
+    def to_dict(self):
+        return {'version': self.version, 'generation': self.generation, 'loaded_at': self.loaded_at,
+                'stages': self.pipeline.model_versions()}
+
+
+class ModelRegistry:
+    """Holds the active ModelSet and replaces it without stopping traffic.
+
+    build(generation, previous) returns a new ModelSet and warm() runs
+    with that set pinned, both on a background thread; only then is the
+    current reference swapped, a single assignment. A failed build keeps
+    the current set. Requests, jobs and scheduler tasks pin the set that
+    was current when they started (a context variable, copied to the
+    threads that run their work), so a swap never changes the models
+    under a request in flight. Each worker also polls watch_dir and
+    reloads when its files change. If nothing has loaded a set by the
+    first request, that request builds and warms one inline.
+
+    components maps a name to (path, derive) for an artifact kept out of
+    watch_dir's top level, such as the feedback-trained heads. When its
+    file changes, derive(current, generation) returns a new set that
+    reuses everything in the current one but that component (or None if
+    nothing changes), which is warmed and swapped in the same way without
+    a full build. build must read the components too. Only one build or
+    derive runs at a time, each from the set current when it starts.
+    """
+
+    def __init__(self, build, warm=None, watch_dir=MODEL_DATA_DIR, interval=MODEL_WATCH_INTERVAL, components=None):
+        self._build = build
+        self._warm = warm
+        self.watch_dir = watch_dir
+        self.interval = interval
+        self.components = dict(components or {})
+        self.current = None
+        self._pinned = contextvars.ContextVar('models', default=None)
+        self._lock = threading.Lock()
+        self._load_lock = threading.Lock()
+        self._build_lock = threading.Lock()
+        self._running = {}
+        self._seen = None
+        self._components_seen = {}
+        self._watcher_pid = None
+
+    def load(self, warm=True):
+        """Build, (optionally) warm and publish the first generation inline, unless one is loaded"""
+        with self._load_lock:
+            if self.current is not None:
+                return
+            self._seen = self._signature()
+            self._components_seen = self._component_signatures()
+            self._publish(self._load(warm), 'startup')
+
+    def active(self):
+        """The set pinned by the surrounding request or job, else the current one"""
+        return self._pinned.get() or self.current
+
+    def pin(self):
+        """Pin the current set for the rest of this request; returns it"""
+        if self.current is None:
+            # Served without create_app() (flask run, gunicorn app:app): load on first use
+            self.load()
+        self._start_watcher()
+        models = self.current
+        self._pinned.set(models)
+        return models
+
+    def unpin(self):
+        self._pinned.set(None)
+
+    @contextmanager
+    def pinned(self, models):
+        token = self._pinned.set(models)
+        try:
+            yield models
+        finally:
+            self._pinned.reset(token)
+
+    def reload(self, reason='admin'):
+        """Load a new generation in the background; returns a Future of the new set.
+
+        Only one reload runs at a time; asking again while one runs
+        returns that reload's Future.
+        """
+        return self._in_background('reload', self._run_reload, reason)
+
+    def refresh(self, component):
+        """Swap in a changed component in the background, keeping the rest of the current
+        set; returns a Future of the new set (the current one if nothing changed)"""
+        return self._in_background(component, self._run_refresh, component)
+
+    def _in_background(self, key, target, argument):
+        with self._lock:
+            running = self._running.get(key)
+            if running is not None and not running.done():
+                return running
+            future = self._running[key] = Future()
+        threading.Thread(target=target, args=(future, argument), name=f'model-{key}', daemon=True).start()
+        return future
+
+    def trigger(self):
+        """Touch the trigger file so every process watching watch_dir reloads"""
+        os.makedirs(self.watch_dir, exist_ok=True)
+        path = os.path.join(self.watch_dir, RELOAD_TRIGGER)
+        with open(path, 'a'):
+            pass
+        os.utime(path)
+
+    def _load(self, warm=True):
+        previous = self.current
+        generation = previous.generation + 1 if previous is not None else 1
+        models = self._build(generation, previous)
+        if warm and self._warm is not None:
+            with self.pinned(models):
+                self._warm()
+        return models
+
+    def _publish(self, models, reason):
+        self.current = models
+        metrics.MODEL_GENERATION.set(value=models.generation)
+        metrics.MODEL_RELOADS.inc(reason, 'loaded')
+
+    def _run_reload(self, future, reason):
+        with self._build_lock:
+            # Taken before building so files changed during the build cause another reload
+            signature = self._signature()
+            components = self._component_signatures()
+            start = time.perf_counter()
+            try:
+                models = self._load()
+            except Exception as e:
+                print(f"Model reload ({reason}) failed, keeping version {self.current.version}: {e}")
+                metrics.MODEL_RELOADS.inc(reason, 'failed')
+                self._seen = signature
+                future.set_exception(e)
+                return
+            metrics.MODEL_RELOAD_SECONDS.observe(value=time.perf_counter() - start)
+            self._seen = signature
+            self._components_seen = components
+            self._publish(models, reason)
+        print(f"Model generation {models.generation} ({models.version}) active after {reason} reload")
+        future.set_result(models)
+
+    def _run_refresh(self, future, name):
+        path, derive = self.components[name]
+        with self._build_lock:
+            signature = _file_signature(path)
+            start = time.perf_counter()
+            try:
+                previous = self.current
+                models = derive(previous, previous.generation + 1)
+                if models is not None and self._warm is not None:
+                    with self.pinned(models):
+                        self._warm()
+            except Exception as e:
+                print(f"Model {name} refresh failed, keeping version {self.current.version}: {e}")
+                metrics.MODEL_RELOADS.inc(name, 'failed')
+                self._components_seen[name] = signature
+                future.set_exception(e)
+                return
+            self._components_seen[name] = signature
+            if models is None:
+                future.set_result(previous)
+                return
+            metrics.MODEL_RELOAD_SECONDS.observe(value=time.perf_counter() - start)
+            self._publish(models, name)
+        print(f"Model generation {models.generation} ({models.version}) active after {name} refresh")
+        future.set_result(models)
+
+    def _component_signatures(self):
+        return {name: _file_signature(path) for name, (path, _) in self.components.items()}
+
+    def _signature(self):
+        """Name, modification time and size of every file in watch_dir; files still being written
+        (*.tmp) are left out"""
+        try:
+            entries = list(os.scandir(self.watch_dir))
+        except OSError:
+            return ()
+        files = []
+        for entry in entries:
+            if entry.name.endswith('.tmp') or not entry.is_file():
+                continue
+            stat = entry.stat()
+            files.append((entry.name, stat.st_mtime_ns, stat.st_size))
+        return tuple(sorted(files))
+
+    def _start_watcher(self):
+        # Started lazily, once per process, so forked workers each watch
+        if self.interval <= 0 or self._watcher_pid == os.getpid():
+            return
+        with self._lock:
+            if self._watcher_pid == os.getpid():
+                return
+            self._watcher_pid = os.getpid()
+        threading.Thread(target=self._watch, name='model-watcher', daemon=True).start()
+
+    def _watch(self):
+        while True:
+            time.sleep(self.interval)
+            if self._signature() != self._seen:
+                # Wait for it, so a slow build is not asked for again
+                self.reload('watch').exception()
+            for name, (path, _) in self.components.items():
+                if _file_signature(path) != self._components_seen.get(name):
+                    self.refresh(name).exception()
@@ -0,0 +1,405 @@
+import io
+import csv
+import json
+
+import numpy as np
+import pandas as pd
+
+from utils.compression import open_decompressed
+from utils.versions import format_versions, parse_versions
+
+try:
+    import pyarrow as pa
+    import pyarrow.ipc as pa_ipc
+    import pyarrow.parquet as pq
+except ImportError:
+    # Optional: only the Parquet and Arrow IPC outputs need pyarrow
+    pa = None
+    pa_ipc = None
+    pq = None
+
+ASPECTS = ('acting', 'story', 'music', 'direction')
+
+# Output format name -> (mimetype, file extension)
+OUTPUT_FORMATS = {
+    'csv': ('text/csv', 'csv'),
+    'ndjson': ('application/x-ndjson', 'ndjson'),
+    'parquet': ('application/vnd.apache.parquet', 'parquet'),
+    'arrow': ('application/vnd.apache.arrow.file', 'arrow')
+}
+COLUMNAR_FORMATS = ('parquet', 'arrow')
+
+# Rows buffered per Parquet row group / Arrow record batch
+COLUMNAR_BATCH_ROWS = 10000
+# Rows per block when a result file is read back
+RESULT_READ_ROWS = 5000
+
+BATCH_CSV_HEADER = [
+    'ID', 'Text', 'Sentiment', 'Sentiment_Confidence', 'Topics',
+    'Acting_Sentiment', 'Story_Sentiment', 'Music_Sentiment', 'Direction_Sentiment',
+    'Emotion', 'Emotion_Confidence', 'Text_Length', 'Tone', 'Keywords'
+]
+
+
+def resolve_format(value):
+    """Validate an output format name, defaulting to 'csv'"""
+    name = str(value or 'csv').strip().lower()
+    if name not in OUTPUT_FORMATS:
+        raise ValueError(f"Unknown format: {name}. Valid formats: {', '.join(OUTPUT_FORMATS)}")
+    if name in COLUMNAR_FORMATS and pa is None:
+        raise ValueError(f"The {name} format requires pyarrow, which is not installed")
+    return name
+
+
+def batch_csv_row(result, include_text=True):
+    """Flatten a batch result into a CSV row; skipped stages become empty cells"""
+    sentiment = result.get('sentiment')
+    topics = result.get('topics')
+    aspects = result.get('aspects')
+    emotion = result.get('emotion')
+    text_analysis = result.get('text_analysis')
+    keywords = result.get('keywords')
+    row = [
+        result['id'],
+        result['text'],
+        sentiment['label'] if sentiment is not None else '',
+        sentiment['confidence'] if sentiment is not None else '',
+        ', '.join(topics) if topics is not None else '',
+        aspects.get('acting', 'Neutral') if aspects is not None else '',
+        aspects.get('story', 'Neutral') if aspects is not None else '',
+        aspects.get('music', 'Neutral') if aspects is not None else '',
+        aspects.get('direction', 'Neutral') if aspects is not None else '',
+        emotion['label'] if emotion is not None else '',
+        emotion['confidence'] if emotion is not None else '',
+        text_analysis['length'] if text_analysis is not None else '',
+        text_analysis['tone'] if text_analysis is not None else '',
+        ', '.join(keywords) if keywords is not None else ''
+    ]
+    if not include_text:
+        del row[1]
+    return row
+
+
+class ResultWriter:
+    """Encodes batch result rows into one output format.
+
+    write() and close() return the bytes produced so far, so callers can
+    stream them to a response or append them to a file.
+    """
+
+    def __init__(self, stages, include_text=True):
+        self.stages = stages
+        self.include_text = include_text
+
+    def write(self, results):
+        raise NotImplementedError
+
+    def close(self):
+        return b''
+
+
+class CsvResultWriter(ResultWriter):
+    def __init__(self, stages, include_text=True):
+        super().__init__(stages, include_text)
+        self._buffer = io.StringIO()
+        self._writer = csv.writer(self._buffer)
+        header = list(BATCH_CSV_HEADER)
+        if not include_text:
+            header.remove('Text')
+        self._writer.writerow(header)
+
+    def write(self, results):
+        for result in results:
+            self._writer.writerow(batch_csv_row(result, self.include_text))
+        return self._drain()
+
+    def close(self):
+        return self._drain()
+
+    def _drain(self):
+        data = self._buffer.getvalue().encode()
+        self._buffer.seek(0)
+        self._buffer.truncate()
+        return data
+
+
+def json_default(value):
+    """json.dumps default for the NumPy scalars analyzers can return"""
+    if isinstance(value, np.generic):
+        return value.item()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+class NdjsonResultWriter(ResultWriter):
+    """One JSON object per row with the same nested stage results as /classify"""
+
+    def write(self, results):
+        lines = []
+        for result in results:
+            row = {'id': result['id']}
+            if self.include_text:
+                row['text'] = result['text']
+            for stage in self.stages:
+                row[stage] = result.get(stage)
+            row['model_versions'] = result.get('model_versions') or {}
+            lines.append(json.dumps(row, default=json_default))
+        return ''.join(line + '\n' for line in lines).encode()
+
+
+class _Drain:
+    """Write-only file object that hands back whatever was written since the last drain"""
+
+    def __init__(self):
+        self._parts = []
+        self._position = 0
+        self.closed = False
+
+    def write(self, data):
+        data = bytes(data)
+        self._parts.append(data)
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def flush(self):
+        pass
+
+    def writable(self):
+        return True
+
+    def close(self):
+        self.closed = True
+
+    def drain(self):
+        data = b''.join(self._parts)
+        self._parts = []
+        return data
+
+
+class _DictionaryColumn:
+    """Append-only string dictionary so every batch's dictionary extends the last one.
+
+    Arrow IPC files reject dictionary replacement but accept deltas.
+    """
+
+    def __init__(self):
+        self.values = []
+        self._index = {}
+
+    def encode(self, labels):
+        indices = []
+        for label in labels:
+            if label is None:
+                indices.append(None)
+                continue
+            index = self._index.get(label)
+            if index is None:
+                index = self._index[label] = len(self.values)
+                self.values.append(label)
+            indices.append(index)
+        return pa.DictionaryArray.from_arrays(pa.array(indices, pa.int32()), pa.array(self.values, pa.string()))
+
+
+def _field(result, stage, key):
+    value = result.get(stage)
+    return value.get(key) if value is not None else None
+
+
+def _columns(stages, include_text):
+    """(name, kind, extractor) for each output column; kind is 'int', 'float', 'string', 'label' or 'list'"""
+    columns = [('id', 'int', lambda r: r['id'])]
+    if include_text:
+        columns.append(('text', 'string', lambda r: r['text']))
+    if 'sentiment' in stages:
+        columns.append(('sentiment', 'label', lambda r: _field(r, 'sentiment', 'label')))
+        columns.append(('sentiment_confidence', 'float', lambda r: _field(r, 'sentiment', 'confidence')))
+    if 'topics' in stages:
+        columns.append(('topics', 'list', lambda r: r.get('topics')))
+    if 'aspects' in stages:
+        for aspect in ASPECTS:
+            columns.append((f'{aspect}_sentiment', 'label',
+                            lambda r, aspect=aspect: _field(r, 'aspects', aspect)))
+    if 'emotion' in stages:
+        columns.append(('emotion', 'label', lambda r: _field(r, 'emotion', 'label')))
+        columns.append(('emotion_confidence', 'float', lambda r: _field(r, 'emotion', 'confidence')))
+    if 'text_analysis' in stages:
+        columns.append(('text_length', 'int', lambda r: _field(r, 'text_analysis', 'length')))
+        columns.append(('tone', 'label', lambda r: _field(r, 'text_analysis', 'tone')))
+    if 'keywords' in stages:
+        columns.append(('keywords', 'list', lambda r: r.get('keywords')))
+    columns.append(('model_versions', 'label', lambda r: format_versions(r.get('model_versions') or {})))
+    return columns
+
+
+class ColumnarResultWriter(ResultWriter):
+    """Typed Parquet or Arrow IPC output: list columns for topics and keywords,
+    dictionary-encoded labels, and one column per aspect"""
+
+    def __init__(self, stages, include_text=True, output_format='parquet', batch_rows=COLUMNAR_BATCH_ROWS):
+        super().__init__(stages, include_text)
+        self.output_format = output_format
+        self.batch_rows = batch_rows
+        self._columns = _columns(stages, include_text)
+        types = {'int': pa.int64(), 'float': pa.float64(), 'string': pa.string(),
+                 'label': pa.dictionary(pa.int32(), pa.string()), 'list': pa.list_(pa.string())}
+        self.schema = pa.schema([(name, types[kind]) for name, kind, _ in self._columns])
+        self._dictionaries = {name: _DictionaryColumn() for name, kind, _ in self._columns if kind == 'label'}
+        # Rows are converted to Arrow on every write and buffered as small batches until batch_rows
+        self._pending = []
+        self._pending_rows = 0
+        self._sink = _Drain()
+        stream = pa.PythonFile(self._sink, mode='w')
+        if output_format == 'parquet':
+            self._writer = pq.ParquetWriter(stream, self.schema)
+        else:
+            self._writer = pa_ipc.new_file(stream, self.schema,
+                                           options=pa_ipc.IpcWriteOptions(emit_dictionary_deltas=True))
+
+    def _batch(self, results):
+        arrays = []
+        for name, kind, extract in self._columns:
+            values = [extract(result) for result in results]
+            if kind == 'label':
+                arrays.append(self._dictionaries[name].encode(values))
+            else:
+                arrays.append(pa.array(values, self.schema.field(name).type))
+        return pa.record_batch(arrays, schema=self.schema)
+
+    def _flush(self):
+        if self._pending:
+            # The dictionaries only grow, so combining keeps every label's code
+            table = pa.Table.from_batches(self._pending, schema=self.schema).combine_chunks()
+            self._pending = []
+            self._pending_rows = 0
+            self._writer.write_table(table)
+        return self._sink.drain()
+
+    def write(self, results):
+        if results:
+            self._pending.append(self._batch(results))
+            self._pending_rows += len(results)
+        if self._pending_rows >= self.batch_rows:
+            return self._flush()
+        return b''
+
+    def close(self):
+        data = self._flush()
+        self._writer.close()
+        return data + self._sink.drain()
+
+
+def result_writer(output_format, stages, include_text=True):
+    """Build the writer for a format returned by resolve_format"""
+    if output_format == 'csv':
+        return CsvResultWriter(stages, include_text)
+    if output_format == 'ndjson':
+        return NdjsonResultWriter(stages, include_text)
+    return ColumnarResultWriter(stages, include_text, output_format)
+
+
+def format_for_filename(filename):
+    """The output format a result file name was written in (csv and ndjson optionally
+    .gz or .zst compressed), or None"""
+    name = (filename or '').lower()
+    for suffix in ('.gz', '.gzip', '.zst', '.zstd'):
+        if name.endswith(suffix):
+            name = name[:-len(suffix)]
+            break
+    extensions = {'.csv': 'csv', '.ndjson': 'ndjson', '.jsonl': 'ndjson', '.parquet': 'parquet',
+                  '.arrow': 'arrow', '.feather': 'arrow'}
+    for extension, output_format in extensions.items():
+        if name.endswith(extension):
+            return output_format
+    return None
+
+
+def _number(value, kind=float):
+    if value is None or value == '':
+        return None
+    return kind(float(value))
+
+
+def _items(value):
+    if value is None:
+        return []
+    if isinstance(value, str):
+        return [item.strip() for item in value.split(',') if item.strip()]
+    return list(value)
+
+
+def _flat_result(row):
+    """Result dict from one CSV or columnar row (column names matched case-insensitively).
+
+    A stage counts as present when the row's model versions name it or
+    any of its cells has a value, since CSV files carry every column.
+    CSV files carry no versions (they come with the file, see
+    X-Model-Versions) unless written before that, with a Model_Versions
+    column.
+    """
+    row = {str(name).lower(): value for name, value in row.items()}
+    versions = parse_versions(row.get('model_versions'))
+
+    def present(stage, *columns):
+        return stage in versions or any(row.get(column) not in (None, '', []) for column in columns)
+
+    result = {'id': int(row['id']), 'text': row.get('text'), 'model_versions': versions}
+    if present('sentiment', 'sentiment'):
+        result['sentiment'] = {'label': row.get('sentiment'), 'confidence': _number(row.get('sentiment_confidence'))}
+    if present('topics', 'topics'):
+        result['topics'] = _items(row.get('topics'))
+    aspect_columns = [f'{aspect}_sentiment' for aspect in ASPECTS]
+    if present('aspects', *aspect_columns):
+        result['aspects'] = {aspect: row.get(column) or 'Neutral' for aspect, column in zip(ASPECTS, aspect_columns)}
+    if present('emotion', 'emotion'):
+        result['emotion'] = {'label': row.get('emotion'), 'confidence': _number(row.get('emotion_confidence'))}
+    if present('text_analysis', 'text_length', 'tone'):
+        result['text_analysis'] = {'length': _number(row.get('text_length'), int), 'tone': row.get('tone')}
+    if present('keywords', 'keywords'):
+        result['keywords'] = _items(row.get('keywords'))
+    return result
+
+
+def read_results(stream, output_format, block_rows=RESULT_READ_ROWS):
+    """Parse a result file written by one of these writers back into result dicts.
+
+    Yields lists of about block_rows results. CSV and columnar rows only
+    hold what their columns carry (labels and confidences), so results
+    read from them have just those fields. Raises ValueError for a file
+    that is not a result file.
+    """
+    try:
+        if output_format == 'csv':
+            for df in pd.read_csv(open_decompressed(stream), dtype=str, keep_default_na=False,
+                                  chunksize=block_rows):
+                yield [_flat_result(row) for row in df.to_dict('records')]
+        elif output_format == 'ndjson':
+            block = []
+            for line in io.TextIOWrapper(open_decompressed(stream), encoding='utf-8'):
+                if not line.strip():
+                    continue
+                result = json.loads(line)
+                result['model_versions'] = parse_versions(result.get('model_versions'))
+                for stage in [stage for stage, value in result.items() if value is None]:
+                    del result[stage]
+                block.append(result)
+                if len(block) >= block_rows:
+                    yield block
+                    block = []
+            if block:
+                yield block
+        else:
+            if pa is None:
+                raise ValueError(f"Reading {output_format} files requires pyarrow, which is not installed")
+            if output_format == 'parquet':
+                batches = pq.ParquetFile(stream).iter_batches(batch_size=block_rows)
+            else:
+                reader = pa_ipc.open_file(stream)
+                batches = (reader.get_batch(i) for i in range(reader.num_record_batches))
+            for batch in batches:
+                yield [_flat_result(row) for row in batch.to_pylist()]
+    except (KeyError, TypeError, OSError, EOFError, UnicodeDecodeError) as e:
+        raise ValueError(f"Not a result file: {e!r}")
+    except ValueError as e:
+        raise ValueError(f"Not a result file: {e}")
@@ -0,0 +1,240 @@
+import os
+import math
+import random
+from collections import Counter
+from statistics import NormalDist
+
+from utils.result_formats import ASPECTS
+
+# Target half-width of the confidence intervals an estimate samples until it reaches
+SAMPLE_MARGIN = float(os.environ.get('SAMPLE_MARGIN', 0.02))
+SAMPLE_CONFIDENCE = 0.95
+# Rows held in the reservoir (per stratum), the most an estimate will analyze
+SAMPLE_MAX_ROWS = int(os.environ.get('SAMPLE_MAX_ROWS', 20000))
+# Rows analyzed before the margin is first checked, and the smallest later round
+SAMPLE_MIN_ROWS = int(os.environ.get('SAMPLE_MIN_ROWS', 400))
+SAMPLE_MAX_STRATA = int(os.environ.get('SAMPLE_MAX_STRATA', 100))
+
+
+def parse_margin(value):
+    """Parse a target margin of error in (0, 0.5), defaulting to SAMPLE_MARGIN"""
+    if value is None or value == '':
+        return SAMPLE_MARGIN
+    try:
+        margin = float(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"Invalid margin: {value}")
+    if not 0 < margin < 0.5:
+        raise ValueError(f"margin must be in (0, 0.5), got {value}")
+    return margin
+
+
+def parse_confidence(value):
+    """Parse a confidence level in [0.5, 0.999], defaulting to SAMPLE_CONFIDENCE"""
+    if value is None or value == '':
+        return SAMPLE_CONFIDENCE
+    try:
+        confidence = float(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"Invalid confidence: {value}")
+    if not 0.5 <= confidence <= 0.999:
+        raise ValueError(f"confidence must be in [0.5, 0.999], got {value}")
+    return confidence
+
+
+def parse_sample_size(value):
+    """Parse the most rows an estimate may analyze, at most SAMPLE_MAX_ROWS (the default)"""
+    if value is None or value == '':
+        return SAMPLE_MAX_ROWS
+    try:
+        size = int(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"Invalid sample size: {value}")
+    if not 1 <= size <= SAMPLE_MAX_ROWS:
+        raise ValueError(f"sample must be between 1 and {SAMPLE_MAX_ROWS}, got {value}")
+    return size
+
+
+class Reservoir:
+    """Uniform random sample of up to size items from a stream of unknown length.
+
+    Uses Li's Algorithm L: after the reservoir fills, the gap to the next
+    item that enters it is drawn directly, so a long stream costs random
+    draws only for the O(size * log(n / size)) items kept, not per item,
+    and whole blocks between them are skipped.
+    """
+
+    def __init__(self, size, rng):
+        self.size = size
+        self.items = []
+        self.seen = 0
+        self._rng = rng
+        self._weight = None
+        self._next = None
+
+    def _draw(self):
+        # 1 - random() is in (0, 1], so the logarithm is defined
+        return math.log(1 - self._rng.random())
+
+    def _advance(self):
+        self._weight *= math.exp(self._draw() / self.size)
+        self._next += int(self._draw() / math.log1p(-self._weight)) + 1
+
+    def extend(self, items):
+        start = self.seen
+        if len(self.items) < self.size:
+            self.items.extend(items[:self.size - len(self.items)])
+            if len(self.items) == self.size:
+                self._weight = 1.0
+                self._next = self.size - 1
+                self._advance()
+        end = start + len(items)
+        while self._next is not None and self._next < end:
+            if self._next >= start:
+                self.items[self._rng.randrange(self.size)] = items[self._next - start]
+            self._advance()
+        self.seen = end
+
+
+class StratifiedSampler:
+    """A Reservoir per stratum, with the stratum's row count.
+
+    Without strata every row falls in one stratum (None) and the sample
+    is a plain uniform one.
+    """
+
+    def __init__(self, size=SAMPLE_MAX_ROWS, seed=None, max_strata=SAMPLE_MAX_STRATA):
+        self.size = size
+        self.max_strata = max_strata
+        self.reservoirs = {}
+        self._rng = random.Random(seed)
+
+    def add(self, texts, keys=None):
+        """Offer a block of texts; rows with empty text are not part of the population"""
+        if keys is None:
+            groups = {None: [text for text in texts if text and text.strip()]}
+        else:
+            groups = {}
+            for text, key in zip(texts, keys):
+                if text and text.strip():
+                    groups.setdefault(key, []).append(text)
+        for key, items in groups.items():
+            reservoir = self.reservoirs.get(key)
+            if reservoir is None:
+                if len(self.reservoirs) >= self.max_strata:
+                    raise ValueError(f"More than {self.max_strata} strata; stratify by a coarser column")
+                reservoir = self.reservoirs[key] = Reservoir(self.size, self._rng)
+            reservoir.extend(items)
+
+    @property
+    def rows(self):
+        return sum(reservoir.seen for reservoir in self.reservoirs.values())
+
+    def rounds(self, first=SAMPLE_MIN_ROWS):
+        """Yield successive batches of (stratum, text) to analyze; start with next(),
+        then send() each following round's size.
+
+        Each reservoir is shuffled, so every prefix of it is itself a
+        uniform sample of its stratum, and rounds are allocated to strata
+        in proportion to their row counts.
+        """
+        for reservoir in self.reservoirs.values():
+            self._rng.shuffle(reservoir.items)
+        taken = Counter()
+        total = self.rows
+        wanted = first
+        while True:
+            batch = []
+            target = sum(taken.values()) + wanted
+            for key, reservoir in self.reservoirs.items():
+                share = min(len(reservoir.items), max(1, math.ceil(target * reservoir.seen / total)))
+                batch.extend((key, text) for text in reservoir.items[taken[key]:share])
+                taken[key] = max(taken[key], share)
+            if not batch:
+                return
+            wanted = yield batch
+
+
+class ProportionEstimate:
+    """Stratified estimates of label proportions with Wilson score intervals.
+
+    Each analyzed result contributes indicators: its sentiment and
+    emotion labels, each topic it has, and the label of each aspect.
+    A proportion is the population-weighted mean of its stratum sample
+    proportions; its variance includes the finite population
+    correction, so a stratum sampled in full contributes no error.
+    The interval is Wilson's with the design's effective sample size.
+    Estimates are only final once every stratum has been sampled.
+    """
+
+    def __init__(self, strata, confidence=SAMPLE_CONFIDENCE):
+        # stratum -> rows in the population
+        self.strata = strata
+        self.total = sum(strata.values())
+        self.confidence = confidence
+        self.z = NormalDist().inv_cdf((1 + confidence) / 2)
+        self.sampled = Counter()
+        self.errors = 0
+        self.counts = {key: Counter() for key in strata}
+
+    def add(self, stratum, result):
+        if result is None:
+            self.errors += 1
+            return
+        self.sampled[stratum] += 1
+        counts = self.counts[stratum]
+        for name in ('sentiment', 'emotion'):
+            value = result.get(name)
+            if value is not None:
+                counts[(name, value['label'])] += 1
+        for topic in result.get('topics') or ():
+            counts[('topics', topic)] += 1
+        aspects = result.get('aspects')
+        if aspects is not None:
+            for aspect in ASPECTS:
+                counts[('aspects', aspect, aspects.get(aspect, 'Neutral'))] += 1
+
+    def interval(self, indicator):
+        """(proportion, low, high) for one indicator"""
+        proportion = smoothed = variance = 0.0
+        for stratum, rows in self.strata.items():
+            n = self.sampled[stratum]
+            if not n:
+                continue
+            weight = rows / self.total
+            count = self.counts[stratum][indicator]
+            proportion += weight * count / n
+            # Agresti-Coull smoothing, so a stratum whose sample is all one label still carries variance
+            p = (count + self.z ** 2 / 2) / (n + self.z ** 2)
+            smoothed += weight * p
+            variance += weight ** 2 * (1 - n / rows) * p * (1 - p) / n
+        if variance == 0:
+            # Every stratum was analyzed in full
+            return proportion, proportion, proportion
+        effective = smoothed * (1 - smoothed) / variance
+        z2 = self.z ** 2 / effective
+        center = (proportion + z2 / 2) / (1 + z2)
+        half = self.z * math.sqrt(proportion * (1 - proportion) / effective + z2 / (4 * effective)) / (1 + z2)
+        return proportion, max(0.0, center - half), min(1.0, center + half)
+
+    def _indicators(self):
+        indicators = set()
+        for counts in self.counts.values():
+            indicators.update(counts)
+        return sorted(indicators)
+
+    def margin(self):
+        """Largest interval half-width over every indicator seen so far"""
+        widths = [(high - low) / 2 for _, low, high in map(self.interval, self._indicators())]
+        return max(widths, default=1.0)
+
+    def to_dict(self):
+        estimates = {'sentiment': {}, 'emotion': {}, 'topics': {}, 'aspects': {}}
+        for indicator in self._indicators():
+            proportion, low, high = self.interval(indicator)
+            target = estimates[indicator[0]]
+            for key in indicator[1:-1]:
+                target = target.setdefault(key, {})
+            target[indicator[-1]] = {'proportion': round(proportion, 4), 'low': round(low, 4),
+                                     'high': round(high, 4), 'margin': round((high - low) / 2, 4)}
+        return estimates
@@ -0,0 +1,142 @@
+import os
+import time
+import threading
+import contextvars
+from collections import deque
+from concurrent.futures import Future
+
+from utils import metrics
+
+# Priority classes, highest first
+PRIORITIES = ('interactive', 'batch')
+
+SCHEDULER_WORKERS = int(os.environ.get('SCHEDULER_WORKERS', os.cpu_count() or 1))
+# Minimum share of worker time batch work receives while interactive work is queued
+SCHEDULER_BATCH_SHARE = float(os.environ.get('SCHEDULER_BATCH_SHARE', 0.2))
+# Rows per batch task; interactive tasks can only overtake batch work between chunks
+SCHEDULER_BATCH_CHUNK = int(os.environ.get('SCHEDULER_BATCH_CHUNK', 8))
+
+
+class _Task:
+    __slots__ = ('priority', 'fn', 'args', 'kwargs', 'future', 'enqueued', 'context')
+
+    def __init__(self, priority, fn, args, kwargs):
+        self.priority = priority
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+        self.future = Future()
+        self.enqueued = time.perf_counter()
+        # The submitter's context variables (e.g. its pinned model set) are visible to fn
+        self.context = contextvars.copy_context()
+
+
+class WorkScheduler:
+    """Runs analyzer work on a fixed pool of threads in priority order.
+
+    Interactive tasks are dispatched ahead of queued batch tasks, except
+    that batch work is picked whenever its recent share of worker time
+    has fallen below batch_share, so a steady stream of interactive
+    requests cannot starve an upload. Tasks are never interrupted; batch
+    endpoints submit their rows in small chunks so interactive work
+    waits at most one chunk per worker.
+
+    With workers=0 tasks run inline on the calling thread.
+    """
+
+    # Per-dispatch decay of the worker-time accumulators behind the share calculation
+    USAGE_DECAY = 0.95
+
+    def __init__(self, workers=SCHEDULER_WORKERS, batch_share=SCHEDULER_BATCH_SHARE):
+        self.workers = max(0, workers)
+        self.batch_share = min(max(batch_share, 0.0), 1.0)
+        self._queues = {priority: deque() for priority in PRIORITIES}
+        self._usage = {priority: 0.0 for priority in PRIORITIES}
+        self._condition = threading.Condition()
+        self._threads = []
+
+    def _start(self):
+        # Threads start on first use so forked workers each get their own
+        if len(self._threads) < self.workers:
+            for index in range(len(self._threads), self.workers):
+                thread = threading.Thread(target=self._worker, name=f'scheduler-{index}', daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def submit(self, priority, fn, *args, **kwargs):
+        """Queue fn(*args, **kwargs) under a priority class; returns a Future"""
+        if priority not in self._queues:
+            raise ValueError(f"Unknown priority: {priority}. Valid priorities: {', '.join(PRIORITIES)}")
+        task = _Task(priority, fn, args, kwargs)
+        if self.workers == 0:
+            self._execute(task)
+            return task.future
+        with self._condition:
+            self._start()
+            self._queues[priority].append(task)
+            metrics.SCHEDULER_QUEUE_DEPTH.inc(priority)
+            self._condition.notify()
+        return task.future
+
+    def run(self, priority, fn, *args, **kwargs):
+        """Submit fn and wait for its result"""
+        return self.submit(priority, fn, *args, **kwargs).result()
+
+    def queue_depths(self):
+        with self._condition:
+            return {priority: len(queue) for priority, queue in self._queues.items()}
+
+    def _pick(self):
+        """Pop the next task; caller holds the condition and at least one queue is non-empty"""
+        interactive, batch = self._queues['interactive'], self._queues['batch']
+        if interactive and batch:
+            total = self._usage['interactive'] + self._usage['batch']
+            batch_fraction = self._usage['batch'] / total if total else 0.0
+            queue = batch if batch_fraction < self.batch_share else interactive
+        else:
+            queue = interactive or batch
+        return queue.popleft()
+
+    def _worker(self):
+        while True:
+            with self._condition:
+                while not any(self._queues.values()):
+                    self._condition.wait()
+                task = self._pick()
+                metrics.SCHEDULER_QUEUE_DEPTH.dec(task.priority)
+            self._execute(task)
+
+    def _execute(self, task):
+        start = time.perf_counter()
+        metrics.SCHEDULER_WAIT_SECONDS.observe(task.priority, value=start - task.enqueued)
+        if not task.future.set_running_or_notify_cancel():
+            return
+        try:
+            task.future.set_result(task.context.run(self._call, task))
+        except BaseException as e:
+            task.future.set_exception(e)
+        finally:
+            elapsed = time.perf_counter() - start
+            metrics.SCHEDULER_TASK_SECONDS.observe(task.priority, value=elapsed)
+            with self._condition:
+                for priority in self._usage:
+                    self._usage[priority] *= self.USAGE_DECAY
+                self._usage[task.priority] += elapsed
+
+
+    def _call(self, task):
+        if self.workers == 0:
+            # Inline tasks run on the submitting thread, whose own CPU time already covers them
+            return task.fn(*task.args, **task.kwargs)
+        start_cpu = time.thread_time()
+        try:
+            return task.fn(*task.args, **task.kwargs)
+        finally:
+            # Charged to the submitting request, whose thread only waited meanwhile
+            metrics.charge_cpu(time.thread_time() - start_cpu)
+
+
+def chunked(items, size=SCHEDULER_BATCH_CHUNK):
+    """Split a list into consecutive chunks of at most size items"""
+    size = max(1, size)
+    return [items[start:start + size] for start in range(0, len(items), size)]
@@ -0,0 +1,109 @@
+import os
+import re
+from nltk.tokenize import sent_tokenize
+
+# Abbreviations common in English reviews that end in a period but do not end a sentence
+ABBREVIATIONS = {'mr', 'mrs', 'ms', 'dr', 'prof', 'sr', 'jr', 'vs', 'e.g', 'i.e'}
+# Abbreviations that also end sentences ("I said no.", "Took 5 min.", "We went in Dec."), or are
+# ordinary words; they only continue the sentence when the next word is lowercase or a number
+AMBIGUOUS_ABBREVIATIONS = {
+    'st', 'etc', 'approx', 'min', 'mins', 'hr', 'hrs', 'no', 'vol', 'ep', 'pt', 'ft', 'co',
+    'inc', 'ltd', 'jan', 'feb', 'mar', 'apr', 'jun', 'jul', 'aug', 'sep', 'sept',
+    'oct', 'nov', 'dec', 'u.s', 'u.k', 'a.m', 'p.m'
+}
+
+# Candidate boundary: terminal punctuation, optional closing quotes/brackets, then whitespace
+_BOUNDARY = re.compile(r'([.!?]+)(["\'”’)\]]*)(\s+)')
+_LAST_WORD = re.compile(r'([\w.]+)$')
+_PARAGRAPH = re.compile(r'\n\s*\n')
+
+
+class SentenceSegmenter:
+    """Interface for sentence segmenters used by the analyzers"""
+    name = 'base'
+
+    def split(self, text):
+        """Return the list of non-empty sentences in text"""
+        raise NotImplementedError
+
+
+class PunktSegmenter(SentenceSegmenter):
+    """NLTK Punkt segmenter (the original behaviour)"""
+    name = 'punkt'
+
+    def split(self, text):
+        return [s.strip() for s in sent_tokenize(text) if s.strip()]
+
+
+class RuleBasedSegmenter(SentenceSegmenter):
+    """Single-pass regex segmenter tuned for review text.
+
+    Breaks after '.', '!' or '?' (optionally followed by closing quotes
+    or brackets) when whitespace follows, except after known
+    abbreviations, single-letter initials, and ellipses that continue in
+    lowercase. Ambiguous abbreviations ("no.", "min.", "Dec.") only hold
+    the sentence open when the next word starts in lowercase or with a
+    digit. Blank lines always end a sentence.
+    """
+    name = 'rule'
+
+    def __init__(self, abbreviations=ABBREVIATIONS, ambiguous=AMBIGUOUS_ABBREVIATIONS):
+        self.abbreviations = abbreviations
+        self.ambiguous = ambiguous
+
+    def _is_boundary(self, text, match):
+        punctuation = match.group(1)
+        next_index = match.end()
+        if next_index >= len(text):
+            return True
+        if punctuation == '.':
+            # Only look a short way back so long documents stay linear-time
+            word = _LAST_WORD.search(text, max(0, match.start(1) - 32), match.start(1))
+            if word:
+                token = word.group(1).lower().rstrip('.')
+                if token in self.abbreviations:
+                    return False
+                if token in self.ambiguous and (text[next_index].islower() or text[next_index].isdigit()):
+                    return False
+                # Initials such as "J. K. Rowling"
+                if len(token) == 1 and token.isalpha():
+                    return False
+        # An ellipsis followed by lowercase usually continues the same sentence
+        if punctuation.startswith('..') and text[next_index].islower():
+            return False
+        return True
+
+    def _split_paragraph(self, text):
+        sentences = []
+        start = 0
+        for match in _BOUNDARY.finditer(text):
+            if self._is_boundary(text, match):
+                end = match.end(2)
+                sentence = text[start:end].strip()
+                if sentence:
+                    sentences.append(sentence)
+                start = match.end()
+        tail = text[start:].strip()
+        if tail:
+            sentences.append(tail)
+        return sentences
+
+    def split(self, text):
+        sentences = []
+        for paragraph in _PARAGRAPH.split(text):
+            sentences.extend(self._split_paragraph(paragraph))
+        return sentences
+
+
+SEGMENTERS = {
+    PunktSegmenter.name: PunktSegmenter,
+    RuleBasedSegmenter.name: RuleBasedSegmenter
+}
+
+
+def get_segmenter(name=None):
+    """Build the segmenter named by name or the SENTENCE_SEGMENTER setting"""
+    name = (name or os.environ.get('SENTENCE_SEGMENTER', 'punkt')).lower()
+    if name not in SEGMENTERS:
+        raise ValueError(f"Unknown sentence segmenter '{name}'. Choose one of: {', '.join(SEGMENTERS)}")
+    return SEGMENTERS[name]()
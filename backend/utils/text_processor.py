@@ -2,13 +2,15 @@ import re
 import string
 from collections import Counter
 import nltk
-from nltk.tokenize import sent_tokenize, word_tokenize
+from nltk.tokenize import word_tokenize
 from nltk.corpus import stopwords
 import numpy as np
+from utils.segmenter import get_segmenter
 
 class TextProcessor:
-    def __init__(self):
+    def __init__(self, segmenter=None):
         self.stop_words = set(stopwords.words('english'))
+        self.segmenter = segmenter or get_segmenter()
         
         # Linguistic indicators
         self.formal_indicators = self._load_formal_indicators()
@@ -104,9 +106,7 @@ class TextProcessor:
     
     def _count_sentences(self, text):
         """Count sentences in text"""
-        sentences = sent_tokenize(text)
-        sentences = [s.strip() for s in sentences if s.strip()]
-        return len(sentences)
+        return len(self.segmenter.split(text))
     
     def _calculate_average_word_length(self, text):
         """Calculate average word length"""
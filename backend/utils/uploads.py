@@ -0,0 +1,290 @@
+import io
+import os
+import re
+import json
+import time
+import uuid
+import shutil
+import hashlib
+import tempfile
+
+from utils.jobs import JOB_TTL
+from utils.checkpoint import write_durably
+
+# Chunked uploads are assembled here, one directory per upload session
+UPLOAD_DIR = os.environ.get('UPLOAD_DIR', os.path.join(tempfile.gettempdir(), 'text-analysis-uploads'))
+UPLOAD_CHUNK_BYTES = int(os.environ.get('UPLOAD_CHUNK_BYTES', 8 << 20))
+UPLOAD_MIN_CHUNK_BYTES = 64 << 10
+UPLOAD_MAX_CHUNK_BYTES = int(os.environ.get('UPLOAD_MAX_CHUNK_BYTES', 64 << 20))
+UPLOAD_MAX_BYTES = int(os.environ.get('UPLOAD_MAX_BYTES', 20 << 30))
+# A reader waiting for chunks gives up when none has arrived for this many seconds
+UPLOAD_STALL_TIMEOUT = float(os.environ.get('UPLOAD_STALL_TIMEOUT', 600))
+# How often a reader checks for newly received chunks
+UPLOAD_POLL_INTERVAL = 0.2
+
+_UPLOAD_ID = re.compile(r'^[0-9a-f]{32}$')
+_SHA256 = re.compile(r'^[0-9a-f]{64}$')
+_BLOCK_SIZE = 1 << 20
+
+
+class UploadError(Exception):
+    """Raised for an invalid upload request; carries the HTTP status to answer with"""
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+def _checksum(value, name):
+    checksum = str(value or '').strip().lower()
+    if not _SHA256.match(checksum):
+        raise UploadError(f"{name} must be a hex SHA-256 digest")
+    return checksum
+
+
+class UploadStore:
+    """Resumable chunked uploads assembled on local disk in UPLOAD_DIR/<upload id>/.
+
+    The file is preallocated at its declared size and every chunk is
+    written in place at number * chunk_size, so chunks may arrive in any
+    order, in parallel and through any worker. A chunk counts as received
+    once its checksum-verified bytes are fsynced and its marker file
+    chunks/<number> exists; the markers are the upload's progress, so a
+    client that lost track of it asks which chunks are still missing.
+    """
+
+    def __init__(self, root=UPLOAD_DIR, ttl=JOB_TTL):
+        self.root = root
+        self.ttl = ttl
+
+    def _directory(self, upload_id):
+        if not isinstance(upload_id, str) or not _UPLOAD_ID.match(upload_id):
+            raise KeyError(upload_id)
+        return os.path.join(self.root, upload_id)
+
+    def path(self, upload_id, name):
+        """Path of a file belonging to the upload"""
+        return os.path.join(self._directory(upload_id), name)
+
+    def create(self, filename, size, chunk_size=None):
+        """Start an upload session for a file of size bytes and return it"""
+        self.cleanup()
+        try:
+            size = int(size)
+            chunk_size = int(chunk_size or UPLOAD_CHUNK_BYTES)
+        except (TypeError, ValueError):
+            raise UploadError("size and chunk_size must be integers")
+        if not 0 < size <= UPLOAD_MAX_BYTES:
+            raise UploadError(f"size must be between 1 and {UPLOAD_MAX_BYTES} bytes", 413 if size > 0 else 400)
+        if not UPLOAD_MIN_CHUNK_BYTES <= chunk_size <= UPLOAD_MAX_CHUNK_BYTES:
+            raise UploadError(f"chunk_size must be between {UPLOAD_MIN_CHUNK_BYTES} and {UPLOAD_MAX_CHUNK_BYTES} bytes")
+        upload_id = uuid.uuid4().hex
+        os.makedirs(self.path(upload_id, 'chunks'))
+        with open(self.path(upload_id, 'data'), 'wb') as f:
+            f.truncate(size)
+        session = {'id': upload_id, 'filename': filename, 'size': size, 'chunk_size': chunk_size,
+                   'chunks': -(-size // chunk_size), 'created': time.time(), 'finalized': None}
+        write_durably(self.path(upload_id, 'session.json'), json.dumps(session).encode())
+        return self.get(upload_id)
+
+    def get(self, upload_id):
+        """Return the session with its received chunk numbers and analysis job, or None"""
+        try:
+            with open(self.path(upload_id, 'session.json')) as f:
+                session = json.load(f)
+            received = sorted(int(name) for name in os.listdir(self.path(upload_id, 'chunks')) if name.isdigit())
+        except (KeyError, OSError, ValueError):
+            return None
+        session['received'] = received
+        session['bytes_received'] = sum(self._chunk_length(session, number) for number in received)
+        session['complete'] = len(received) == session['chunks']
+        session['job'] = self._job(upload_id)
+        return session
+
+    @staticmethod
+    def _chunk_length(session, number):
+        return min(session['chunk_size'], session['size'] - number * session['chunk_size'])
+
+    def _job(self, upload_id):
+        try:
+            with open(self.path(upload_id, 'job')) as f:
+                return f.read().strip() or None
+        except OSError:
+            return None
+
+    def write_chunk(self, upload_id, number, stream, sha256):
+        """Store chunk number from a binary stream, verifying its length and SHA-256.
+
+        Re-sending a received chunk with the same checksum is a no-op, so
+        clients can retry blindly; a different checksum is a conflict.
+        """
+        session = self.get(upload_id)
+        if session is None:
+            raise UploadError("Upload not found", 404)
+        sha256 = _checksum(sha256, 'X-Chunk-Sha256')
+        if not 0 <= number < session['chunks']:
+            raise UploadError(f"Chunk number must be between 0 and {session['chunks'] - 1}")
+        marker = self.path(upload_id, os.path.join('chunks', str(number)))
+        if number in session['received']:
+            with open(marker) as f:
+                if f.read().strip() == sha256:
+                    return session
+            raise UploadError(f"Chunk {number} was already received with a different checksum", 409)
+
+        expected = self._chunk_length(session, number)
+        offset = number * session['chunk_size']
+        digest = hashlib.sha256()
+        length = 0
+        fd = os.open(self.path(upload_id, 'data'), os.O_WRONLY)
+        try:
+            for block in iter(lambda: stream.read(_BLOCK_SIZE), b''):
+                length += len(block)
+                if length > expected:
+                    raise UploadError(f"Chunk {number} must be {expected} bytes")
+                digest.update(block)
+                os.pwrite(fd, block, offset)
+                offset += len(block)
+            if length != expected:
+                raise UploadError(f"Chunk {number} must be {expected} bytes, got {length}")
+            if digest.hexdigest() != sha256:
+                raise UploadError(f"Checksum mismatch for chunk {number}")
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+        write_durably(marker, sha256.encode())
+        return self.get(upload_id)
+
+    def finalize(self, upload_id, sha256=None):
+        """Mark a fully received upload complete, optionally verifying the whole file's SHA-256"""
+        session = self.get(upload_id)
+        if session is None:
+            raise UploadError("Upload not found", 404)
+        missing = sorted(set(range(session['chunks'])) - set(session['received']))
+        if missing:
+            raise UploadError(f"{len(missing)} chunks are missing, first {missing[0]}", 409)
+        if sha256:
+            sha256 = _checksum(sha256, 'sha256')
+            digest = hashlib.sha256()
+            with open(self.path(upload_id, 'data'), 'rb') as f:
+                for block in iter(lambda: f.read(_BLOCK_SIZE), b''):
+                    digest.update(block)
+            if digest.hexdigest() != sha256:
+                raise UploadError("Checksum mismatch for the assembled file")
+        if session['finalized'] is None:
+            session['finalized'] = time.time()
+            stored = {key: session[key] for key in ('id', 'filename', 'size', 'chunk_size', 'chunks',
+                                                     'created', 'finalized')}
+            write_durably(self.path(upload_id, 'session.json'), json.dumps(stored).encode())
+        return session
+
+    def claim_job(self, upload_id, job_id):
+        """Record job_id as the upload's analysis job; False if it already has one"""
+        try:
+            fd = os.open(self.path(upload_id, 'job'), os.O_WRONLY | os.O_CREAT | os.O_EXCL)
+        except FileExistsError:
+            return False
+        with os.fdopen(fd, 'w') as f:
+            f.write(job_id)
+        return True
+
+    def abort(self, upload_id):
+        """Delete an upload; readers waiting for its chunks fail"""
+        directory = self._directory(upload_id)
+        if not os.path.isdir(directory):
+            return False
+        shutil.rmtree(directory, ignore_errors=True)
+        return True
+
+    def reader(self, upload_id):
+        """Buffered binary reader over the upload that waits for chunks still in flight"""
+        session = self.get(upload_id)
+        if session is None:
+            raise UploadError("Upload not found", 404)
+        return io.BufferedReader(UploadReader(self, session), buffer_size=_BLOCK_SIZE)
+
+    def last_activity(self, upload_id):
+        """Time the session was created or last received a chunk"""
+        chunks = self.path(upload_id, 'chunks')
+        times = [os.path.getmtime(os.path.join(chunks, name)) for name in os.listdir(chunks)]
+        return max(times + [os.path.getmtime(self.path(upload_id, 'session.json'))])
+
+    def cleanup(self):
+        """Delete uploads with no activity for more than ttl seconds"""
+        if not os.path.isdir(self.root):
+            return
+        cutoff = time.time() - self.ttl
+        for upload_id in os.listdir(self.root):
+            try:
+                stale = self.last_activity(upload_id) < cutoff
+            except (KeyError, OSError):
+                stale = True
+            if stale:
+                shutil.rmtree(os.path.join(self.root, upload_id), ignore_errors=True)
+
+
+class UploadReader(io.RawIOBase):
+    """Seekable view of an upload's assembled file that blocks until the bytes it
+    reads have been received, so parsing can start while the upload is in progress.
+
+    Raises OSError if the upload is aborted or no chunk arrives for
+    UPLOAD_STALL_TIMEOUT seconds.
+    """
+
+    def __init__(self, store, session, stall_timeout=UPLOAD_STALL_TIMEOUT):
+        self._store = store
+        self._id = session['id']
+        self._size = session['size']
+        self._chunk_size = session['chunk_size']
+        self._received = set(session['received'])
+        self._stall_timeout = stall_timeout
+        self._position = 0
+        self._fd = os.open(store.path(self._id, 'data'), os.O_RDONLY)
+
+    @property
+    def size(self):
+        return self._size
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self._position
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_CUR:
+            offset += self._position
+        elif whence == io.SEEK_END:
+            offset += self._size
+        self._position = max(0, offset)
+        return self._position
+
+    def _wait_for(self, number):
+        marker = self._store.path(self._id, os.path.join('chunks', str(number)))
+        deadline = time.monotonic() + self._stall_timeout
+        while not os.path.exists(marker):
+            if not os.path.isdir(self._store.path(self._id, 'chunks')):
+                raise OSError("Upload was aborted")
+            if time.monotonic() > deadline:
+                raise OSError(f"Upload stalled waiting for chunk {number}")
+            time.sleep(UPLOAD_POLL_INTERVAL)
+        self._received.add(number)
+
+    def readinto(self, buffer):
+        if self._position >= self._size:
+            return 0
+        number = self._position // self._chunk_size
+        if number not in self._received:
+            self._wait_for(number)
+        end = min((number + 1) * self._chunk_size, self._size)
+        data = os.pread(self._fd, min(len(buffer), end - self._position), self._position)
+        buffer[:len(data)] = data
+        self._position += len(data)
+        return len(data)
+
+    def close(self):
+        if not self.closed:
+            os.close(self._fd)
+        super().close()
@@ -0,0 +1,324 @@
+import os
+import math
+import string
+import threading
+from contextlib import contextmanager, nullcontext
+
+import numpy as np
+from nltk.sentiment.vader import SentimentIntensityAnalyzer
+
+from utils.metrics import record_cache_lookup
+
+# Scores match SentimentIntensityAnalyzer.polarity_scores to within one unit
+# of its rounding (0.001 for pos/neu/neg, 0.0001 for compound); in practice
+# they are identical because the same float64 operations run in the same order.
+SCORE_TOLERANCE = {'pos': 1e-3, 'neu': 1e-3, 'neg': 1e-3, 'compound': 1e-4}
+
+_PUNCTUATION = set(string.punctuation)
+
+# Documents containing these phrases go through NLTK, whose idiom handling is not vectorized
+_IDIOM_MARKERS = ('the shit', 'the bomb', 'bad ass', 'yeah right', 'cut the mustard',
+                  'kiss of death', 'hand to mouth')
+
+# Words whose exact or lowercase identity matters to VADER's rules
+_SPECIAL_WORDS = ('never', 'so', 'this', 'but', 'least', 'at', 'very', 'kind', 'of',
+                  'sort', 'just', 'enough')
+
+# Distinct documents cached per primed batch before older entries are dropped
+MAX_PRIMED_TEXTS = 100000
+
+
+class VaderBatchScorer:
+    """Vectorized drop-in for SentimentIntensityAnalyzer.
+
+    The lexicon, booster and negation lists are compiled once into arrays
+    indexed by word id. Scoring a list of texts tokenizes them into one
+    flat array of ids and applies VADER's capitalisation, booster,
+    negation, "never so", "least" and "but" rules as NumPy operations over
+    the whole batch.
+    """
+
+    def __init__(self, analyzer=None):
+        self.analyzer = analyzer or SentimentIntensityAnalyzer()
+        self.constants = self.analyzer.constants
+        self._punc_set = set(self.constants.PUNC_LIST)
+        self._local = threading.local()
+        self._compile()
+
+    def _compile(self):
+        """Build the word-id vocabulary and per-id feature arrays"""
+        constants = self.constants
+        words = set(self.analyzer.lexicon)
+        words.update(w for w in constants.BOOSTER_DICT if ' ' not in w)
+        words.update(constants.NEGATE)
+        words.update(_SPECIAL_WORDS)
+        # Id 0 is every word VADER has no rule for
+        self.vocabulary = {word: index for index, word in enumerate(sorted(words), start=1)}
+        size = len(self.vocabulary) + 1
+
+        self.lex_valence = np.zeros(size)
+        self.in_lexicon = np.zeros(size, dtype=bool)
+        self.booster = np.zeros(size)
+        self.is_booster = np.zeros(size, dtype=bool)
+        self.negation = np.zeros(size, dtype=bool)
+        for word, index in self.vocabulary.items():
+            if word in self.analyzer.lexicon:
+                self.lex_valence[index] = self.analyzer.lexicon[word]
+                self.in_lexicon[index] = True
+            if word in constants.BOOSTER_DICT:
+                self.booster[index] = constants.BOOSTER_DICT[word]
+                self.is_booster[index] = True
+            if word in constants.NEGATE:
+                self.negation[index] = True
+        self.special = {word: self.vocabulary[word] for word in _SPECIAL_WORDS}
+
+    def _tokenize(self, text):
+        """Split text the way VADER's SentiText does"""
+        raw = [token for token in text.split() if len(token) > 1]
+        tokens = []
+        for token in raw:
+            # Strip a leading or trailing punctuation run from PUNC_LIST if a bare word remains
+            end = len(token)
+            while end > 0 and token[end - 1] in _PUNCTUATION:
+                end -= 1
+            if end < len(token) and token[end:] in self._punc_set:
+                word = token[:end]
+                if len(word) > 1 and not any(c in _PUNCTUATION for c in word):
+                    tokens.append(word)
+                    continue
+            start = 0
+            while start < len(token) and token[start] in _PUNCTUATION:
+                start += 1
+            if start > 0 and token[:start] in self._punc_set:
+                word = token[start:]
+                if len(word) > 1 and not any(c in _PUNCTUATION for c in word):
+                    tokens.append(word)
+                    continue
+            tokens.append(token)
+        return tokens
+
+    def _encode(self, texts):
+        """Tokenize texts into flat per-token arrays"""
+        vocabulary = self.vocabulary
+        ids, upper, lower, has_nt, doc, first = [], [], [], [], [], []
+        cap_diff = np.zeros(len(texts), dtype=bool)
+        for doc_index, text in enumerate(texts):
+            tokens = self._tokenize(text)
+            # VADER scores a repeated word using the context of its first occurrence
+            seen = {}
+            base = len(ids)
+            upper_count = 0
+            for position, token in enumerate(tokens):
+                low = token.lower()
+                is_upper = token.isupper()
+                upper_count += is_upper
+                ids.append(vocabulary.get(low, 0))
+                upper.append(is_upper)
+                lower.append(token == low)
+                has_nt.append("n't" in low)
+                doc.append(doc_index)
+                first.append(seen.setdefault(token, base + position))
+            cap_diff[doc_index] = 0 < len(tokens) - upper_count < len(tokens)
+        return (np.array(ids, dtype=np.int32), np.array(upper, dtype=bool),
+                np.array(lower, dtype=bool), np.array(has_nt, dtype=bool),
+                np.array(doc, dtype=np.int64), np.array(first, dtype=np.int64), cap_diff)
+
+    @staticmethod
+    def _shift(values, k, fill):
+        """values[i - k], with fill for the first k positions"""
+        shifted = np.empty_like(values)
+        shifted[:k] = fill
+        shifted[k:] = values[:-k]
+        return shifted
+
+    def _token_sentiments(self, ids, upper, lower, has_nt, doc, first, cap_diff):
+        """Compute the per-token valences VADER sums"""
+        constants = self.constants
+        special = self.special
+        count = len(ids)
+        doc_start = np.r_[0, np.flatnonzero(np.diff(doc)) + 1]
+        starts = np.repeat(doc_start, np.diff(np.r_[doc_start, count]))
+        position = np.arange(count) - starts
+
+        in_lex = self.in_lexicon[ids]
+        negated = self.negation[ids] | has_nt
+        booster = self.booster[ids]
+        is_booster = self.is_booster[ids]
+        caps = cap_diff[doc]
+        never = (ids == special['never']) & lower
+        so_this = ((ids == special['so']) | (ids == special['this'])) & lower
+
+        valence = np.where(in_lex, self.lex_valence[ids], 0.0)
+        capped = in_lex & upper & caps
+        valence = np.where(capped, np.where(valence > 0, valence + constants.C_INCR,
+                                            valence - constants.C_INCR), valence)
+
+        # Two-word boosters ("kind of", "sort of", "just enough") starting at each position
+        same_doc_next = np.r_[doc[1:] == doc[:-1], False]
+        next_ids = np.r_[ids[1:], 0]
+        next_lower = np.r_[lower[1:], False]
+        bigram_booster = same_doc_next & lower & next_lower & (
+            (((ids == special['kind']) | (ids == special['sort'])) & (next_ids == special['of'])) |
+            ((ids == special['just']) & (next_ids == special['enough'])))
+
+        for k in (1, 2, 3):
+            valid = in_lex & (position >= k) & ~self._shift(in_lex, k, True)
+            prev_booster = self._shift(booster, k, 0.0)
+            scalar = np.where(valence < 0, -prev_booster, prev_booster)
+            capped = self._shift(is_booster, k, False) & self._shift(upper, k, False) & caps
+            scalar = np.where(capped, np.where(valence > 0, scalar + constants.C_INCR,
+                                               scalar - constants.C_INCR), scalar)
+            if k == 2:
+                scalar = scalar * 0.95
+            elif k == 3:
+                scalar = scalar * 0.9
+            valence = np.where(valid, valence + scalar, valence)
+
+            # "never" and negation checks on the word k places back
+            prev_negated = self._shift(negated, k, False)
+            if k == 1:
+                valence = np.where(valid & prev_negated, valence * constants.N_SCALAR, valence)
+            else:
+                if k == 2:
+                    emphasis, factor = self._shift(never, 2, False) & self._shift(so_this, 1, False), 1.5
+                else:
+                    emphasis = ((self._shift(never, 3, False) & self._shift(so_this, 2, False)) |
+                                self._shift(so_this, 1, False))
+                    factor = 1.25
+                valence = np.where(valid & emphasis, valence * factor,
+                                   np.where(valid & prev_negated, valence * constants.N_SCALAR, valence))
+            if k == 3:
+                dampened = self._shift(bigram_booster, 3, False) | self._shift(bigram_booster, 2, False)
+                valence = np.where(valid & dampened, valence + constants.B_DECR, valence)
+
+        # "least" negates unless preceded by "at least" / "very least"
+        prev_least = (self._shift(ids, 1, 0) == special['least']) & ~self._shift(in_lex, 1, True)
+        prev2 = self._shift(ids, 2, 0)
+        least_negates = in_lex & prev_least & (
+            ((position > 1) & (prev2 != special['at']) & (prev2 != special['very'])) |
+            (position == 1))
+        valence = np.where(least_negates, valence * constants.N_SCALAR, valence)
+
+        # Boosters and "kind" in "kind of" contribute zero themselves
+        next_lower_of = same_doc_next & (next_ids == special['of'])
+        skipped = is_booster | ((ids == special['kind']) & next_lower_of)
+        sentiments = np.where(skipped, 0.0, valence)[first]
+
+        # "but" halves what comes before it and boosts what comes after
+        is_but = ids == special['but']
+        but_position = np.full(len(cap_diff), -1)
+        but_index = np.flatnonzero(is_but)
+        if len(but_index):
+            docs_with_but, first_but = np.unique(doc[but_index], return_index=True)
+            but_position[docs_with_but] = position[but_index[first_but]]
+        token_but = but_position[doc]
+        factor = np.where(token_but < 0, 1.0,
+                          np.where(position < token_but, 0.5, np.where(position > token_but, 1.5, 1.0)))
+        return sentiments * factor
+
+    def _score_documents(self, texts):
+        """Score texts with no idioms, returning a list of score dicts"""
+        ids, upper, lower, has_nt, doc, first, cap_diff = self._encode(texts)
+        documents = len(texts)
+        if len(ids):
+            sentiments = self._token_sentiments(ids, upper, lower, has_nt, doc, first, cap_diff)
+        else:
+            sentiments = np.zeros(0)
+        token_counts = np.bincount(doc, minlength=documents)
+        sums = np.bincount(doc, weights=sentiments, minlength=documents)
+        pos_sums = np.bincount(doc, weights=np.where(sentiments > 0, sentiments + 1, 0.0), minlength=documents)
+        neg_sums = np.bincount(doc, weights=np.where(sentiments < 0, sentiments - 1, 0.0), minlength=documents)
+        neu_counts = np.bincount(doc, weights=(sentiments == 0).astype(float), minlength=documents)
+
+        results = []
+        for index, text in enumerate(texts):
+            if not token_counts[index]:
+                results.append({'neg': 0.0, 'neu': 0.0, 'pos': 0.0, 'compound': 0.0})
+                continue
+            # Punctuation emphasis, as in SentimentIntensityAnalyzer._punctuation_emphasis
+            question_marks = text.count('?')
+            amplifier = min(text.count('!'), 4) * 0.292
+            if question_marks > 1:
+                amplifier += question_marks * 0.18 if question_marks <= 3 else 0.96
+
+            sum_s = float(sums[index])
+            if sum_s > 0:
+                sum_s += amplifier
+            elif sum_s < 0:
+                sum_s -= amplifier
+            compound = self.constants.normalize(sum_s)
+
+            pos_sum, neg_sum = float(pos_sums[index]), float(neg_sums[index])
+            neu_count = int(neu_counts[index])
+            if pos_sum > math.fabs(neg_sum):
+                pos_sum += amplifier
+            elif pos_sum < math.fabs(neg_sum):
+                neg_sum -= amplifier
+            total = pos_sum + math.fabs(neg_sum) + neu_count
+            results.append({
+                'neg': round(math.fabs(neg_sum / total), 3),
+                'neu': round(math.fabs(neu_count / total), 3),
+                'pos': round(math.fabs(pos_sum / total), 3),
+                'compound': round(compound, 4)
+            })
+        return results
+
+    def score_batch(self, texts):
+        """Return VADER polarity score dicts for a list of texts"""
+        texts = [text if isinstance(text, str) else str(text) for text in texts]
+        results = [None] * len(texts)
+        vector_indices = []
+        for index, text in enumerate(texts):
+            lowered = text.lower()
+            if any(marker in lowered for marker in _IDIOM_MARKERS):
+                results[index] = self.analyzer.polarity_scores(text)
+            else:
+                vector_indices.append(index)
+        if vector_indices:
+            scores = self._score_documents([texts[i] for i in vector_indices])
+            for index, score in zip(vector_indices, scores):
+                results[index] = score
+        return results
+
+    def polarity_scores(self, text):
+        """Drop-in replacement for SentimentIntensityAnalyzer.polarity_scores"""
+        primed = getattr(self._local, 'primed', None)
+        if primed is not None:
+            scores = primed.get(text)
+            record_cache_lookup('vader', scores is not None)
+            if scores is not None:
+                return dict(scores)
+        return self.score_batch([text])[0]
+
+    @contextmanager
+    def batch(self, texts):
+        """Score texts in one vectorized pass so polarity_scores calls on them are lookups"""
+        texts = [text for text in texts if isinstance(text, str)][:MAX_PRIMED_TEXTS]
+        unique = list(dict.fromkeys(texts))
+        previous = getattr(self._local, 'primed', None)
+        self._local.primed = dict(zip(unique, self.score_batch(unique)))
+        try:
+            yield self
+        finally:
+            self._local.primed = previous
+
+
+def get_vader_engine(analyzer=None):
+    """Return the VADER scorer selected by the VADER_ENGINE setting.
+
+    'vectorized' (the default) returns a VaderBatchScorer; 'nltk' returns
+    the plain SentimentIntensityAnalyzer.
+    """
+    name = os.environ.get('VADER_ENGINE', 'vectorized').lower()
+    if name == 'nltk':
+        return analyzer or SentimentIntensityAnalyzer()
+    if name != 'vectorized':
+        raise ValueError(f"Unknown VADER engine '{name}'. Choose 'vectorized' or 'nltk'")
+    return VaderBatchScorer(analyzer)
+
+
+def batch_scope(engine, texts):
+    """Prime engine with texts if it supports batching, else do nothing"""
+    if isinstance(engine, VaderBatchScorer):
+        return engine.batch(texts)
+    return nullcontext(engine)
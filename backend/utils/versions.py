@@ -0,0 +1,110 @@
+import hashlib
+
+import numpy as np
+
+try:
+    import scipy.sparse as sparse
+except ImportError:
+    sparse = None
+
+# Bumped by hand when a stage's code changes its output without changing any trained state
+STAGE_REVISIONS = {
+    'sentiment': 1,
+    'topics': 1,
+    'aspects': 1,
+    'emotion': 1,
+    'text_analysis': 1,
+    'keywords': 1
+}
+
+# stage -> (pipeline attribute holding the analyzer, analyzer attributes that decide the stage's output)
+STAGE_STATE = {
+    'sentiment': ('text_classifier', ('sentiment_vectorizer', 'sentiment_model', 'label_mapping', 'sentiment_vocab')),
+    'topics': ('text_classifier', ('topic_vectorizer', 'topic_models', 'topic_vocab')),
+    'aspects': ('aspect_analyzer', ('aspect_vectorizer', 'aspect_models', 'aspect_keywords')),
+    'emotion': ('emotion_detector', ('emotion_vectorizer', 'emotion_model')),
+    'text_analysis': ('text_processor', ('stop_words', 'formal_indicators', 'informal_indicators',
+                                         'sentiment_strength_indicators')),
+    'keywords': ('keyword_extractor', ('stop_words', 'tfidf_vectorizer'))
+}
+
+
+def _feed(digest, value, seen):
+    """Hash value by content; sets and dicts are ordered first, so the digest is the
+    same in every process regardless of hash randomization"""
+    if value is None or isinstance(value, (bool, int, float, str, bytes)):
+        digest.update(repr(value).encode())
+    elif isinstance(value, np.ndarray):
+        digest.update(f'ndarray{value.dtype.str}{value.shape}'.encode())
+        if value.dtype.hasobject:
+            _feed(digest, value.tolist(), seen)
+        else:
+            digest.update(np.ascontiguousarray(value).tobytes())
+    elif isinstance(value, np.generic):
+        _feed(digest, value.item(), seen)
+    elif sparse is not None and sparse.issparse(value):
+        value = value.tocsr()
+        for part in (value.data, value.indices, value.indptr, np.array(value.shape)):
+            _feed(digest, part, seen)
+    elif isinstance(value, dict):
+        digest.update(b'{')
+        for key in sorted(value, key=repr):
+            _feed(digest, key, seen)
+            _feed(digest, value[key], seen)
+        digest.update(b'}')
+    elif isinstance(value, (set, frozenset)):
+        digest.update(b'set')
+        _feed(digest, sorted(value, key=repr), seen)
+    elif isinstance(value, (list, tuple)):
+        digest.update(b'[')
+        for item in value:
+            _feed(digest, item, seen)
+        digest.update(b']')
+    elif isinstance(value, type) or callable(value):
+        # Functions, methods and classes (e.g. a vectorizer's dtype) by name, not address
+        digest.update(getattr(value, '__qualname__', type(value).__qualname__).encode())
+    elif hasattr(value, '__dict__'):
+        if id(value) in seen:
+            return
+        seen.add(id(value))
+        digest.update(type(value).__qualname__.encode())
+        # Private attributes are caches and bookkeeping (scikit-learn keeps an id() there)
+        _feed(digest, {key: item for key, item in vars(value).items() if not key.startswith('_')}, seen)
+    else:
+        digest.update(type(value).__qualname__.encode())
+
+
+def fingerprint(*values):
+    """Short content digest of trained state (vectorizers, models, vocabularies)"""
+    digest = hashlib.blake2b(digest_size=4)
+    seen = set()
+    for value in values:
+        _feed(digest, value, seen)
+    return digest.hexdigest()
+
+
+def stage_versions(pipeline):
+    """Version tag of every stage: '<revision>-<fingerprint of the state it reads>'"""
+    versions = {}
+    for stage, (component, attributes) in STAGE_STATE.items():
+        analyzer = getattr(pipeline, component)
+        state = [getattr(analyzer, attribute, None) for attribute in attributes]
+        versions[stage] = f"{STAGE_REVISIONS[stage]}-{fingerprint(type(analyzer), state)}"
+    return versions
+
+
+def format_versions(versions):
+    """Compact 'stage=version;...' form used in CSV and columnar result files"""
+    return ';'.join(f'{stage}={version}' for stage, version in versions.items())
+
+
+def parse_versions(value):
+    """Inverse of format_versions; a missing or empty value has no versions"""
+    if isinstance(value, dict):
+        return {str(stage): str(version) for stage, version in value.items()}
+    versions = {}
+    for part in str(value or '').split(';'):
+        stage, _, version = part.partition('=')
+        if stage.strip() and version.strip():
+            versions[stage.strip()] = version.strip()
+    return versions
@@ -1,31 +1,103 @@
 import React, { useState } from 'react';
 import { useDropzone } from 'react-dropzone';
 import { Upload, FileText, Download, Loader2, AlertCircle, CheckCircle, Zap } from 'lucide-react';
-import { batchAnalyze, simpleBatchAnalyze } from '../services/api';
+import { uploadAndAnalyze, simpleBatchAnalyze } from '../services/api';
 import toast from 'react-hot-toast';
 
+// Quick Analysis sends the whole file in one request; Full Analysis uploads in chunks
+const QUICK_ANALYSIS_MAX_BYTES = 10 * 1024 * 1024;
+
+const isCsvFile = (name) => /\.csv(\.(gz|gzip|zst|zstd))?$/i.test(name);
+
+const formatBytes = (bytes) => {
+  if (bytes >= 1024 * 1024 * 1024) {
+    return `${(bytes / (1024 * 1024 * 1024)).toFixed(2)} GB`;
+  }
+  if (bytes >= 1024 * 1024) {
+    return `${(bytes / (1024 * 1024)).toFixed(1)} MB`;
+  }
+  return `${(bytes / 1024).toFixed(1)} KB`;
+};
+
+const formatDuration = (seconds) => {
+  if (seconds >= 3600) {
+    return `${Math.floor(seconds / 3600)}h ${Math.round((seconds % 3600) / 60)}m`;
+  }
+  if (seconds >= 60) {
+    return `${Math.floor(seconds / 60)}m ${Math.round(seconds % 60)}s`;
+  }
+  return `${Math.round(seconds)}s`;
+};
+
+const SENTIMENT_COLORS = {
+  Positive: 'bg-green-500',
+  Neutral: 'bg-gray-400',
+  Negative: 'bg-red-500',
+};
+
+const SentimentDistribution = ({ counts }) => {
+  const total = Object.values(counts).reduce((sum, count) => sum + count, 0);
+  if (!total) {
+    return null;
+  }
+  return (
+    <div>
+      <div className="flex w-full h-2 rounded-full overflow-hidden">
+        {Object.entries(counts).map(([label, count]) => (
+          <div
+            key={label}
+            className={SENTIMENT_COLORS[label] || 'bg-primary-400'}
+            style={{ width: `${(count / total) * 100}%` }}
+          />
+        ))}
+      </div>
+      <div className="flex space-x-4 text-xs text-gray-600 mt-1">
+        {Object.entries(counts).map(([label, count]) => (
+          <span key={label}>
+            {label}: {((count / total) * 100).toFixed(1)}%
+          </span>
+        ))}
+      </div>
+    </div>
+  );
+};
+
+const ProgressBar = ({ label, detail, fraction }) => (
+  <div>
+    <div className="flex justify-between text-sm text-gray-700 mb-1">
+      <span>{label}</span>
+      <span>{detail}</span>
+    </div>
+    <div className="w-full bg-gray-200 rounded-full h-2">
+      <div
+        className="bg-primary-600 h-2 rounded-full transition-all duration-300"
+        style={{ width: `${Math.min(100, Math.round(fraction * 100))}%` }}
+      />
+    </div>
+  </div>
+);
+
 const BatchAnalysis = () => {
   const [file, setFile] = useState(null);
   const [isProcessing, setIsProcessing] = useState(false);
   const [downloadUrl, setDownloadUrl] = useState(null);
+  const [uploadProgress, setUploadProgress] = useState(null);
+  const [jobProgress, setJobProgress] = useState(null);
 
   const onDrop = (acceptedFiles) => {
     if (acceptedFiles.length > 0) {
       const uploadedFile = acceptedFiles[0];
       
-      if (!uploadedFile.name.endsWith('.csv')) {
-        toast.error('Please upload a CSV file');
-        return;
-      }
-      
-      if (uploadedFile.size > 10 * 1024 * 1024) { // 10MB limit
-        toast.error('File size must be less than 10MB');
+      if (!isCsvFile(uploadedFile.name)) {
+        toast.error('Please upload a CSV file (optionally .gz or .zst compressed)');
         return;
       }
       
       setFile(uploadedFile);
       setDownloadUrl(null);
-      toast.success('File uploaded successfully!');
+      setUploadProgress(null);
+      setJobProgress(null);
+      toast.success('File selected!');
     }
   };
 
@@ -33,6 +105,8 @@ const BatchAnalysis = () => {
     onDrop,
     accept: {
       'text/csv': ['.csv'],
+      'application/gzip': ['.gz'],
+      'application/zstd': ['.zst'],
     },
     multiple: false,
   });
@@ -47,19 +121,19 @@ const BatchAnalysis = () => {
     try {
       console.log('Processing file:', file.name, 'Size:', file.size);
       
-      const blob = await batchAnalyze(file);
-      console.log('Received blob:', blob);
+      // Resumes a previous upload of the same file if one is still on the server
+      const { blob, job } = await uploadAndAnalyze(file, {
+        onUploadProgress: (sent, total) => setUploadProgress({ sent, total }),
+        onJobProgress: setJobProgress,
+      });
+      console.log('Analysis job finished:', job);
       
       const url = window.URL.createObjectURL(blob);
       setDownloadUrl(url);
       toast.success('Batch analysis completed successfully!');
     } catch (error) {
+      // uploadAndAnalyze has already reported the error
       console.error('Batch analysis error:', error);
-      console.error('Error response:', error.response);
-      console.error('Error data:', error.response?.data);
-      
-      const errorMessage = error.response?.data?.error || error.message || 'Failed to process file. Please try again.';
-      toast.error(errorMessage);
     } finally {
       setIsProcessing(false);
     }
@@ -71,6 +145,11 @@ const BatchAnalysis = () => {
       return;
     }
 
+    if (file.size > QUICK_ANALYSIS_MAX_BYTES || !file.name.toLowerCase().endsWith('.csv')) {
+      toast.error('Quick Analysis supports uncompressed CSV files up to 10MB; use Full Analysis instead');
+      return;
+    }
+
     setIsProcessing(true);
     try {
       console.log('Simple processing file:', file.name, 'Size:', file.size);
@@ -154,7 +233,7 @@ const BatchAnalysis = () => {
             )}
             
             <div className="text-xs text-gray-500">
-              Supported format: CSV (Max 10MB)
+              Supported formats: CSV, CSV.GZ, CSV.ZST
             </div>
           </div>
         </div>
@@ -167,7 +246,7 @@ const BatchAnalysis = () => {
                 <div>
                   <p className="font-medium text-green-900">{file.name}</p>
                   <p className="text-sm text-green-700">
-                    {(file.size / 1024).toFixed(1)} KB
+                    {formatBytes(file.size)}
                   </p>
                 </div>
               </div>
@@ -175,7 +254,10 @@ const BatchAnalysis = () => {
                 onClick={() => {
                   setFile(null);
                   setDownloadUrl(null);
+                  setUploadProgress(null);
+                  setJobProgress(null);
                 }}
+                disabled={isProcessing}
                 className="text-red-600 hover:text-red-800 text-sm font-medium"
               >
                 Remove
@@ -223,6 +305,44 @@ const BatchAnalysis = () => {
         </div>
       </div>
 
+      {/* Upload and Analysis Progress */}
+      {(uploadProgress || jobProgress) && (
+        <div className="glass-morphism rounded-xl p-6 space-y-4">
+          {uploadProgress && (
+            <ProgressBar
+              label="Upload"
+              detail={`${formatBytes(uploadProgress.sent)} of ${formatBytes(uploadProgress.total)}`}
+              fraction={uploadProgress.total ? uploadProgress.sent / uploadProgress.total : 0}
+            />
+          )}
+          {jobProgress && (
+            <ProgressBar
+              label={`Analysis (${jobProgress.status})`}
+              detail={`${(jobProgress.rows_done || 0).toLocaleString()} rows analyzed`}
+              fraction={
+                jobProgress.status === 'done'
+                  ? 1
+                  : jobProgress.rows_expected
+                    ? (jobProgress.rows_done || 0) / jobProgress.rows_expected
+                    : 0
+              }
+            />
+          )}
+          {jobProgress && jobProgress.status === 'running' && (
+            <div className="flex flex-wrap gap-x-6 text-sm text-gray-600">
+              <span>{(jobProgress.rows_per_second || 0).toLocaleString()} rows/s</span>
+              {jobProgress.eta_seconds != null && <span>ETA {formatDuration(jobProgress.eta_seconds)}</span>}
+              {jobProgress.errors > 0 && (
+                <span className="text-red-600">{jobProgress.errors.toLocaleString()} rows failed</span>
+              )}
+            </div>
+          )}
+          {jobProgress?.sentiment_distribution && (
+            <SentimentDistribution counts={jobProgress.sentiment_distribution} />
+          )}
+        </div>
+      )}
+
       {/* Download Section */}
       {downloadUrl && (
         <div className="glass-morphism rounded-xl p-6">
@@ -262,7 +382,8 @@ const BatchAnalysis = () => {
             <ul className="list-disc list-inside space-y-1 text-sm ml-4">
               <li>Your CSV must have a column named 'text'</li>
               <li>Each row should contain one text to analyze</li>
-              <li>Maximum file size: 10MB</li>
+              <li>Large files upload in resumable chunks; gzip or zstd compression speeds them up</li>
+              <li>Quick Analysis is limited to uncompressed files up to 10MB</li>
             </ul>
           </div>
           
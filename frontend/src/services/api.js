@@ -34,9 +34,11 @@ api.interceptors.response.use(
   }
 );
 
-export const analyzeText = async (text) => {
+export const analyzeText = async (text, fields) => {
   try {
-    const response = await api.post('/classify', { text });
+    // fields: optional list of stages to compute, e.g. ['sentiment', 'emotion']
+    const payload = fields ? { text, fields } : { text };
+    const response = await api.post('/classify', payload);
     return response;
   } catch (error) {
     console.error('Text analysis error:', error);
@@ -133,6 +135,185 @@ export const batchAnalyze = async (file) => {
   }
 };
 
+// Chunked, resumable upload of large batch files: the file is sent in numbered,
+// checksummed chunks and analysis starts on the server while it is still uploading.
+const UPLOAD_CHUNK_BYTES = 8 * 1024 * 1024;
+const UPLOAD_CONCURRENCY = 4;
+const UPLOAD_RETRIES = 5;
+const JOB_POLL_INTERVAL = 1000;
+
+const sleep = (ms) => new Promise((resolve) => setTimeout(resolve, ms));
+
+const sha256Hex = async (buffer) => {
+  const digest = await window.crypto.subtle.digest('SHA-256', buffer);
+  return Array.from(new Uint8Array(digest))
+    .map((byte) => byte.toString(16).padStart(2, '0'))
+    .join('');
+};
+
+// Remembers the upload session per file so a reload or dropped connection resumes it
+const uploadSessionKey = (file) => `upload:${file.name}:${file.size}:${file.lastModified}`;
+
+const withRetries = async (fn) => {
+  for (let attempt = 0; ; attempt += 1) {
+    try {
+      return await fn();
+    } catch (error) {
+      const status = error.response?.status;
+      // 400 is a chunk corrupted in transit; other client errors will not succeed on retry
+      const retryable = !status || status >= 500 || status === 429 || status === 400;
+      if (!retryable || attempt >= UPLOAD_RETRIES) {
+        throw error;
+      }
+      const retryAfter = Number(error.response?.headers?.['retry-after']);
+      await sleep(retryAfter ? retryAfter * 1000 : Math.min(30000, 500 * 2 ** attempt));
+    }
+  }
+};
+
+const openUploadSession = async (file) => {
+  const key = uploadSessionKey(file);
+  const existing = window.localStorage.getItem(key);
+  if (existing) {
+    try {
+      const response = await axios.get(`${API_BASE_URL}/uploads/${existing}`);
+      return response.data;
+    } catch (error) {
+      // Expired or deleted on the server; start over
+      window.localStorage.removeItem(key);
+    }
+  }
+  const response = await axios.post(`${API_BASE_URL}/uploads`, {
+    filename: file.name,
+    size: file.size,
+    chunk_size: UPLOAD_CHUNK_BYTES,
+  });
+  window.localStorage.setItem(key, response.data.id);
+  return response.data;
+};
+
+const uploadChunks = async (file, session, onProgress, cancelled = () => false) => {
+  const received = new Set(session.received);
+  const pending = [];
+  for (let number = 0; number < session.chunks; number += 1) {
+    if (!received.has(number)) {
+      pending.push(number);
+    }
+  }
+  let bytesSent = session.bytes_received;
+  onProgress?.(bytesSent, file.size);
+
+  const worker = async () => {
+    while (pending.length > 0 && !cancelled()) {
+      const number = pending.shift();
+      const start = number * session.chunk_size;
+      const buffer = await file.slice(start, Math.min(start + session.chunk_size, file.size)).arrayBuffer();
+      const checksum = await sha256Hex(buffer);
+      await withRetries(() =>
+        axios.put(`${API_BASE_URL}/uploads/${session.id}/chunks/${number}`, buffer, {
+          headers: { 'Content-Type': 'application/octet-stream', 'X-Chunk-Sha256': checksum },
+          timeout: 120000,
+        })
+      );
+      bytesSent += buffer.byteLength;
+      onProgress?.(bytesSent, file.size);
+    }
+  };
+  await Promise.all(Array.from({ length: UPLOAD_CONCURRENCY }, worker));
+};
+
+const pollJob = async (jobId, onProgress) => {
+  for (;;) {
+    const response = await withRetries(() => axios.get(`${API_BASE_URL}/jobs/${jobId}`));
+    const job = response.data;
+    onProgress?.(job);
+    if (job.status === 'done') {
+      return job;
+    }
+    if (job.status === 'failed') {
+      throw new Error(job.error || 'Analysis failed');
+    }
+    await sleep(JOB_POLL_INTERVAL);
+  }
+};
+
+// Follows a job's server-sent progress events, falling back to polling where
+// EventSource is unavailable or the stream cannot be opened
+const waitForJob = (jobId, onProgress) =>
+  new Promise((resolve, reject) => {
+    if (!window.EventSource) {
+      pollJob(jobId, onProgress).then(resolve, reject);
+      return;
+    }
+    const source = new EventSource(`${API_BASE_URL}/jobs/${jobId}/events`);
+    source.addEventListener('progress', (event) => onProgress?.(JSON.parse(event.data)));
+    source.addEventListener('done', (event) => {
+      source.close();
+      const job = JSON.parse(event.data);
+      onProgress?.(job);
+      resolve(job);
+    });
+    source.addEventListener('failed', (event) => {
+      source.close();
+      reject(new Error(JSON.parse(event.data).error || 'Analysis failed'));
+    });
+    source.addEventListener('not_found', () => {
+      source.close();
+      reject(new Error('Analysis job not found'));
+    });
+    source.onerror = () => {
+      // EventSource reconnects by itself unless the server refused the stream
+      if (source.readyState === EventSource.CLOSED) {
+        pollJob(jobId, onProgress).then(resolve, reject);
+      }
+    };
+  });
+
+export const uploadAndAnalyze = async (file, { onUploadProgress, onJobProgress, options = {} } = {}) => {
+  try {
+    const session = await openUploadSession(file);
+
+    // Start analysis first so the server parses chunks as they arrive
+    let jobId = session.job;
+    if (!jobId) {
+      const response = await axios.post(`${API_BASE_URL}/uploads/${session.id}/analyze`, options);
+      jobId = response.data.id;
+    } else {
+      // A resumed upload's job may have failed with the connection or server; restart it
+      const response = await axios.get(`${API_BASE_URL}/jobs/${jobId}`);
+      if (response.data.status === 'failed') {
+        await axios.post(`${API_BASE_URL}/jobs/${jobId}/retry`);
+      }
+    }
+    let jobFailed = false;
+    const job = waitForJob(jobId, onJobProgress);
+    job.catch(() => {
+      jobFailed = true;
+    });
+
+    // Stop uploading as soon as the job fails
+    await Promise.race([
+      uploadChunks(file, session, onUploadProgress, () => jobFailed),
+      job.then(() => new Promise(() => {})),
+    ]);
+    await withRetries(() => axios.post(`${API_BASE_URL}/uploads/${session.id}/finalize`, {}));
+    const finished = await job;
+
+    const result = await axios.get(`${API_BASE_URL}/jobs/${jobId}/result`, {
+      responseType: 'blob',
+      timeout: 0,
+    });
+    window.localStorage.removeItem(uploadSessionKey(file));
+    axios.delete(`${API_BASE_URL}/uploads/${session.id}`).catch(() => {});
+    return { blob: result.data, job: finished };
+  } catch (error) {
+    console.error('Chunked upload error:', error);
+    const message = error.response?.data?.error || error.message || 'Failed to upload file';
+    toast.error(message);
+    throw error;
+  }
+};
+
 export const healthCheck = async () => {
   try {
     const response = await api.get('/health');